@@ -1,5 +1,8 @@
-from . import agents, database, models, routers, services, utils
+import importlib
+from typing import Any
 
+# Subpackages are imported on first attribute access so that importing one
+# module (e.g. backend.utils.config) does not drag in every router and model.
 __all__ = [
     "agents",
     "database",
@@ -10,3 +13,13 @@ __all__ = [
 ]
 
 
+def __getattr__(name: str) -> Any:
+    if name in __all__:
+        module = importlib.import_module(f".{name}", __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
@@ -1,25 +1,50 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from backend.models import ChatHistory, HealthAssessment, WorkoutPlan
+from backend.agents.intent_router import IntentDecision, IntentRouter, get_intent_router
+from backend.models import ChatHistory, ChatSummary, HealthAssessment, IntentLog, MealLog, OutboxTask, WorkoutPlan
 from backend.models.schemas import (
     ChatRequest,
     ChatResponse,
     GeneratePlanRequest,
     HealthAssessmentCreate,
 )
-from backend.services.groq_client import GroqClient, try_parse_json
+from backend.services.chat_window_cache import CHAT_HISTORY_LIMIT, ChatWindow, window_cache
+from backend.services.circuit_breaker import CircuitOpenError
+from backend.services.groq_client import GroqClient
 from backend.services.health_assessment_service import get_latest_assessment
+from backend.services.llm_json import JSON_RESPONSE_FORMAT, parse_agent_envelope
+from backend.services.llm_usage import (
+    BUDGET_REDUCED,
+    LlmBudgetExceeded,
+    check_budget,
+    reduced_max_tokens,
+)
+from backend.services.model_router import TASK_ASSESSMENT, TASK_CHAT
 from backend.services.nutrition_service import log_meal
+from backend.services.outbox import STATUS_PENDING, enqueue, handler
+from backend.services.plan_service import (
+    get_latest_plan,
+    add_plan_feedback,
+    materialize_plan,
+)
+from backend.services.risk_scoring import score_answers
 from backend.services.user_service import get_or_create_demo_user
+from backend.utils.config import INTENT_ROUTER_ENABLED
 
 # Groq/OpenAI only accept these roles; no custom keys.
 VALID_ROLES = frozenset({"system", "user", "assistant"})
-GROQ_MODEL = "llama-3.1-8b-instant"
+# Archived-session summaries prepended to the live history window.
+MAX_CONTEXT_SUMMARIES = 3
+# Outbox task holding one turn's history, intent log and plan feedback.
+CHAT_TURN_TASK = "chat_turn"
+
+ChatEventCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
 
 
 def _normalize_messages(raw: List[Dict[str, Any]]) -> List[Dict[str, str]]:
@@ -77,10 +102,58 @@ TOOLS OVERVIEW (decide based on conversation and user intent):
 - none: When a simple conversational answer is enough and no tools are needed.
 """
 
+ASSESSMENT_SYSTEM_PROMPT = (
+    "You are a clinical-grade, but user-friendly, fitness and lifestyle risk assessor. Be concise. "
+    "Risk and readiness scores (0-100) are already computed; do not re-score. "
+    "Explain what drives them and give practical next steps."
+)
+
+DEGRADED_CHAT_REPLY = (
+    "I'm having trouble reaching my coaching brain right now. "
+    "Your message is saved - please try again in a minute."
+)
+# The model's answer was unusable (not JSON, or cut off mid tool call).
+UNPARSEABLE_CHAT_REPLY = "Sorry, I lost my train of thought there. Could you say that again?"
+DEGRADED_ASSESSMENT_SUMMARY = (
+    "Your answers were saved. A detailed summary is temporarily unavailable; "
+    "please check back shortly."
+)
+
+
+def _routed_reply(intent: str, tool_result: Optional[Dict[str, Any]]) -> str:
+    """Reply for turns the intent router handled without the LLM."""
+    if tool_result is None:
+        if intent == "adjust_plan_based_on_feedback":
+            return "Thanks for sharing! You don't have a workout plan yet - ask me to create one and I'll factor this in."
+        if intent == "analyze_health_assessment":
+            return "I don't have a health assessment for you yet. Complete one and I'll summarize it."
+    if not tool_result or "error" in tool_result:
+        return "Sorry, I couldn't process that just now. Could you try again?"
+    if intent == "fetch_nutrition_data":
+        if tool_result.get("calories") is None:
+            return f"Logged \"{tool_result['description']}\". I couldn't work out its nutrition, though."
+        return (
+            f"Logged \"{tool_result['description']}\": about {tool_result['calories']:.0f} kcal, "
+            f"{tool_result['protein_g']:.0f} g protein, {tool_result['carbs_g']:.0f} g carbs "
+            f"and {tool_result['fat_g']:.0f} g fat."
+        )
+    if intent == "adjust_plan_based_on_feedback":
+        return "Thanks for the feedback - I've noted it on your current plan and will adjust from here."
+    if intent == "generate_workout_plan":
+        return "I've put together a new workout plan for you."
+    if intent == "analyze_health_assessment":
+        return tool_result.get("summary") or "Here's your assessment summary."
+    return "Got it."
+
 
 class AromiAgent:
-    def __init__(self, groq_client: Optional[GroqClient] = None):
+    def __init__(
+        self,
+        groq_client: Optional[GroqClient] = None,
+        intent_router: Optional[IntentRouter] = None,
+    ):
         self.groq_client = groq_client or GroqClient()
+        self.intent_router = intent_router or (get_intent_router() if INTENT_ROUTER_ENABLED else None)
 
     # ---- tool implementations ----
 
@@ -103,127 +176,140 @@ class AromiAgent:
         return plan
 
     async def analyze_health_assessment(
-        self, db: Session, payload: HealthAssessmentCreate, user_id: int
+        self,
+        db: Session,
+        payload: HealthAssessmentCreate,
+        user_id: int,
+        scores: Optional[Dict[str, Any]] = None,
     ) -> str:
         """
         Ask Groq for a concise assessment summary. Returns plain text.
+
+        Scores come from the local scoring engine; the model only narrates them.
         """
+        scores = scores or score_answers(payload.answers)
         user_content = json.dumps(
             {
                 "user_id": user_id,
                 "answers": payload.answers,
                 "metadata": payload.metadata or {},
+                "scores": {
+                    "risk_score": scores["risk_score"],
+                    "readiness_score": scores["readiness_score"],
+                    "top_risk_factors": scores["risk_factors"],
+                },
             }
         )
         raw_messages = [
-            {"role": "system", "content": "You are a clinical-grade, but user-friendly, fitness and lifestyle risk assessor. Be concise."},
+            {"role": "system", "content": ASSESSMENT_SYSTEM_PROMPT},
             {"role": "user", "content": user_content or ""},
         ]
         messages = _normalize_messages(raw_messages)
         messages = _ensure_system_and_user(
             messages,
-            default_system="You are a clinical-grade, but user-friendly, fitness and lifestyle risk assessor. Be concise.",
+            default_system=ASSESSMENT_SYSTEM_PROMPT,
             last_user=user_content or "No data provided.",
         )
         print("Sending to Groq (analyze_health_assessment):", messages)
-        summary = await self.groq_client.chat(messages, temperature=0.2, max_tokens=300)
+        try:
+            # Scores are computed locally, so an over-budget user still gets them.
+            max_tokens = 300
+            budget = await check_budget(user_id)
+            if budget == BUDGET_REDUCED:
+                max_tokens = reduced_max_tokens(max_tokens)
+            summary = await self.groq_client.chat(
+                messages,
+                temperature=0.2,
+                max_tokens=max_tokens,
+                user_id=user_id,
+                call_type=TASK_ASSESSMENT,
+                budget=budget,
+            )
+        except (CircuitOpenError, LlmBudgetExceeded):
+            return DEGRADED_ASSESSMENT_SUMMARY
         return summary.strip()
 
     async def fetch_nutrition_data(
         self, db: Session, user_id: Optional[int], description: str
-    ):
+    ) -> Tuple[MealLog, bool]:
         return await log_meal(db, user_id, description)
 
     def adjust_plan_based_on_feedback(
         self, db: Session, user_id: int, feedback: str
-    ) -> Optional[WorkoutPlan]:
+    ) -> Optional[Tuple[WorkoutPlan, Dict[str, Any], int]]:
         """
-        Simple MVP: just attach feedback into latest plan's JSON.
+        (latest plan, its data with ``feedback`` applied, the revision that adds it).
+
+        Nothing is written here: the revision is recorded with the rest of
+        the turn by the chat_turn outbox task.
         """
-        latest = (
-            db.query(WorkoutPlan)
-            .filter(WorkoutPlan.user_id == user_id)
-            .order_by(WorkoutPlan.created_at.desc())
-            .first()
-        )
+        latest = get_latest_plan(db, user_id)
         if not latest:
             return None
 
-        try:
-            data = json.loads(latest.plan_json)
-        except Exception:
-            data = {}
-        history = data.get("feedback_history", [])
-        history.append(feedback)
-        data["feedback_history"] = history
-        latest.plan_json = json.dumps(data)
-        db.add(latest)
-        db.commit()
-        db.refresh(latest)
-        return latest
+        plan_data, revision = materialize_plan(db, latest)
+        plan_data.setdefault("feedback_history", []).append(feedback)
+        return latest, plan_data, revision + 1
 
     # ---- reasoning + high-level chat orchestration ----
 
-    def _build_chat_history(
-        self, db: Session, user_id: int, session_id: Optional[str]
-    ) -> List[Dict[str, Any]]:
-        """Return chat history as list of dicts with role and content (may be normalized later)."""
-        q = db.query(ChatHistory).filter(ChatHistory.user_id == user_id)
-        if session_id:
-            q = q.filter(ChatHistory.session_id == session_id)
-        q = q.order_by(ChatHistory.created_at.asc()).limit(15)
-        records = q.all()
-        messages: List[Dict[str, Any]] = []
-        for rec in records:
-            role = rec.role if rec.role else "user"
-            content = rec.message if rec.message is not None else ""
-            messages.append({"role": role, "content": content})
-        return messages
-
-    def _persist_message(
+    def load_chat_window(
         self,
         db: Session,
-        *,
         user_id: int,
         session_id: Optional[str],
-        role: str,
-        message: str,
-    ) -> None:
-        record = ChatHistory(
-            user_id=user_id,
-            session_id=session_id,
-            role=role,
-            message=message,
-        )
-        db.add(record)
-        db.commit()
-
-    async def chat(
-        self, db: Session, payload: ChatRequest
-    ) -> Tuple[ChatResponse, int]:
+        marker: Optional[ChatWindowMarker] = None,
+    ) -> ChatWindow:
         """
-        Main entry for /chat. Returns (response, resolved_user_id).
+        Cached chat context, valid for ``marker`` (read here when None).
+        A hit costs only the marker query; a miss reloads the window.
         """
-        # Resolve or create user (MVP: fall back to demo user)
-        user = get_or_create_demo_user(db) if payload.user_id is None else None
-        user_id = user.id if user is not None else payload.user_id  # type: ignore[arg-type]
-
-        # Persist user message
-        self._persist_message(
-            db,
-            user_id=user_id,
-            session_id=payload.session_id,
-            role="user",
-            message=payload.message,
+        if marker is None:
+            marker = _chat_window_marker(db, user_id)
+        return window_cache.get_or_load(
+            user_id, session_id, lambda: self._load_chat_window(db, user_id, session_id), marker=marker
         )
 
-        history_msgs = self._build_chat_history(db, user_id, payload.session_id)
+    def _load_chat_window(
+        self, db: Session, user_id: int, session_id: Optional[str]
+    ) -> ChatWindow:
+        q = db.query(ChatHistory.role, ChatHistory.message).filter(ChatHistory.user_id == user_id)
+        if session_id:
+            q = q.filter(ChatHistory.session_id == session_id)
+        # Newest CHAT_HISTORY_LIMIT messages, replayed oldest first.
+        records = q.order_by(ChatHistory.id.desc()).limit(CHAT_HISTORY_LIMIT).all()
+        window = ChatWindow()
+        # Compacted older sessions survive as summaries; give the model those first.
+        sq = db.query(ChatSummary.summary).filter(ChatSummary.user_id == user_id)
+        if session_id:
+            sq = sq.filter(ChatSummary.session_id == session_id)
+        summaries = sq.order_by(ChatSummary.id.desc()).limit(MAX_CONTEXT_SUMMARIES).all()
+        for (summary,) in reversed(summaries):
+            window.summaries.append({"role": "system", "content": summary})
+        for role, message in reversed(records):
+            window.append(role or "user", message if message is not None else "")
+        # Turns still waiting in the outbox are newer than anything stored.
+        for role, message in _pending_turn_messages(db, user_id, session_id):
+            window.append(role, message)
+        return window
+
+    async def _llm_turn(
+        self,
+        db: Session,
+        user_id: int,
+        window: ChatWindow,
+        user_content: str,
+        budget: str,
+    ) -> Tuple[str, Dict[str, Any], Optional[str]]:
+        """Ask Groq for (tool_to_call, tool_arguments, assistant_reply or None)."""
+        # Near the daily budget: answer the message alone, briefly.
+        reduced = budget == BUDGET_REDUCED
+        history_msgs = [] if reduced else window.as_messages()
         raw_list: List[Dict[str, Any]] = [
             {"role": "system", "content": SYSTEM_PROMPT or ""},
             *history_msgs,
         ]
         messages = _normalize_messages(raw_list)
-        user_content = (payload.message or "").strip() or "Hello"
         messages = _ensure_system_and_user(
             messages,
             default_system=SYSTEM_PROMPT or "You are a helpful fitness coach.",
@@ -236,16 +322,106 @@ class AromiAgent:
                 {"role": "user", "content": user_content},
             ]
         print("Sending to Groq:", messages)
-        raw = await self.groq_client.chat(
-            messages,
-            temperature=0.7,
-            max_tokens=600,
-        )
-        parsed = try_parse_json(raw) or {}
+        try:
+            raw = await self.groq_client.chat(
+                messages,
+                temperature=0.7,
+                max_tokens=reduced_max_tokens(600) if reduced else 600,
+                user_id=user_id,
+                response_format=JSON_RESPONSE_FORMAT,
+                call_type=TASK_CHAT,
+                budget=budget,
+            )
+        except CircuitOpenError:
+            # Fail fast with a canned reply; no tool side effects while degraded.
+            return "none", {}, DEGRADED_CHAT_REPLY
+
+        envelope = parse_agent_envelope(raw)
+        # Never show raw model output: half an envelope is JSON, not a reply.
+        if envelope is None or (not envelope.assistant_reply and envelope.tool_to_call == "none"):
+            return "none", {}, UNPARSEABLE_CHAT_REPLY
+        # A tool call without text gets the templated reply once the tool has run.
+        return envelope.tool_to_call, envelope.tool_arguments or {}, envelope.assistant_reply or None
+
+    async def chat(
+        self,
+        db: Session,
+        payload: ChatRequest,
+        *,
+        on_event: Optional[ChatEventCallback] = None,
+    ) -> Tuple[ChatResponse, int]:
+        """
+        Main entry for /chat. Returns (response, resolved_user_id).
 
-        tool_to_call = parsed.get("tool_to_call", "none")
-        tool_args = parsed.get("tool_arguments") or {}
-        assistant_reply = parsed.get("assistant_reply") or raw
+        ``on_event`` receives "reply" as soon as the model's text is known
+        and "tool" once a tool has run, before the turn completes. Raises
+        LlmBudgetExceeded when the turn needs Groq and the user is over budget.
+        """
+        # Resolve or create user (MVP: fall back to demo user)
+        user = get_or_create_demo_user(db) if payload.user_id is None else None
+        user_id = user.id if user is not None else payload.user_id  # type: ignore[arg-type]
+
+        user_content = (payload.message or "").strip() or "Hello"
+        decision = self.intent_router.route(user_content) if self.intent_router else None
+        direct = decision is not None and decision.direct
+        # Over-budget users can still use routed tools; LLM turns are rejected
+        # before anything is persisted.
+        budget = None if direct else await check_budget(user_id)
+
+        # The turn is written after the response (chat_turn outbox task); the
+        # cached window takes the user message now so the model sees it.
+        # Routed turns need no history; their next LLM turn re-checks the cache.
+        marker = window = None
+        if not direct:
+            marker = _chat_window_marker(db, user_id)
+            window = self.load_chat_window(db, user_id, payload.session_id, marker)
+        window_cache.append(user_id, payload.session_id, "user", payload.message)
+        try:
+            return await self._chat_turn(
+                db, payload, user_id, user_content, decision, budget, window, marker, on_event
+            )
+        except BaseException:
+            # The turn won't be persisted; drop the cached user message with it.
+            window_cache.invalidate_user(user_id)
+            raise
+
+    async def _chat_turn(
+        self,
+        db: Session,
+        payload: ChatRequest,
+        user_id: int,
+        user_content: str,
+        decision: Optional[IntentDecision],
+        budget: Optional[str],
+        window: Optional[ChatWindow],
+        marker: Optional[ChatWindowMarker],
+        on_event: Optional[ChatEventCallback],
+    ) -> Tuple[ChatResponse, int]:
+        direct = decision is not None and decision.direct
+        plan_feedback: Optional[Dict[str, Any]] = None
+        if direct:
+            # Obvious tool call: skip history + LLM; reply is templated from the tool result.
+            tool_to_call = decision.intent
+            tool_args: Dict[str, Any] = {}
+            assistant_reply: Optional[str] = None
+            intent_log: Optional[Dict[str, Any]] = {
+                "message": user_content,
+                "intent": tool_to_call,
+                "source": "router",
+                "confidence": decision.confidence,
+            }
+        else:
+            tool_to_call, tool_args, assistant_reply = await self._llm_turn(
+                db, user_id, window, user_content, budget
+            )
+            if on_event is not None and assistant_reply is not None:
+                await on_event("reply", {"reply": assistant_reply, "tool_to_call": tool_to_call})
+            # The LLM's decisions are the router's training data (canned replies aren't).
+            intent_log = (
+                {"message": user_content, "intent": tool_to_call, "source": "llm"}
+                if assistant_reply not in (DEGRADED_CHAT_REPLY, UNPARSEABLE_CHAT_REPLY)
+                else None
+            )
 
         tool_used: Optional[str] = None
         tool_result: Optional[Dict[str, Any]] = None
@@ -274,12 +450,17 @@ class AromiAgent:
                         answers=payload_dict.get("answers", []),
                         metadata=payload_dict.get("metadata", {}),
                     )
-                    summary = await self.analyze_health_assessment(db, ha, user_id)
+                    scores = score_answers(ha.answers)
+                    summary = await self.analyze_health_assessment(db, ha, user_id, scores=scores)
                     tool_used = tool_to_call
-                    tool_result = {"summary": summary}
+                    tool_result = {
+                        "summary": summary,
+                        "risk_score": scores["risk_score"],
+                        "readiness_score": scores["readiness_score"],
+                    }
             elif tool_to_call == "fetch_nutrition_data":
                 description = tool_args.get("description") or payload.message
-                meal = await self.fetch_nutrition_data(db, user_id, description)
+                meal, degraded = await self.fetch_nutrition_data(db, user_id, description)
                 tool_used = tool_to_call
                 tool_result = {
                     "meal_id": meal.id,
@@ -289,29 +470,52 @@ class AromiAgent:
                     "carbs_g": meal.carbs_g,
                     "fat_g": meal.fat_g,
                 }
+                if degraded:
+                    tool_result["degraded"] = True
             elif tool_to_call == "adjust_plan_based_on_feedback":
                 feedback = tool_args.get("feedback") or payload.message
-                updated = self.adjust_plan_based_on_feedback(db, user_id, feedback)
-                if updated:
+                preview = self.adjust_plan_based_on_feedback(db, user_id, feedback)
+                if preview:
+                    plan, plan_data, revision = preview
+                    plan_feedback = {"plan_id": plan.id, "feedback": feedback}
                     tool_used = tool_to_call
                     tool_result = {
-                        "plan_id": updated.id,
-                        "goal": updated.goal,
-                        "plan_json": json.loads(updated.plan_json),
+                        "plan_id": plan.id,
+                        "goal": plan.goal,
+                        "revision": revision,
+                        "plan_json": plan_data,
+                        # Recorded right after this response.
+                        "pending": True,
                     }
         except Exception as e:  # noqa: BLE001
             # Keep conversation going even if tool fails
             tool_used = tool_to_call
             tool_result = {"error": str(e)}
 
-        # Persist assistant reply
-        self._persist_message(
+        if on_event is not None and tool_used is not None:
+            await on_event("tool", {"tool_used": tool_used, "tool_result": tool_result})
+        if assistant_reply is None:
+            assistant_reply = _routed_reply(tool_to_call, tool_result)
+
+        window_cache.append(user_id, payload.session_id, "assistant", assistant_reply)
+        task = enqueue(
             db,
-            user_id=user_id,
-            session_id=payload.session_id,
-            role="assistant",
-            message=assistant_reply,
+            CHAT_TURN_TASK,
+            {
+                "user_id": user_id,
+                "session_id": payload.session_id,
+                "messages": [["user", payload.message], ["assistant", assistant_reply]],
+                "intent_log": intent_log,
+                "plan_feedback": plan_feedback,
+            },
+            ordering_key=_chat_ordering_key(user_id),
         )
+        if marker is not None:
+            # The cached window already holds this turn. If another worker
+            # wrote one since the check, the count is off by more than this
+            # task and the next lookup reloads.
+            count, _, newest_summary = marker
+            window_cache.advance(user_id, marker, (count + 1, task.id, newest_summary))
 
         return (
             ChatResponse(
@@ -322,3 +526,73 @@ class AromiAgent:
             user_id,
         )
 
+
+
+# ---- after-response persistence ----
+
+
+# (chat_turn task count, newest task id, newest summary id); see _chat_window_marker.
+ChatWindowMarker = Tuple[int, Optional[int], Optional[int]]
+
+
+def _chat_ordering_key(user_id: int) -> str:
+    return f"chat:{user_id}"
+
+
+def _chat_window_marker(db: Session, user_id: int) -> ChatWindowMarker:
+    """
+    (chat_turn task count, newest task id, newest summary id) for the user.
+
+    Every turn, from any worker, is enqueued as a chat_turn task, and
+    compaction adds a summary, so a cached window whose marker still
+    matches holds what the database holds. Persisting a pending turn
+    doesn't move the marker: the window already had it. The count lets a
+    worker advance past its own task without another query. Chat imports
+    write history directly; other workers see them once the TTL expires.
+    """
+    tasks = OutboxTask.ordering_key == _chat_ordering_key(user_id)
+    count_q = db.query(func.count(OutboxTask.id)).filter(tasks)
+    newest_q = db.query(func.max(OutboxTask.id)).filter(tasks)
+    summary_q = db.query(func.max(ChatSummary.id)).filter(ChatSummary.user_id == user_id)
+    return tuple(
+        db.query(count_q.scalar_subquery(), newest_q.scalar_subquery(), summary_q.scalar_subquery()).one()
+    )
+
+
+def _pending_turn_messages(db: Session, user_id: int, session_id: Optional[str]) -> List[Tuple[str, str]]:
+    rows = (
+        db.query(OutboxTask.payload_json)
+        .filter(
+            OutboxTask.ordering_key == _chat_ordering_key(user_id),
+            OutboxTask.kind == CHAT_TURN_TASK,
+            OutboxTask.status == STATUS_PENDING,
+        )
+        .order_by(OutboxTask.id)
+        .all()
+    )
+    messages: List[Tuple[str, str]] = []
+    for (payload_json,) in rows:
+        turn = json.loads(payload_json)
+        if session_id and turn.get("session_id") != session_id:
+            continue
+        messages.extend((role, message or "") for role, message in turn["messages"])
+    return messages
+
+
+@handler(CHAT_TURN_TASK)
+def persist_chat_turn(db: Session, turn: Dict[str, Any]) -> None:
+    """Write one chat turn; the outbox commits it together with the task's "done" mark."""
+    user_id = turn["user_id"]
+    feedback = turn.get("plan_feedback")
+    if feedback:
+        plan = db.get(WorkoutPlan, feedback["plan_id"])
+        if plan is not None:
+            # Flushed, not committed: the revision lands in the same commit as
+            # the messages and the task's "done" mark, so a retried task can't
+            # record it twice. A revision-number race rolls the whole task
+            # back and the outbox retries it.
+            add_plan_feedback(db, plan, user_id, feedback["feedback"])
+    for role, message in turn["messages"]:
+        db.add(ChatHistory(user_id=user_id, session_id=turn.get("session_id"), role=role, message=message))
+    if turn.get("intent_log"):
+        db.add(IntentLog(user_id=user_id, **turn["intent_log"]))
@@ -0,0 +1,279 @@
+"""
+Local intent router in front of the LLM.
+
+A TF-IDF + multinomial logistic regression classifier predicts which tool a
+chat message needs. AromiAgent dispatches high-confidence predictions for
+intents with a configured threshold directly and only asks Groq otherwise.
+
+Training data is the built-in seed set plus the LLM's own past decisions
+(IntentLog rows with source="llm").
+
+    python -m backend.agents.intent_router train
+    python -m backend.agents.intent_router evaluate
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backend.utils.config import INTENT_MODEL_PATH, INTENT_ROUTER_THRESHOLDS
+
+INTENTS = (
+    "fetch_nutrition_data",
+    "adjust_plan_based_on_feedback",
+    "generate_workout_plan",
+    "analyze_health_assessment",
+    "none",
+)
+
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("I ate 2 rotis and dal", "fetch_nutrition_data"),
+    ("had 3 idlis with sambar for breakfast", "fetch_nutrition_data"),
+    ("lunch was rice, rajma and a bowl of curd", "fetch_nutrition_data"),
+    ("just finished a chicken sandwich and a coke", "fetch_nutrition_data"),
+    ("dinner: paneer tikka and 2 naan", "fetch_nutrition_data"),
+    ("I drank a glass of milk and ate a banana", "fetch_nutrition_data"),
+    ("how many calories in 100g of oats", "fetch_nutrition_data"),
+    ("snacked on a handful of almonds and an apple", "fetch_nutrition_data"),
+    ("ate 2 eggs and toast this morning", "fetch_nutrition_data"),
+    ("the workout was too hard today", "adjust_plan_based_on_feedback"),
+    ("my knees hurt after the squats", "adjust_plan_based_on_feedback"),
+    ("this plan is boring, I need more variety", "adjust_plan_based_on_feedback"),
+    ("the exercises are too easy for me now", "adjust_plan_based_on_feedback"),
+    ("I couldn't finish the last set, too tiring", "adjust_plan_based_on_feedback"),
+    ("my back is sore from yesterday's deadlifts", "adjust_plan_based_on_feedback"),
+    ("please make the routine shorter, I only have 20 minutes", "adjust_plan_based_on_feedback"),
+    ("create a workout plan for weight loss", "generate_workout_plan"),
+    ("make me a 4 day gym schedule to build muscle", "generate_workout_plan"),
+    ("I want a weekly home workout routine", "generate_workout_plan"),
+    ("plan my exercises for marathon training", "generate_workout_plan"),
+    ("give me a new training program for strength", "generate_workout_plan"),
+    ("summarize my health assessment", "analyze_health_assessment"),
+    ("what are my health risks based on my answers", "analyze_health_assessment"),
+    ("analyze my assessment results", "analyze_health_assessment"),
+    ("what does my health questionnaire say about me", "analyze_health_assessment"),
+    ("hi", "none"),
+    ("hello aromi, how are you", "none"),
+    ("thanks!", "none"),
+    ("what is a good time to drink water", "none"),
+    ("is stretching before running useful", "none"),
+    ("how do I stay motivated", "none"),
+    ("what's the difference between cardio and hiit", "none"),
+]
+
+_TOKEN = re.compile(r"[a-z]+|\d+")
+
+
+def featurize(text: str) -> List[str]:
+    """Unigrams + bigrams; numbers collapse to <num> (quantities signal meals)."""
+    tokens = ["<num>" if t.isdigit() else t for t in _TOKEN.findall(text.lower())]
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+@dataclass
+class IntentDecision:
+    intent: str
+    confidence: float
+    direct: bool
+
+
+class IntentModel:
+    """TF-IDF features into a softmax-regression layer; plain Python, no numpy."""
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        idf: List[float],
+        classes: List[str],
+        weights: List[Dict[int, float]],
+        bias: List[float],
+    ):
+        self.vocab = vocab
+        self.idf = idf
+        self.classes = classes
+        self.weights = weights
+        self.bias = bias
+
+    # ---- features ----
+
+    def vectorize(self, text: str) -> Dict[int, float]:
+        counts = Counter(f for f in featurize(text) if f in self.vocab)
+        vec = {self.vocab[f]: (1 + math.log(c)) * self.idf[self.vocab[f]] for f, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {k: v / norm for k, v in vec.items()}
+
+    def _probs(self, vec: Dict[int, float]) -> List[float]:
+        scores = [
+            b + sum(w.get(k, 0.0) * v for k, v in vec.items())
+            for w, b in zip(self.weights, self.bias)
+        ]
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        probs = self._probs(self.vectorize(text))
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.classes[best], probs[best]
+
+    # ---- training ----
+
+    @classmethod
+    def train(
+        cls,
+        examples: Sequence[Tuple[str, str]],
+        *,
+        epochs: int = 40,
+        lr: float = 0.5,
+        l2: float = 1e-4,
+        seed: int = 13,
+    ) -> "IntentModel":
+        docs = [featurize(text) for text, _ in examples]
+        df: Counter = Counter()
+        for doc in docs:
+            df.update(set(doc))
+        vocab = {f: i for i, f in enumerate(sorted(df))}
+        n = len(docs)
+        idf = [0.0] * len(vocab)
+        for f, i in vocab.items():
+            idf[i] = math.log((1 + n) / (1 + df[f])) + 1
+        classes = sorted({label for _, label in examples} | set(INTENTS))
+        model = cls(vocab, idf, classes, [{} for _ in classes], [0.0] * len(classes))
+
+        data = [(model.vectorize(text), classes.index(label)) for text, label in examples]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            step = lr / (1 + epoch * 0.1)
+            for vec, y in data:
+                probs = model._probs(vec)
+                for c, p in enumerate(probs):
+                    grad = p - (1.0 if c == y else 0.0)
+                    w = model.weights[c]
+                    for k, v in vec.items():
+                        w[k] = w.get(k, 0.0) * (1 - step * l2) - step * grad * v
+                    model.bias[c] -= step * grad
+        return model
+
+    # ---- persistence ----
+
+    def to_json(self) -> Dict:
+        return {
+            "vocab": self.vocab,
+            "idf": self.idf,
+            "classes": self.classes,
+            "weights": [{str(k): round(v, 6) for k, v in w.items() if abs(v) > 1e-6} for w in self.weights],
+            "bias": self.bias,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "IntentModel":
+        return cls(
+            data["vocab"],
+            data["idf"],
+            data["classes"],
+            [{int(k): v for k, v in w.items()} for w in data["weights"]],
+            data["bias"],
+        )
+
+
+class IntentRouter:
+    def __init__(self, model: IntentModel, thresholds: Optional[Dict[str, float]] = None):
+        self.model = model
+        # Intents without a threshold always go to the LLM (e.g. "none" needs a real reply).
+        self.thresholds = INTENT_ROUTER_THRESHOLDS if thresholds is None else thresholds
+
+    def route(self, message: str) -> IntentDecision:
+        intent, confidence = self.model.predict(message)
+        threshold = self.thresholds.get(intent)
+        return IntentDecision(intent, confidence, threshold is not None and confidence >= threshold)
+
+
+_router: Optional[IntentRouter] = None
+
+
+def get_intent_router() -> IntentRouter:
+    """Process-wide router: trained model file if present, else the seed set."""
+    global _router
+    if _router is None:
+        if os.path.exists(INTENT_MODEL_PATH):
+            with open(INTENT_MODEL_PATH, "r", encoding="utf-8") as fh:
+                model = IntentModel.from_json(json.load(fh))
+        else:
+            model = IntentModel.train(SEED_EXAMPLES)
+        _router = IntentRouter(model)
+    return _router
+
+
+# ---- offline training / evaluation ----
+
+
+def load_logged_examples() -> List[Tuple[str, str]]:
+    from backend.database.session import SessionLocal
+    from backend.models import IntentLog
+
+    db = SessionLocal()
+    try:
+        rows = db.query(IntentLog.message, IntentLog.intent).filter(IntentLog.source == "llm")
+        return [(message, intent) for message, intent in rows if intent in INTENTS]
+    finally:
+        db.close()
+
+
+def evaluate(
+    train_set: Sequence[Tuple[str, str]], test_set: Sequence[Tuple[str, str]]
+) -> None:
+    model = IntentModel.train(train_set)
+    predictions = []
+    latencies = []
+    for text, label in test_set:
+        started = time.perf_counter()
+        intent, confidence = model.predict(text)
+        latencies.append((time.perf_counter() - started) * 1e6)
+        predictions.append((intent, confidence, label))
+
+    correct = sum(1 for intent, _, label in predictions if intent == label)
+    print(f"test examples: {len(test_set)}  accuracy: {correct / max(len(test_set), 1):.3f}")
+    latencies.sort()
+    p99 = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] if latencies else 0.0
+    print(f"predict latency: median {statistics.median(latencies or [0]):.0f}us  p99 {p99:.0f}us")
+    print("threshold  routed  precision")
+    for threshold in (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95):
+        routed = [(i, l) for i, c, l in predictions if c >= threshold and i != "none"]
+        precision = sum(1 for i, l in routed if i == l) / len(routed) if routed else float("nan")
+        print(f"{threshold:9.2f}  {len(routed) / max(len(predictions), 1):6.1%}  {precision:9.3f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    examples = SEED_EXAMPLES + load_logged_examples()
+    if args.command == "train":
+        model = IntentModel.train(examples)
+        with open(INTENT_MODEL_PATH, "w", encoding="utf-8") as fh:
+            json.dump(model.to_json(), fh)
+        print(f"Trained on {len(examples)} examples -> {INTENT_MODEL_PATH}")
+        return 0
+
+    rng = random.Random(7)
+    shuffled = list(examples)
+    rng.shuffle(shuffled)
+    cut = max(int(len(shuffled) * (1 - args.test_fraction)), 1)
+    evaluate(shuffled[:cut], shuffled[cut:])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,41 @@
-from typing import Annotated
+import hmac
+from typing import Annotated, Iterator, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
-from backend.database.session import get_db
+from backend.database.session import get_db, read_session, wrote_recently
 from backend.models import User
 from backend.utils.auth import decode_access_token
+from backend.utils.config import ADMIN_TOKEN
 
 OAUTH2_SCHEME = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=True)
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(OAUTH2_SCHEME),
-) -> User:
+# Operators send "X-Admin-Token: <ADMIN_TOKEN>" to /admin endpoints.
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# Clients send "X-Read-Consistency: strong" to force primary reads.
+READ_CONSISTENCY_HEADER = "X-Read-Consistency"
+
+
+def _token_user_id(token: str) -> Optional[int]:
+    payload = decode_access_token(token)
+    try:
+        return int(payload["sub"]) if payload else None
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _resolve_user(db: Session, token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid or expired token",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
-    sub = payload.get("sub")
-    if not sub:
-        raise credentials_exception
-    try:
-        user_id = int(sub)
-    except (TypeError, ValueError):
+    user_id = _token_user_id(token)
+    if user_id is None:
         raise credentials_exception
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
@@ -40,3 +47,45 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     return user
+
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(OAUTH2_SCHEME),
+) -> User:
+    return _resolve_user(db, token)
+
+
+def reads_from_primary(request: Request, user_id: Optional[int]) -> bool:
+    """
+    Whether this request's reads must go to the primary: the client asked
+    for strong consistency, or the user wrote within READ_YOUR_WRITES_SECONDS,
+    so a user always sees their own writes even behind a lagging replica.
+    """
+    strong = request.headers.get(READ_CONSISTENCY_HEADER, "").lower() == "strong"
+    return strong or wrote_recently(user_id)
+
+
+def get_read_db(
+    request: Request,
+    token: str = Depends(OAUTH2_SCHEME),
+) -> Iterator[Session]:
+    """Session for read-only endpoints, on the read engine (see reads_from_primary)."""
+    yield from read_session(primary=reads_from_primary(request, _token_user_id(token)))
+
+
+def get_current_user_read(
+    db: Session = Depends(get_read_db),
+    token: str = Depends(OAUTH2_SCHEME),
+) -> User:
+    """get_current_user for read endpoints; shares their read session."""
+    return _resolve_user(db, token)
+
+
+def require_admin(
+    admin_token: Optional[str] = Header(None, alias=ADMIN_TOKEN_HEADER),
+) -> None:
+    if not ADMIN_TOKEN or admin_token is None or not hmac.compare_digest(
+        admin_token.encode(), ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
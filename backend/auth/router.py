@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
-from backend.auth.dependencies import get_current_user
+from backend.auth.dependencies import get_current_user_read
 from backend.database.session import get_db
 from backend.models import User
 from backend.models.auth_schemas import (
@@ -83,5 +83,5 @@ def login(
 # CURRENT USER
 # =========================
 @router.get("/me", response_model=UserOut)
-def me(current_user: User = Depends(get_current_user)) -> User:
+def me(current_user: User = Depends(get_current_user_read)) -> User:
     return current_user
@@ -1,11 +1,38 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import Session
 
+from backend.database.migrations import run_migrations
 from backend.database.session import Base, engine
 from backend.models import User  # noqa: F401 (ensure models imported)
 
 
 def create_tables() -> None:
+    from backend.services.search_service import ensure_search_indexes
+
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    run_migrations(engine)
+    ensure_search_indexes(engine)
+
+
+def add_missing_columns() -> None:
+    """
+    create_all() skips tables that already exist; add any new nullable
+    columns to them so older databases pick up added fields.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present or not column.nullable:
+                    continue
+                ddl_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl_type}"))
+
 
 def ensure_demo_user(db: Session) -> int:
     existing = db.query(User).filter(User.email == "demo@arogyamitra.local").first()
@@ -22,3 +49,7 @@ def ensure_demo_user(db: Session) -> int:
     db.refresh(user)
     return user.id
 
+
+if __name__ == "__main__":
+    create_tables()
+    print("Tables created")
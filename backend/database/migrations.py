@@ -0,0 +1,132 @@
+"""
+Versioned schema migrations.
+
+create_all() only creates missing tables, so changes to existing tables
+(indexes, constraints, backfills) go here as numbered steps. Applied
+versions are recorded in schema_migrations; each step runs once, in its
+own transaction, in version order. Steps must also be safe on a database
+that create_all() just built from the current models (hence
+"IF NOT EXISTS").
+
+Never edit a step that has shipped; add a new one. Steps that can't run
+in a transaction (VACUUM) are marked with @_autocommit; they must check
+whether they are needed, since their version is recorded separately.
+
+    python -m backend.database.migrations            # create tables, apply pending steps
+    python -m backend.database.migrations --status   # list applied / pending
+"""
+import argparse
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, insert, select, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Kept out of Base.metadata: the bookkeeping table isn't an app model.
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _m001_user_scoped_indexes(conn: Connection) -> None:
+    # Every dashboard, agent and export query filters these tables by user and
+    # orders by time or id; without these they scan the whole table.
+    for ddl in (
+        "CREATE INDEX IF NOT EXISTS ix_meal_logs_user_id_logged_at ON meal_logs (user_id, logged_at)",
+        "CREATE INDEX IF NOT EXISTS ix_workout_plans_user_id_created_at ON workout_plans (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_health_assessments_user_id_created_at "
+        "ON health_assessments (user_id, created_at)",
+        # The chat window and compaction order by id, not created_at.
+        "CREATE INDEX IF NOT EXISTS ix_chat_history_user_id_id ON chat_history (user_id, id)",
+        "CREATE INDEX IF NOT EXISTS ix_plan_feedback_user_id ON plan_feedback (user_id)",
+    ):
+        conn.execute(text(ddl))
+
+
+def _autocommit(upgrade: Callable[[Connection], None]) -> Callable[[Connection], None]:
+    upgrade.autocommit = True  # type: ignore[attr-defined]
+    return upgrade
+
+
+@_autocommit
+def _m002_sqlite_incremental_auto_vacuum(conn: Connection) -> None:
+    # Chat compaction deletes rows and runs PRAGMA incremental_vacuum, which
+    # only frees pages when auto_vacuum=INCREMENTAL (2). Changing the mode of
+    # an existing file takes one full VACUUM; it rewrites the whole database
+    # and blocks writers meanwhile, so large installs should run
+    # "python -m backend.database.migrations" in a maintenance window.
+    if conn.dialect.name != "sqlite":
+        return
+    if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+        return
+    logger.info("Switching SQLite to auto_vacuum=INCREMENTAL (full VACUUM)")
+    conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.exec_driver_sql("VACUUM")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "user-scoped composite indexes", _m001_user_scoped_indexes),
+    (2, "sqlite auto_vacuum=INCREMENTAL", _m002_sqlite_incremental_auto_vacuum),
+]
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    _metadata.create_all(engine)
+    with engine.connect() as conn:
+        return [v for (v,) in conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version))]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply pending migrations. Returns the versions applied."""
+    done = set(applied_versions(engine))
+    applied = []
+    for version, description, upgrade in MIGRATIONS:
+        if version in done:
+            continue
+        if getattr(upgrade, "autocommit", False):
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                upgrade(conn)
+        with engine.begin() as conn:
+            if not getattr(upgrade, "autocommit", False):
+                upgrade(conn)
+            conn.execute(
+                insert(schema_migrations).values(
+                    version=version, description=description, applied_at=datetime.now(timezone.utc)
+                )
+            )
+        logger.info("Applied migration %03d: %s", version, description)
+        applied.append(version)
+    return applied
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from backend.database.init_db import create_tables
+    from backend.database.session import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="show applied and pending versions only")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        done = set(applied_versions(engine))
+        for version, description, _ in MIGRATIONS:
+            print(f"{version:03d}  {'applied' if version in done else 'pending'}  {description}")
+        return 0
+    before = set(applied_versions(engine))
+    create_tables()  # runs run_migrations() after create_all()
+    applied = sorted(set(applied_versions(engine)) - before)
+    print(f"Applied {len(applied)} migration(s)" + (f": {applied}" if applied else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
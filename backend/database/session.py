@@ -1,7 +1,17 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+import threading
+import time
+from typing import Dict, Iterator, Optional
 
-from backend.utils.config import DATABASE_URL
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+
+from backend.utils.config import (
+    DATABASE_READ_POOL_SIZE,
+    DATABASE_READ_URL,
+    DATABASE_URL,
+    READ_YOUR_WRITES_SECONDS,
+)
 
 
 class Base(DeclarativeBase):
@@ -15,6 +25,110 @@ engine = create_engine(DATABASE_URL, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def _is_file_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+if _is_file_sqlite(DATABASE_URL):
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_wal(dbapi_connection, _record) -> None:
+        cursor = dbapi_connection.cursor()
+        # Only takes effect on a database with no tables yet; existing files
+        # are switched once by migration 002. Lets chat compaction return
+        # freed pages with PRAGMA incremental_vacuum.
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        # WAL lets the read-only connections below read while a write is in
+        # progress instead of queueing behind its lock.
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+
+def _create_read_engine() -> Engine:
+    if DATABASE_READ_URL:
+        read_args = {"check_same_thread": False} if DATABASE_READ_URL.startswith("sqlite") else {}
+        return create_engine(
+            DATABASE_READ_URL, connect_args=read_args, pool_size=DATABASE_READ_POOL_SIZE
+        )
+    if _is_file_sqlite(DATABASE_URL):
+        url = make_url(DATABASE_URL)
+        read_url = url.set(database=f"file:{url.database}", query={"mode": "ro", "uri": "true"})
+        return create_engine(
+            read_url,
+            connect_args={"check_same_thread": False},
+            pool_size=DATABASE_READ_POOL_SIZE,
+        )
+    # No replica and nothing to open read-only (e.g. in-memory SQLite).
+    return engine
+
+
+read_engine = _create_read_engine()
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+@event.listens_for(ReadSessionLocal, "before_flush")
+def _reject_writes(session, _flush_context, _instances) -> None:
+    raise RuntimeError("Read-only session: use get_db for endpoints that write")
+
+
+# ---- read-your-writes ----
+# user_id -> monotonic time of that user's last committed write, per worker.
+
+_last_write: Dict[int, float] = {}
+_last_write_lock = threading.Lock()
+
+
+def _written_user_ids(session: Session) -> set:
+    user_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if getattr(obj, "__tablename__", None) == "users":
+            user_ids.add(obj.id)
+        else:
+            user_ids.add(getattr(obj, "user_id", None))
+    user_ids.discard(None)
+    return user_ids
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_writes(session, _flush_context) -> None:
+    session.info.setdefault("written_user_ids", set()).update(_written_user_ids(session))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_writes(session) -> None:
+    user_ids = session.info.pop("written_user_ids", None)
+    if user_ids:
+        mark_user_write(*user_ids)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_writes(session) -> None:
+    session.info.pop("written_user_ids", None)
+
+
+def mark_user_write(*user_ids: int) -> None:
+    """Pin these users' reads to the primary for READ_YOUR_WRITES_SECONDS."""
+    now = time.monotonic()
+    with _last_write_lock:
+        for user_id in user_ids:
+            _last_write[user_id] = now
+        if len(_last_write) > 10000:
+            cutoff = now - READ_YOUR_WRITES_SECONDS
+            for user_id in [u for u, t in _last_write.items() if t < cutoff]:
+                del _last_write[user_id]
+
+
+def wrote_recently(user_id: Optional[int]) -> bool:
+    # A read-only connection to the primary SQLite file never lags; only a
+    # separate replica (DATABASE_READ_URL) needs the sticky window.
+    if user_id is None or not DATABASE_READ_URL:
+        return False
+    written_at = _last_write.get(user_id)
+    return written_at is not None and time.monotonic() - written_at < READ_YOUR_WRITES_SECONDS
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -22,3 +136,15 @@ def get_db():
     finally:
         db.close()
 
+
+def open_read_session(primary: bool = False) -> Session:
+    return SessionLocal() if primary else ReadSessionLocal()
+
+
+def read_session(primary: bool = False) -> Iterator[Session]:
+    """Generator body for read dependencies; ``primary=True`` for strong reads."""
+    db = open_read_session(primary)
+    try:
+        yield db
+    finally:
+        db.close()
@@ -2,15 +2,33 @@ from backend.database.session import Base  # re-export for convenience
 from .user import User
 from .health_assessment import HealthAssessment
 from .chat_history import ChatHistory
+from .chat_summary import ChatSummary
+from .chat_retention_policy import ChatRetentionPolicy
+from .cohort_stat import CohortStat
+from .idempotency_key import IdempotencyKey
 from .workout_plan import WorkoutPlan
 from .meal_log import MealLog
+from .intent_log import IntentLog
+from .llm_usage import LlmUsage
+from .outbox_task import OutboxTask
+from .plan_feedback import PlanFeedback
+from .plan_revision import PlanRevision
 
 __all__ = [
     "Base",
     "User",
     "HealthAssessment",
     "ChatHistory",
+    "ChatSummary",
+    "ChatRetentionPolicy",
+    "CohortStat",
+    "IdempotencyKey",
     "WorkoutPlan",
     "MealLog",
+    "IntentLog",
+    "LlmUsage",
+    "OutboxTask",
+    "PlanFeedback",
+    "PlanRevision",
 ]
 
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer
+from sqlalchemy.sql import func
+
+from backend.database.session import Base
+
+
+class ChatRetentionPolicy(Base):
+    """Per-user override of CHAT_RETENTION_DAYS / CHAT_MAX_HOT_MESSAGES."""
+
+    __tablename__ = "chat_retention_policies"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    retain_days = Column(Integer, nullable=True)
+    max_hot_messages = Column(Integer, nullable=True)
+
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from backend.database.session import Base
+
+
+class ChatSummary(Base):
+    """Condensed stand-in for chat_history rows moved to a cold archive file."""
+
+    __tablename__ = "chat_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    session_id = Column(String(64), index=True, nullable=True)
+    summary = Column(Text, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    first_message_at = Column(DateTime(timezone=True), nullable=True)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    archive_path = Column(String(512), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    user = relationship("User", back_populates="chat_summaries")
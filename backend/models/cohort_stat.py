@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, Integer, String, Text, UniqueConstraint
+
+from backend.database.session import Base
+
+
+class CohortStat(Base):
+    """Precomputed percentile sketch of one metric for one cohort."""
+
+    __tablename__ = "cohort_stats"
+    __table_args__ = (UniqueConstraint("cohort_key", "metric", name="uq_cohort_stats_key_metric"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    # "age_band|gender|activity_level|goal", "*" for any (coarser fallbacks).
+    cohort_key = Column(String(200), nullable=False)
+    metric = Column(String(50), nullable=False)
+    sample_size = Column(Integer, nullable=False)
+    # JSON list of the 0th..100th percentile values.
+    quantiles_json = Column(Text, nullable=False)
+
+    computed_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -7,11 +7,16 @@ from backend.database.session import Base
 
 class HealthAssessment(Base):
     __tablename__ = "health_assessments"
+    __table_args__ = (Index("ix_health_assessments_user_id_created_at", "user_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     responses_json = Column(Text, nullable=False)
     summary = Column(Text, nullable=True)
+    # Local scores from backend.services.risk_scoring (0-100).
+    risk_score = Column(Float, nullable=True)
+    readiness_score = Column(Float, nullable=True)
+    scoring_version = Column(Integer, nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
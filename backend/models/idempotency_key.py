@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+
+from backend.database.session import Base
+
+
+class IdempotencyKey(Base):
+    """Outcome of a POST sent with an Idempotency-Key, replayed to retries."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # sha256 of method, path and canonical body; a reused key must match it.
+    request_hash = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False)  # "in_progress" | "completed"
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy.sql import func
+
+from backend.database.session import Base
+
+
+class IntentLog(Base):
+    """Which tool a chat message was routed to, and by whom ("llm" | "router")."""
+
+    __tablename__ = "intent_logs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    message = Column(Text, nullable=False)
+    intent = Column(String(64), nullable=False)
+    source = Column(String(16), index=True, nullable=False)
+    confidence = Column(Float, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, String, UniqueConstraint
+
+from backend.database.session import Base
+
+
+class LlmUsage(Base):
+    """Groq token usage per user, UTC day and call type ("chat", "assessment", ...)."""
+
+    __tablename__ = "llm_usage"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "call_type", name="uq_llm_usage_user_day_type"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    day = Column(Date, nullable=False, index=True)
+    call_type = Column(String(40), nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float, nullable=False, default=0.0)  # summed; divide by calls
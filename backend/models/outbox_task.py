@@ -0,0 +1,29 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.sql import func
+
+from backend.database.session import Base
+
+
+class OutboxTask(Base):
+    """A write deferred until after the response, run by the outbox worker."""
+
+    __tablename__ = "outbox_tasks"
+    __table_args__ = (
+        Index("ix_outbox_tasks_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_outbox_tasks_ordering_key_id", "ordering_key", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(64), nullable=False)
+    # Tasks sharing a key run one at a time, in id order (e.g. "chat:7").
+    ordering_key = Column(String(100), nullable=True)
+    payload_json = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False)  # "pending" | "done" | "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    # Claimed by a worker until then; an expired lock means the worker died.
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Text
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from backend.database.session import Base
+
+
+class PlanFeedback(Base):
+    __tablename__ = "plan_feedback"
+    __table_args__ = (Index("ix_plan_feedback_user_id", "user_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    plan_id = Column(Integer, ForeignKey("workout_plans.id"), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    feedback = Column(Text, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    plan = relationship("WorkoutPlan", back_populates="feedback")
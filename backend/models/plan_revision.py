@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from backend.database.session import Base
+
+
+class PlanRevision(Base):
+    """One JSON-patch (RFC 6902) delta on top of WorkoutPlan.plan_json (revision 0)."""
+
+    __tablename__ = "plan_revisions"
+    __table_args__ = (UniqueConstraint("plan_id", "revision", name="uq_plan_revision"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    plan_id = Column(Integer, ForeignKey("workout_plans.id"), index=True, nullable=False)
+    revision = Column(Integer, nullable=False)
+    patch_json = Column(Text, nullable=False)
+    feedback_id = Column(Integer, ForeignKey("plan_feedback.id"), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    plan = relationship("WorkoutPlan", back_populates="revisions")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -14,6 +14,8 @@ class HealthAssessmentResponse(BaseModel):
     id: int
     user_id: int
     summary: Optional[str]
+    risk_score: Optional[float] = None
+    readiness_score: Optional[float] = None
     created_at: datetime
 
     class Config:
@@ -35,6 +37,33 @@ class ChatMessage(BaseModel):
         from_attributes = True
 
 
+class ChatSummaryResponse(BaseModel):
+    id: int
+    session_id: Optional[str]
+    summary: str
+    message_count: int
+    first_message_at: Optional[datetime]
+    last_message_at: Optional[datetime]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class AgentEnvelope(BaseModel):
+    """The JSON object the chat model must answer with (see SYSTEM_PROMPT)."""
+
+    tool_to_call: Literal[
+        "generate_workout_plan",
+        "analyze_health_assessment",
+        "fetch_nutrition_data",
+        "adjust_plan_based_on_feedback",
+        "none",
+    ] = "none"
+    tool_arguments: Optional[Dict[str, Any]] = None
+    assistant_reply: Optional[str] = None
+
+
 class ChatResponse(BaseModel):
     reply: str
     tool_used: Optional[str] = None
@@ -52,6 +81,30 @@ class MealAnalysisResponse(BaseModel):
     carbs_g: Optional[float]
     fat_g: Optional[float]
     raw: Dict[str, Any]
+    degraded: bool = False
+
+
+class MealAnalysisBatchRequest(BaseModel):
+    user_id: Optional[int] = None
+    descriptions: List[str] = Field(..., min_length=1, max_length=100)
+
+
+class MealAnalysisBatchItem(BaseModel):
+    index: int
+    description: str
+    meal_id: Optional[int] = None
+    calories: Optional[float] = None
+    protein_g: Optional[float] = None
+    carbs_g: Optional[float] = None
+    fat_g: Optional[float] = None
+    degraded: bool = False
+    error: Optional[str] = None
+
+
+class MealAnalysisBatchResponse(BaseModel):
+    results: List[MealAnalysisBatchItem]
+    succeeded: int
+    failed: int
 
 
 class GeneratePlanRequest(BaseModel):
@@ -65,15 +118,81 @@ class WorkoutPlanResponse(BaseModel):
     user_id: int
     goal: Optional[str]
     plan_json: str
+    revision: int = 0
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class SearchHit(BaseModel):
+    kind: str  # "chat" | "meal"
+    id: int
+    snippet: str
+    body: str
+    ts: Optional[datetime] = None
+    rank: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
+    limit: int
+    offset: int
+
+
+class CohortBenchmark(BaseModel):
+    cohort: str
+    sample_size: int
+    window_days: int
+    values: Dict[str, float]
+    percentiles: Dict[str, int]
+    computed_at: datetime
+    age_seconds: int
+    stale: bool
+
+
 class DashboardData(BaseModel):
     latest_assessment: Optional[HealthAssessmentResponse] = None
     total_workouts: int = 0
     total_meals: int = 0
     total_messages: int = 0
+    cohort_benchmark: Optional[CohortBenchmark] = None
+
+
+class BootstrapSection(BaseModel):
+    version: str
+    # The client's copy (sent as cached=<section>:<version>) is current; no data.
+    not_modified: bool = False
+    data: Optional[Any] = None
 
+
+class BootstrapResponse(BaseModel):
+    sections: Dict[str, BootstrapSection]
+
+
+class ProfileSummary(BaseModel):
+    id: str
+    method: str
+    path: str
+    route: str
+    status: int
+    duration_ms: float
+    samples: int
+    interval_ms: float
+    reason: str  # "header" | "sampled"
+    started_at: datetime
+
+
+class LlmCallTypeUsage(BaseModel):
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    avg_latency_ms: float
+
+
+class LlmUserUsage(BaseModel):
+    user_id: Optional[int] = None
+    total_tokens: int
+    budget: int
+    by_call_type: Dict[str, LlmCallTypeUsage]
@@ -26,6 +26,7 @@ class User(Base):
 
     assessments = relationship("HealthAssessment", back_populates="user")
     chats = relationship("ChatHistory", back_populates="user")
+    chat_summaries = relationship("ChatSummary", back_populates="user")
     workout_plans = relationship("WorkoutPlan", back_populates="user")
     meals = relationship("MealLog", back_populates="user")
 
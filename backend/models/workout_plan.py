@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -7,6 +7,7 @@ from backend.database.session import Base
 
 class WorkoutPlan(Base):
     __tablename__ = "workout_plans"
+    __table_args__ = (Index("ix_workout_plans_user_id_created_at", "user_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -19,4 +20,6 @@ class WorkoutPlan(Base):
     )
 
     user = relationship("User", back_populates="workout_plans")
+    feedback = relationship("PlanFeedback", back_populates="plan")
+    revisions = relationship("PlanRevision", back_populates="plan")
 
@@ -1,10 +1,14 @@
-from . import health_assessment, chat, dashboard, meal_analysis, plans
+from . import admin, bootstrap, health_assessment, chat, dashboard, data_export, meal_analysis, plans, search
 
 __all__ = [
+    "admin",
+    "bootstrap",
     "health_assessment",
     "chat",
     "dashboard",
+    "data_export",
     "meal_analysis",
     "plans",
+    "search",
 ]
 
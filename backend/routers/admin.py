@@ -0,0 +1,42 @@
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from backend.auth.dependencies import require_admin
+from backend.database.session import get_db
+from backend.models.schemas import LlmUserUsage, ProfileSummary
+from backend.services.llm_usage import usage_report
+from backend.services.profiler import list_profiles, load_profile
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles", response_model=List[ProfileSummary])
+def get_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    route: Optional[str] = Query(None, description='Route template, e.g. "/chat"'),
+) -> List[dict]:
+    return list_profiles(limit=limit, route=route)
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str) -> str:
+    """Folded stacks; pipe into flamegraph.pl or open in speedscope."""
+    folded = load_profile(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return folded
+
+
+@router.get("/llm-usage", response_model=List[LlmUserUsage])
+def get_llm_usage(
+    day: Optional[date] = Query(None, description="UTC day; defaults to today"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+) -> List[dict]:
+    """Heaviest Groq users of the day, by call type. Recent calls may not be flushed yet."""
+    return usage_report(db, day or datetime.now(timezone.utc).date(), limit=limit)
@@ -0,0 +1,211 @@
+"""
+Everything the app renders on launch, in one request.
+
+    GET /bootstrap?sections=profile,plan&fields=plan.goal,plan.revision&cached=profile:<version>
+
+Sections (all by default): profile, counters, assessment, plan, meals.
+Each one is loaded concurrently on its own read session and carries a
+version. A client that sends back ``cached=<section>:<version>`` for a
+copy it already holds gets ``not_modified: true`` instead of the data (and,
+for the plan, the server skips materializing it). ``fields`` trims each
+section to the listed keys; the selection is part of the version.
+"""
+import asyncio
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+
+from backend.auth.dependencies import get_current_user_read, reads_from_primary
+from backend.database.session import open_read_session
+from backend.models import MealLog, User
+from backend.models.auth_schemas import UserOut
+from backend.models.schemas import BootstrapResponse, BootstrapSection, HealthAssessmentResponse, WorkoutPlanResponse
+from backend.routers.dashboard import _dashboard_version
+from backend.services.health_assessment_service import get_latest_assessment
+from backend.services.plan_service import get_latest_plan, materialize_plan, plan_view
+from backend.utils.http_cache import make_etag
+
+
+router = APIRouter(prefix="/bootstrap", tags=["bootstrap"])
+
+SECTIONS = ("profile", "counters", "assessment", "plan", "meals")
+RECENT_MEALS_DEFAULT = 10
+RECENT_MEALS_MAX = 50
+
+# A section loader returns (version parts, build); build() runs only when the
+# client's cached copy is stale.
+Loader = Callable[[Session, int], Tuple[Sequence[Any], Callable[[], Any]]]
+
+
+def _counters(db: Session, user_id: int):
+    version = _dashboard_version(db, user_id)
+    total_workouts, _, total_meals, _, total_messages, *_ = version
+    data = {
+        "total_workouts": total_workouts or 0,
+        "total_meals": total_meals or 0,
+        "total_messages": total_messages or 0,
+    }
+    return tuple(version), lambda: data
+
+
+def _assessment(db: Session, user_id: int):
+    latest = get_latest_assessment(db, user_id)
+    if latest is None:
+        return (None,), lambda: None
+    data = HealthAssessmentResponse.model_validate(latest).model_dump(mode="json")
+    return (latest.id, latest.summary, latest.risk_score, latest.readiness_score), lambda: data
+
+
+def _plan(db: Session, user_id: int):
+    plan = get_latest_plan(db, user_id)
+    if plan is None:
+        return (None,), lambda: None
+
+    def build():
+        plan_data, resolved = materialize_plan(db, plan)
+        return WorkoutPlanResponse(
+            id=plan.id,
+            user_id=plan.user_id,
+            goal=plan.goal,
+            plan_json=json.dumps(plan_view(plan_data)),
+            revision=resolved,
+            created_at=plan.created_at,
+        ).model_dump(mode="json")
+
+    # Feedback revisions don't change what is served; see routers/plans.py.
+    return (plan.id, plan.updated_at), build
+
+
+def _meals_loader(limit: int) -> Loader:
+    def load(db: Session, user_id: int):
+        rows = (
+            db.query(
+                MealLog.id,
+                MealLog.description,
+                MealLog.calories,
+                MealLog.protein_g,
+                MealLog.carbs_g,
+                MealLog.fat_g,
+                MealLog.logged_at,
+            )
+            .filter(MealLog.user_id == user_id)
+            .order_by(MealLog.logged_at.desc())
+            .limit(limit)
+            .all()
+        )
+        data = [
+            {
+                "id": row.id,
+                "description": row.description,
+                "calories": row.calories,
+                "protein_g": row.protein_g,
+                "carbs_g": row.carbs_g,
+                "fat_g": row.fat_g,
+                "logged_at": row.logged_at.isoformat() if row.logged_at else None,
+            }
+            for row in rows
+        ]
+        # The rows are tiny and already loaded; version them by content.
+        return (limit, data), lambda: data
+
+    return load
+
+
+def _select_fields(data: Any, fields: Optional[Set[str]]) -> Any:
+    if not fields or data is None:
+        return data
+    if isinstance(data, list):
+        return [_select_fields(item, fields) for item in data]
+    return {key: value for key, value in data.items() if key in fields}
+
+
+def _section(
+    version_parts: Sequence[Any],
+    build: Callable[[], Any],
+    fields: Optional[Set[str]],
+    cached: Optional[str],
+) -> BootstrapSection:
+    version = make_etag(*version_parts, sorted(fields or ())).strip('"')
+    if cached == version:
+        return BootstrapSection(version=version, not_modified=True)
+    return BootstrapSection(version=version, data=_select_fields(build(), fields))
+
+
+def _load_section(
+    loader: Loader,
+    primary: bool,
+    user_id: int,
+    fields: Optional[Set[str]],
+    cached: Optional[str],
+) -> BootstrapSection:
+    # Sessions aren't thread-safe, so each concurrent section gets its own.
+    db = open_read_session(primary)
+    try:
+        version_parts, build = loader(db, user_id)
+        return _section(version_parts, build, fields, cached)
+    finally:
+        db.close()
+
+
+def _split(values: List[str]) -> List[str]:
+    return [item.strip() for value in values for item in value.split(",") if item.strip()]
+
+
+def _parse_prefixed(values: List[str], sep: str, param: str) -> Dict[str, List[str]]:
+    parsed: Dict[str, List[str]] = {}
+    for item in _split(values):
+        section, _, rest = item.partition(sep)
+        if section not in SECTIONS or not rest:
+            raise HTTPException(status_code=422, detail=f"Invalid {param} entry: {item!r}")
+        parsed.setdefault(section, []).append(rest)
+    return parsed
+
+
+@router.get("", response_model=BootstrapResponse)
+async def bootstrap(
+    request: Request,
+    sections: List[str] = Query(default=[], description="Comma-separated sections; all when omitted"),
+    fields: List[str] = Query(default=[], description="section.field entries, e.g. plan.goal"),
+    cached: List[str] = Query(default=[], description="section:version of copies the client holds"),
+    meals_limit: int = Query(default=RECENT_MEALS_DEFAULT, ge=1, le=RECENT_MEALS_MAX),
+    current_user: User = Depends(get_current_user_read),
+) -> Any:
+    requested = _split(sections) or list(SECTIONS)
+    unknown = [name for name in requested if name not in SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown sections: {', '.join(unknown)}")
+    selected = {name: set(keys) for name, keys in _parse_prefixed(fields, ".", "fields").items()}
+    known = {name: versions[-1] for name, versions in _parse_prefixed(cached, ":", "cached").items()}
+
+    user_id = current_user.id
+    result: Dict[str, BootstrapSection] = {}
+    if "profile" in requested:
+        # Already loaded by authentication; no query needed.
+        profile = UserOut.model_validate(current_user).model_dump(mode="json")
+        result["profile"] = _section(
+            (current_user.id, current_user.updated_at, profile),
+            lambda: profile,
+            selected.get("profile"),
+            known.get("profile"),
+        )
+
+    loaders: Dict[str, Loader] = {
+        "counters": _counters,
+        "assessment": _assessment,
+        "plan": _plan,
+        "meals": _meals_loader(meals_limit),
+    }
+    primary = reads_from_primary(request, user_id)
+    names = [name for name in SECTIONS if name in requested and name in loaders]
+    loaded = await asyncio.gather(
+        *(
+            asyncio.to_thread(
+                _load_section, loaders[name], primary, user_id, selected.get(name), known.get(name)
+            )
+            for name in names
+        )
+    )
+    result.update(zip(names, loaded))
+    return BootstrapResponse(sections={name: result[name] for name in SECTIONS if name in result})
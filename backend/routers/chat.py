@@ -1,13 +1,21 @@
-from typing import Any
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, WebSocket
 from sqlalchemy.orm import Session
 
 from backend.agents.aromi_agent import AromiAgent
 from backend.auth.dependencies import get_current_user
 from backend.database.session import get_db
-from backend.models import User
-from backend.models.schemas import ChatRequest, ChatResponse
+from backend.models import ChatSummary, User
+from backend.models.schemas import (
+    ChatMessage,
+    ChatRequest,
+    ChatResponse,
+    ChatSummaryResponse,
+)
+from backend.services.chat_compaction import load_archived_messages
+from backend.services.chat_socket import ChatConnection
+from backend.utils.idempotency import IdempotentRequest, get_idempotency
 
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -18,10 +26,49 @@ async def aromi_chat(
     payload: ChatRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(get_idempotency),
 ) -> Any:
+    if (replay := await idempotency.replay()) is not None:
+        return replay
     # Use logged-in user only
     payload = payload.model_copy(update={"user_id": current_user.id})
     agent = AromiAgent()
     response, _ = await agent.chat(db, payload)
-    return response
+    return idempotency.save(response)
 
+
+@router.websocket("/ws")
+async def aromi_chat_socket(websocket: WebSocket, session_id: Optional[str] = None) -> None:
+    """Long-lived chat: authenticate once, then exchange JSON frames (see chat_socket)."""
+    await ChatConnection(websocket, session_id).run()
+
+
+@router.get("/summaries", response_model=List[ChatSummaryResponse])
+def list_chat_summaries(
+    session_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    q = db.query(ChatSummary).filter(ChatSummary.user_id == current_user.id)
+    if session_id:
+        q = q.filter(ChatSummary.session_id == session_id)
+    return q.order_by(ChatSummary.id.desc()).all()
+
+
+@router.get("/summaries/{summary_id}/messages", response_model=List[ChatMessage])
+def get_archived_messages(
+    summary_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    summary = (
+        db.query(ChatSummary)
+        .filter(ChatSummary.id == summary_id, ChatSummary.user_id == current_user.id)
+        .first()
+    )
+    if not summary:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    try:
+        return load_archived_messages(summary)
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="Archive is no longer available")
@@ -1,53 +1,86 @@
 from typing import Any
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from backend.auth.dependencies import get_current_user
-from backend.database.session import get_db
-from backend.models import ChatHistory, MealLog, User, WorkoutPlan
+from backend.auth.dependencies import get_current_user_read, get_read_db
+from backend.models import ChatHistory, HealthAssessment, MealLog, User, WorkoutPlan
 from backend.models.schemas import DashboardData, HealthAssessmentResponse
+from backend.services.cohort_stats import benchmark_user, get_snapshot, is_stale, user_metrics
 from backend.services.health_assessment_service import get_latest_assessment
+from backend.utils.http_cache import CACHE_DASHBOARD, conditional_response, make_etag
 
 
 router = APIRouter(prefix="/dashboard-data", tags=["dashboard"])
 
 
+def _dashboard_version(db: Session, user_id: int):
+    """Counters plus newest row ids per table and the latest scores, in a single round trip."""
+
+    def count_and_max(model):
+        return (
+            select(func.count(model.id)).where(model.user_id == user_id).scalar_subquery(),
+            select(func.max(model.id)).where(model.user_id == user_id).scalar_subquery(),
+        )
+
+    columns = []
+    for model in (WorkoutPlan, MealLog, ChatHistory):
+        columns.extend(count_and_max(model))
+    columns.append(
+        select(func.max(HealthAssessment.id))
+        .where(HealthAssessment.user_id == user_id)
+        .scalar_subquery()
+    )
+    # rescore_assessments() rewrites scores in place, so the id alone can't
+    # tell a client its cached copy is stale.
+    for column in (
+        HealthAssessment.risk_score,
+        HealthAssessment.readiness_score,
+        HealthAssessment.scoring_version,
+    ):
+        columns.append(
+            select(column)
+            .where(HealthAssessment.user_id == user_id)
+            .order_by(HealthAssessment.created_at.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+    return db.execute(select(*columns)).one()
+
+
 @router.get("", response_model=DashboardData)
 def get_dashboard_data(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read),
 ) -> Any:
     resolved_user_id = current_user.id
+    version = _dashboard_version(db, resolved_user_id)
+    # Benchmarks change when the cohort table is refreshed, not only on user writes.
+    cohort_computed_at, _ = get_snapshot()
+    cohort_version = (cohort_computed_at, cohort_computed_at and is_stale(cohort_computed_at))
+    not_modified = conditional_response(
+        request,
+        response,
+        etag=make_etag("dashboard", resolved_user_id, *version, *cohort_version, current_user.updated_at),
+        cache_control=CACHE_DASHBOARD,
+    )
+    if not_modified is not None:
+        return not_modified
+
+    total_workouts, _, total_meals, _, total_messages, *_ = version
     latest_assessment = get_latest_assessment(db, resolved_user_id)
     latest_assessment_schema = (
         HealthAssessmentResponse.model_validate(latest_assessment)
         if latest_assessment
         else None
     )
-    total_workouts = (
-        db.query(func.count(WorkoutPlan.id))
-        .filter(WorkoutPlan.user_id == resolved_user_id)
-        .scalar()
-        or 0
-    )
-    total_meals = (
-        db.query(func.count(MealLog.id))
-        .filter(MealLog.user_id == resolved_user_id)
-        .scalar()
-        or 0
-    )
-    total_messages = (
-        db.query(func.count(ChatHistory.id))
-        .filter(ChatHistory.user_id == resolved_user_id)
-        .scalar()
-        or 0
-    )
     return DashboardData(
         latest_assessment=latest_assessment_schema,
-        total_workouts=total_workouts,
-        total_meals=total_meals,
-        total_messages=total_messages,
+        total_workouts=total_workouts or 0,
+        total_meals=total_meals or 0,
+        total_messages=total_messages or 0,
+        cohort_benchmark=benchmark_user(current_user, user_metrics(db, resolved_user_id)),
     )
-
@@ -0,0 +1,45 @@
+import gzip
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from backend.auth.dependencies import get_current_user
+from backend.database.session import get_db
+from backend.models import User
+from backend.services.export_service import import_records, stream_export
+
+
+router = APIRouter(prefix="/data", tags=["data"])
+
+
+@router.get("/export")
+def export_data(
+    compress: bool = False,
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    # stream_export opens its own session: the request-scoped one may be
+    # closed before the body has finished streaming.
+    filename = f"arogyamitra-user-{current_user.id}.ndjson" + (".gz" if compress else "")
+    return StreamingResponse(
+        stream_export(current_user.id, compress=compress),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import")
+def import_data(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Dict[str, int]:
+    fh = file.file
+    if (file.filename or "").endswith(".gz"):
+        fh = gzip.GzipFile(fileobj=fh, mode="rb")
+    try:
+        return import_records(db, fh, user_id=current_user.id)
+    except (ValueError, KeyError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Invalid export file: {e}")
@@ -9,6 +9,8 @@ from backend.database.session import get_db
 from backend.models import User
 from backend.models.schemas import HealthAssessmentCreate, HealthAssessmentResponse
 from backend.services.health_assessment_service import create_health_assessment
+from backend.services.risk_scoring import score_answers
+from backend.utils.idempotency import IdempotentRequest, get_idempotency
 
 
 router = APIRouter(prefix="/health-assessment", tags=["health-assessment"])
@@ -23,11 +25,15 @@ async def submit_assessment(
     payload: HealthAssessmentCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(get_idempotency),
 ) -> Any:
+    if (replay := await idempotency.replay()) is not None:
+        return replay
     # Use logged-in user only
     payload = payload.model_copy(update={"user_id": current_user.id})
+    scores = score_answers(payload.answers)
     agent = AromiAgent()
-    summary = await agent.analyze_health_assessment(db, payload, current_user.id)
-    assessment = create_health_assessment(db, payload, summary=summary)
-    return HealthAssessmentResponse.model_validate(assessment)
+    summary = await agent.analyze_health_assessment(db, payload, current_user.id, scores=scores)
+    assessment = create_health_assessment(db, payload, summary=summary, scores=scores)
+    return idempotency.save(HealthAssessmentResponse.model_validate(assessment), status_code=201)
 
@@ -6,8 +6,15 @@ from sqlalchemy.orm import Session
 from backend.auth.dependencies import get_current_user
 from backend.database.session import get_db
 from backend.models import User
-from backend.models.schemas import MealAnalysisRequest, MealAnalysisResponse
-from backend.services.nutrition_service import log_meal
+from backend.models.schemas import (
+    MealAnalysisBatchItem,
+    MealAnalysisBatchRequest,
+    MealAnalysisBatchResponse,
+    MealAnalysisRequest,
+    MealAnalysisResponse,
+)
+from backend.services.nutrition_service import log_meal, log_meals_batch
+from backend.utils.idempotency import IdempotentRequest, get_idempotency
 
 
 router = APIRouter(prefix="/meal-analysis", tags=["nutrition"])
@@ -18,16 +25,41 @@ async def analyze_meal(
     payload: MealAnalysisRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(get_idempotency),
 ) -> Any:
     if not payload.description:
         raise HTTPException(status_code=400, detail="description is required")
-    meal = await log_meal(db, current_user.id, payload.description)
+    if (replay := await idempotency.replay()) is not None:
+        return replay
+    meal, degraded = await log_meal(db, current_user.id, payload.description)
 
-    return MealAnalysisResponse(
+    response = MealAnalysisResponse(
         calories=meal.calories,
         protein_g=meal.protein_g,
         carbs_g=meal.carbs_g,
         fat_g=meal.fat_g,
         raw={},  # keep payload small for dashboard; frontend can call another endpoint if needed
+        degraded=degraded,
     )
+    return idempotency.save(response, status_code=status.HTTP_201_CREATED)
 
+
+@router.post("/batch", response_model=MealAnalysisBatchResponse)
+async def analyze_meals_batch(
+    payload: MealAnalysisBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(get_idempotency),
+) -> Any:
+    if (replay := await idempotency.replay()) is not None:
+        return replay
+    # 200 with per-entry status: a partial failure shouldn't make clients resend the whole day
+    results = await log_meals_batch(db, current_user.id, payload.descriptions)
+    items = [MealAnalysisBatchItem(**r) for r in results]
+    failed = sum(1 for item in items if item.error is not None)
+    response = MealAnalysisBatchResponse(
+        results=items,
+        succeeded=len(items) - failed,
+        failed=failed,
+    )
+    return idempotency.save(response)
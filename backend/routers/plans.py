@@ -1,13 +1,22 @@
-from typing import Any
+import json
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 
 from backend.agents.aromi_agent import AromiAgent
-from backend.auth.dependencies import get_current_user
+from backend.auth.dependencies import get_current_user, get_current_user_read, get_read_db
 from backend.database.session import get_db
 from backend.models import User, WorkoutPlan
 from backend.models.schemas import GeneratePlanRequest, WorkoutPlanResponse
+from backend.services.plan_service import get_plan_version, materialize_plan, plan_view
+from backend.utils.http_cache import (
+    CACHE_PLAN_LATEST,
+    CACHE_PLAN_REVISION,
+    conditional_response,
+    make_etag,
+)
+from backend.utils.idempotency import IdempotentRequest, get_idempotency
 
 
 router = APIRouter(prefix="/generate-plan", tags=["plans"])
@@ -18,21 +27,52 @@ async def generate_plan(
     payload: GeneratePlanRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(get_idempotency),
 ) -> Any:
+    if (replay := await idempotency.replay()) is not None:
+        return replay
     payload = payload.model_copy(update={"user_id": current_user.id})
     agent = AromiAgent()
     plan = agent.generate_workout_plan(db, payload, current_user.id)
-    return WorkoutPlanResponse.model_validate(plan)
+    return idempotency.save(WorkoutPlanResponse.model_validate(plan), status_code=status.HTTP_201_CREATED)
 
 
 @router.get("/{plan_id}", response_model=WorkoutPlanResponse)
 def get_plan(
     plan_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    revision: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read),
 ) -> Any:
     plan = db.query(WorkoutPlan).filter(WorkoutPlan.id == plan_id, WorkoutPlan.user_id == current_user.id).first()
     if not plan:
         raise HTTPException(status_code=404, detail="Plan not found")
-    return WorkoutPlanResponse.model_validate(plan)
 
+    latest_revision, _ = get_plan_version(db, plan.id)
+    if revision is not None and not 0 <= revision <= latest_revision:
+        raise HTTPException(status_code=404, detail="Plan revision not found")
+    resolved = latest_revision if revision is None else revision
+    # Revisions only add feedback, which plan reads leave out, so the
+    # validators follow the plan itself. A revalidated copy can carry an
+    # older revision number for the same content.
+    not_modified = conditional_response(
+        request,
+        response,
+        etag=make_etag("plan", plan.id, plan.updated_at),
+        cache_control=CACHE_PLAN_LATEST if revision is None else CACHE_PLAN_REVISION,
+        last_modified=plan.updated_at if revision is None else None,
+    )
+    if not_modified is not None:
+        return not_modified
+
+    plan_data, resolved_revision = materialize_plan(db, plan, resolved)
+    return WorkoutPlanResponse(
+        id=plan.id,
+        user_id=plan.user_id,
+        goal=plan.goal,
+        plan_json=json.dumps(plan_view(plan_data)),
+        revision=resolved_revision,
+        created_at=plan.created_at,
+    )
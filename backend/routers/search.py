@@ -0,0 +1,32 @@
+from typing import Any, Literal
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from backend.auth.dependencies import get_current_user
+from backend.database.session import get_db
+from backend.models import User
+from backend.models.schemas import SearchHit, SearchResponse
+from backend.services.search_service import search_user_content
+
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    scope: Literal["all", "chat", "meal"] = "all",
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    kinds = ["chat", "meal"] if scope == "all" else [scope]
+    hits = search_user_content(db, current_user.id, q, kinds=kinds, limit=limit, offset=offset)
+    return SearchResponse(
+        query=q,
+        results=[SearchHit(**hit) for hit in hits],
+        limit=limit,
+        offset=offset,
+    )
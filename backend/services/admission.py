@@ -0,0 +1,191 @@
+"""
+Admission control: per-route-class concurrency limits with bounded queues.
+
+Every HTTP request is put in a class by method and path prefix:
+
+    llm        Groq-backed: POST /chat, POST /health-assessment
+    upstream   CalorieNinjas-backed: POST /meal-analysis[/batch]
+    exempt     /health and /health/* probes (never limited)
+    default    everything else (auth, dashboard, plans, search, ...)
+
+Each class has its own gate, so classes never share capacity. When Groq
+slows down, chat requests fill the llm gate, but /auth/me and
+/dashboard-data still get default slots. Within a gate, at most
+"concurrency" requests run. Up to "queue" more wait, first in first out,
+for at most "queue_timeout_ms". Any other request gets an immediate 503
+with a Retry-After estimated from the class's recent service time, so
+overload turns into fast, retryable refusals instead of piling up work
+that will time out anyway.
+
+Limits are per worker process (ADMISSION_LIMITS). WebSocket connections
+are not gated here; /chat/ws has its own connection limits.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from backend.utils.config import ADMISSION_CONTROL_ENABLED, ADMISSION_LIMITS
+
+CLASS_LLM = "llm"
+CLASS_UPSTREAM = "upstream"
+CLASS_DEFAULT = "default"
+CLASS_EXEMPT = "exempt"
+
+# (method or None for any, path prefix, class); first match wins.
+ROUTE_CLASSES: Tuple[Tuple[Optional[str], str, str], ...] = (
+    (None, "/health", CLASS_EXEMPT),
+    ("POST", "/chat", CLASS_LLM),
+    ("POST", "/health-assessment", CLASS_LLM),
+    ("POST", "/meal-analysis", CLASS_UPSTREAM),
+)
+
+MAX_RETRY_AFTER_SECONDS = 60
+# Weight of the newest request in the per-class service time average.
+SERVICE_TIME_ALPHA = 0.2
+
+
+def route_class(method: str, path: str) -> str:
+    for rule_method, prefix, klass in ROUTE_CLASSES:
+        if rule_method is not None and rule_method != method:
+            continue
+        # Match whole segments: "/health" must not swallow "/health-assessment".
+        if path == prefix or path.startswith(prefix + "/"):
+            return klass
+    return CLASS_DEFAULT
+
+
+class Gate:
+    """A FIFO semaphore with a bounded wait queue, for one event loop."""
+
+    def __init__(self, name: str, concurrency: int, queue: int, queue_timeout_ms: float):
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.queue = max(0, int(queue))
+        self.queue_timeout = max(0.0, queue_timeout_ms / 1000)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.service_time = 0.0  # seconds, moving average
+        self.admitted = self.rejected_full = self.rejected_timeout = 0
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in line if needed. False means shed the request."""
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue:
+            self.rejected_full += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            self.rejected_timeout += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self, service_time: float) -> None:
+        if self.service_time:
+            self.service_time += SERVICE_TIME_ALPHA * (service_time - self.service_time)
+        else:
+            self.service_time = service_time
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        # Hand the slot straight to the next waiter so nobody can jump the queue.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have cleared."""
+        backlog = self.in_flight + len(self._waiters)
+        estimate = self.service_time * backlog / self.concurrency
+        return min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(estimate)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "concurrency": self.concurrency,
+            "queue": self.queue,
+            "queue_timeout_ms": round(self.queue_timeout * 1000),
+            "avg_service_ms": round(self.service_time * 1000, 1),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_queue_timeout": self.rejected_timeout,
+        }
+
+
+def _build_gates() -> Dict[str, Gate]:
+    gates = {}
+    for name in (CLASS_LLM, CLASS_UPSTREAM, CLASS_DEFAULT):
+        limits = ADMISSION_LIMITS.get(name) or ADMISSION_LIMITS.get(CLASS_DEFAULT) or {}
+        gates[name] = Gate(
+            name,
+            limits.get("concurrency", 64),
+            limits.get("queue", 64),
+            limits.get("queue_timeout_ms", 2000),
+        )
+    return gates
+
+
+gates: Dict[str, Gate] = _build_gates()
+
+
+def admission_stats() -> Dict[str, Any]:
+    return {"enabled": ADMISSION_CONTROL_ENABLED, "classes": {name: gate.stats() for name, gate in gates.items()}}
+
+
+async def _reject(send, gate: Gate) -> None:
+    body = json.dumps({"detail": "Server is busy, please retry shortly"}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(gate.retry_after()).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Pure ASGI, so a shed request costs no routing, auth or body parsing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_CONTROL_ENABLED:
+            return await self.app(scope, receive, send)
+        klass = route_class(scope["method"], scope["path"])
+        if klass == CLASS_EXEMPT:
+            return await self.app(scope, receive, send)
+        gate = gates[klass]
+        if not await gate.acquire():
+            return await _reject(send, gate)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(time.perf_counter() - started)
@@ -0,0 +1,231 @@
+"""
+Chat history retention: condense old chat_history rows into ChatSummary
+records, move the raw rows to gzip NDJSON archive files and delete them
+from the hot table.
+
+    python -m backend.services.chat_compaction [--user-id 7]
+
+Archive files use the export format, so they can be re-imported with
+backend.services.export_service if a conversation has to be restored.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from backend.database.session import SessionLocal, engine
+from backend.models import ChatHistory, ChatRetentionPolicy, ChatSummary
+from backend.services.chat_window_cache import window_cache
+from backend.services.export_service import iter_ndjson
+from backend.utils.config import (
+    CHAT_ARCHIVE_DIR,
+    CHAT_MAX_HOT_MESSAGES,
+    CHAT_RETENTION_DAYS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows compacted per round; each round is its own transaction.
+COMPACTION_BATCH_SIZE = 5000
+# Pages freed per PRAGMA incremental_vacuum call (SQLite, auto_vacuum=INCREMENTAL).
+VACUUM_PAGES_PER_RUN = 2000
+SUMMARY_EXCERPTS = 5
+EXCERPT_CHARS = 160
+
+
+def get_retention_policy(db: Session, user_id: int) -> Tuple[int, int]:
+    policy = db.get(ChatRetentionPolicy, user_id)
+    retain_days = policy.retain_days if policy and policy.retain_days is not None else CHAT_RETENTION_DAYS
+    max_hot = (
+        policy.max_hot_messages
+        if policy and policy.max_hot_messages is not None
+        else CHAT_MAX_HOT_MESSAGES
+    )
+    return retain_days, max_hot
+
+
+def _excerpt(message: str) -> str:
+    message = " ".join(message.split())
+    return message if len(message) <= EXCERPT_CHARS else message[: EXCERPT_CHARS - 1] + "…"
+
+
+def summarize_messages(rows: List[ChatHistory]) -> str:
+    """Cheap extractive summary; good enough as agent context for old sessions."""
+    first, last = rows[0].created_at, rows[-1].created_at
+    span = ""
+    if first and last:
+        span = f", {first:%Y-%m-%d} to {last:%Y-%m-%d}"
+    user_msgs = [r.message for r in rows if r.role == "user" and r.message]
+    # Spread excerpts across the whole session rather than only its start.
+    step = max(len(user_msgs) // SUMMARY_EXCERPTS, 1)
+    picked = user_msgs[::step][:SUMMARY_EXCERPTS]
+    parts = [f"Earlier conversation ({len(rows)} messages{span})."]
+    if picked:
+        parts.append("The user said: " + " | ".join(f'"{_excerpt(m)}"' for m in picked) + ".")
+    replies = [r.message for r in rows if r.role == "assistant" and r.message]
+    if replies:
+        parts.append(f'Last coach reply: "{_excerpt(replies[-1])}".')
+    return " ".join(parts)
+
+
+def _archive_path(user_id: int, session_id: Optional[str], first_id: int, last_id: int) -> str:
+    session = re.sub(r"[^A-Za-z0-9_-]", "_", session_id) if session_id else "nosession"
+    return os.path.join(CHAT_ARCHIVE_DIR, f"user_{user_id}", f"{session}_{first_id}_{last_id}.ndjson.gz")
+
+
+def _write_archive(path: str, rows: List[ChatHistory]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    records = (
+        {
+            "type": "chat_history",
+            "data": {
+                "id": r.id,
+                "user_id": r.user_id,
+                "session_id": r.session_id,
+                "role": r.role,
+                "message": r.message,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+            },
+        }
+        for r in rows
+    )
+    # Write to a temp name first so a crash never leaves a truncated archive
+    # next to rows that were already deleted.
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wb") as fh:
+        for chunk in iter_ndjson(records):
+            fh.write(chunk)
+    os.replace(tmp_path, path)
+
+
+def load_archived_messages(summary: ChatSummary) -> List[Dict[str, Any]]:
+    with gzip.open(summary.archive_path, "rb") as fh:
+        return [json.loads(line)["data"] for line in fh if line.strip()]
+
+
+def _compactable_filter(db: Session, user_id: int, retain_days: int, max_hot: int, now: datetime):
+    cutoff = now - timedelta(days=retain_days)
+    conditions = [ChatHistory.created_at < cutoff]
+    # Oldest id still allowed in the hot table under the per-user cap.
+    keep_from_id = (
+        db.query(ChatHistory.id)
+        .filter(ChatHistory.user_id == user_id)
+        .order_by(ChatHistory.id.desc())
+        .offset(max(max_hot - 1, 0))
+        .limit(1)
+        .scalar()
+    )
+    if keep_from_id is not None:
+        conditions.append(ChatHistory.id < keep_from_id)
+    return or_(*conditions)
+
+
+def compact_user_history(db: Session, user_id: int, now: Optional[datetime] = None) -> int:
+    """Archive + summarize this user's out-of-policy messages. Returns rows archived."""
+    # CURRENT_TIMESTAMP in SQLite is naive UTC; compare like with like.
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    retain_days, max_hot = get_retention_policy(db, user_id)
+    condition = _compactable_filter(db, user_id, retain_days, max_hot, now)
+
+    archived = 0
+    while True:
+        rows = (
+            db.query(ChatHistory)
+            .filter(ChatHistory.user_id == user_id, condition)
+            .order_by(ChatHistory.id.asc())
+            .limit(COMPACTION_BATCH_SIZE)
+            .all()
+        )
+        if not rows:
+            break
+        by_session: Dict[Optional[str], List[ChatHistory]] = {}
+        for row in rows:
+            by_session.setdefault(row.session_id, []).append(row)
+
+        for session_id, session_rows in by_session.items():
+            path = _archive_path(user_id, session_id, session_rows[0].id, session_rows[-1].id)
+            _write_archive(path, session_rows)
+            db.add(
+                ChatSummary(
+                    user_id=user_id,
+                    session_id=session_id,
+                    summary=summarize_messages(session_rows),
+                    message_count=len(session_rows),
+                    first_message_at=session_rows[0].created_at,
+                    last_message_at=session_rows[-1].created_at,
+                    archive_path=path,
+                )
+            )
+            db.query(ChatHistory).filter(
+                ChatHistory.id.in_([r.id for r in session_rows])
+            ).delete(synchronize_session=False)
+        db.commit()
+        db.expunge_all()
+        window_cache.invalidate_user(user_id)  # cached windows may hold archived rows
+        archived += len(rows)
+        if len(rows) < COMPACTION_BATCH_SIZE:
+            break
+    return archived
+
+
+def incremental_vacuum(db: Session) -> None:
+    """Give freed pages back a bit at a time instead of a blocking full VACUUM."""
+    if engine.dialect.name == "sqlite":
+        db.commit()
+        # The pragma frees one page per step, and cursor.execute() steps a
+        # row-less statement only once; executescript() runs it to completion.
+        raw = db.connection().connection.dbapi_connection
+        raw.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_RUN});")
+        db.commit()
+
+
+def run_compaction(user_id: Optional[int] = None) -> Dict[int, int]:
+    db = SessionLocal()
+    try:
+        if user_id is not None:
+            user_ids = [user_id]
+        else:
+            user_ids = [uid for (uid,) in db.query(ChatHistory.user_id).distinct()]
+        results = {}
+        for uid in user_ids:
+            archived = compact_user_history(db, uid)
+            if archived:
+                results[uid] = archived
+                logger.info("Compacted %d chat rows for user %d", archived, uid)
+        if results:
+            incremental_vacuum(db)
+        return results
+    finally:
+        db.close()
+
+
+async def compaction_loop(interval_seconds: int) -> None:
+    """Background task: run compaction off the event loop every interval."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(run_compaction)
+        except Exception:  # noqa: BLE001
+            logger.exception("Chat compaction failed")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args(argv)
+    results = run_compaction(args.user_id)
+    print(f"Archived {sum(results.values())} messages for {len(results)} users")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+/chat/ws: one authenticated WebSocket per chat session.
+
+The connection authenticates once, keeps its AromiAgent for its whole
+life, warms the session's chat window cache and answers messages one at
+a time. JSON text frames:
+
+    client  {"type": "auth", "token": "<jwt>"}   first frame, unless an
+                                                  Authorization header was sent
+    server  {"type": "ready", "user_id": 7, "session_id": "..."}
+    client  {"type": "message", "id": "c1", "message": "I ate 2 rotis"}
+    server  {"type": "ack", "id": "c1", "queued": 0}
+            {"type": "reply", "id": "c1", "reply": "..."}    model text, before tools run
+            {"type": "tool", "id": "c1", "tool_used": ..., "tool_result": ...}
+            {"type": "done", "id": "c1", "reply": ..., "tool_used": ..., "tool_result": ...}
+            {"type": "error", "id": "c1", "code": "busy", "detail": "..."}
+    client  {"type": "ping"}  ->  server {"type": "pong"}
+
+Backpressure: at most WS_MAX_PENDING_MESSAGES wait behind the one being
+answered; more are rejected with code "busy" instead of buffering without
+bound. A client that doesn't read its frames within WS_SEND_TIMEOUT_SECONDS
+is disconnected.
+
+A message is answered once it is acked: when the client disconnects, is
+cut off, or the connection hits a limit, no new messages are read, but the
+turns already accepted run to completion (and are persisted) for up to
+WS_DRAIN_SECONDS, with their frames dropped if nobody is listening.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+
+from backend.agents.aromi_agent import AromiAgent
+from backend.database.session import SessionLocal
+from backend.models import User
+from backend.models.schemas import ChatRequest
+from backend.services.llm_usage import LlmBudgetExceeded
+from backend.services.rate_limiter import UpstreamRateLimited
+from backend.utils.auth import decode_access_token
+from backend.utils.config import (
+    WS_AUTH_TIMEOUT_SECONDS,
+    WS_DRAIN_SECONDS,
+    WS_IDLE_TIMEOUT_SECONDS,
+    WS_MAX_MESSAGE_CHARS,
+    WS_MAX_MESSAGES_PER_CONNECTION,
+    WS_MAX_MESSAGES_PER_MINUTE,
+    WS_MAX_PENDING_MESSAGES,
+    WS_SEND_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Application close code for "token expired, re-authenticate".
+CLOSE_TOKEN_EXPIRED = 4401
+
+
+class ChatConnection:
+    def __init__(self, websocket: WebSocket, session_id: Optional[str] = None):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.user_id: Optional[int] = None
+        self.token_expires_at: Optional[float] = None
+        self.agent: Optional[AromiAgent] = None
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=WS_MAX_PENDING_MESSAGES)
+        self.busy = False
+        self.received = 0
+        self._recent: Deque[float] = deque()
+        # The client left or stopped reading; frames are dropped from then on.
+        self.client_gone = False
+        self._reader: Optional[asyncio.Task] = None
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        """Send a frame; never raises, so a vanished client can't abort a turn."""
+        if self.client_gone:
+            return
+        try:
+            await asyncio.wait_for(self.websocket.send_json(frame), WS_SEND_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, WebSocketDisconnect, RuntimeError):
+            self.client_gone = True
+            # Stop accepting messages; accepted ones still drain in run().
+            if self._reader is not None and self._reader is not asyncio.current_task():
+                self._reader.cancel()
+
+    async def error(self, code: str, detail: str, message_id: Any = None, **extra: Any) -> None:
+        await self.send({"type": "error", "id": message_id, "code": code, "detail": detail, **extra})
+
+    # ---- lifecycle ----
+
+    async def run(self) -> None:
+        await self.websocket.accept()
+        if not await self._authenticate():
+            return
+        self.agent = AromiAgent()
+        db = SessionLocal()
+        try:
+            self.agent.load_chat_window(db, self.user_id, self.session_id)
+        finally:
+            db.close()
+        await self.send({"type": "ready", "user_id": self.user_id, "session_id": self.session_id})
+
+        reader = self._reader = asyncio.create_task(self._read_loop())
+        worker = asyncio.create_task(self._work_loop())
+        await asyncio.wait({reader, worker}, return_when=asyncio.FIRST_COMPLETED)
+        if reader.done() and not worker.done():
+            # No new messages, but acked ones are answered and persisted;
+            # cancelling them would lose turns whose tokens are already spent.
+            try:
+                await asyncio.wait_for(asyncio.shield(self.queue.join()), WS_DRAIN_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Chat socket for user %s still busy after %.0fs; cancelling %d message(s)",
+                    self.user_id, WS_DRAIN_SECONDS, self.queue.qsize() + int(self.busy),
+                )
+        for task in (reader, worker):
+            task.cancel()
+        await asyncio.gather(reader, worker, return_exceptions=True)
+        for task in (reader, worker):
+            if not task.cancelled() and task.exception() and not isinstance(
+                task.exception(), (WebSocketDisconnect, asyncio.TimeoutError)
+            ):
+                logger.error("Chat socket task failed", exc_info=task.exception())
+        await self._close(status.WS_1000_NORMAL_CLOSURE)
+
+    async def _close(self, code: int, reason: str = "") -> None:
+        self.client_gone = True
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except RuntimeError:
+            pass  # already closed
+
+    async def _authenticate(self) -> bool:
+        token = None
+        authorization = self.websocket.headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[7:].strip()
+        else:
+            try:
+                frame = await asyncio.wait_for(self.websocket.receive_json(), WS_AUTH_TIMEOUT_SECONDS)
+            except (asyncio.TimeoutError, ValueError, WebSocketDisconnect):
+                frame = {}
+            if isinstance(frame, dict) and frame.get("type") == "auth":
+                token = frame.get("token")
+
+        payload = decode_access_token(token) if isinstance(token, str) else None
+        try:
+            user_id = int(payload["sub"]) if payload else None
+        except (KeyError, TypeError, ValueError):
+            user_id = None
+        if user_id is not None:
+            db = SessionLocal()
+            try:
+                user = db.get(User, user_id)
+            finally:
+                db.close()
+            if user is None or user.hashed_password is None:
+                user_id = None
+        if user_id is None:
+            await self._close(status.WS_1008_POLICY_VIOLATION, "Invalid or expired token")
+            return False
+        self.user_id = user_id
+        self.token_expires_at = float(payload["exp"]) if payload.get("exp") else None
+        return True
+
+    # ---- inbound ----
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                frame = await asyncio.wait_for(self.websocket.receive_json(), WS_IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                if self.busy or not self.queue.empty():
+                    continue
+                return
+            except WebSocketDisconnect:
+                return
+            except ValueError:
+                await self.error("bad_frame", "Frames must be JSON objects")
+                continue
+            if self.token_expires_at is not None and time.time() >= self.token_expires_at:
+                await self._close(CLOSE_TOKEN_EXPIRED, "Token expired")
+                return
+            if not isinstance(frame, dict):
+                await self.error("bad_frame", "Frames must be JSON objects")
+                continue
+            kind = frame.get("type")
+            if kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind == "message":
+                if not await self._accept_message(frame):
+                    return
+            else:
+                await self.error("bad_frame", f"Unknown frame type: {kind!r}", frame.get("id"))
+
+    async def _accept_message(self, frame: Dict[str, Any]) -> bool:
+        """Admit or reject one message. Returns False when the connection must close."""
+        message_id = frame.get("id")
+        message = frame.get("message")
+        self.received += 1
+        if self.received > WS_MAX_MESSAGES_PER_CONNECTION:
+            await self.error("connection_limit", "Message limit reached; reconnect to continue", message_id)
+            await self._close(status.WS_1008_POLICY_VIOLATION, "Message limit reached")
+            return False
+        if not isinstance(message, str) or not message.strip():
+            await self.error("bad_frame", "message must be a non-empty string", message_id)
+            return True
+        if len(message) > WS_MAX_MESSAGE_CHARS:
+            await self.error("too_large", f"Messages are limited to {WS_MAX_MESSAGE_CHARS} characters", message_id)
+            return True
+
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        if len(self._recent) >= WS_MAX_MESSAGES_PER_MINUTE:
+            retry_after = 60 - (now - self._recent[0])
+            await self.error("rate_limited", "Too many messages", message_id, retry_after=round(retry_after, 1))
+            return True
+        try:
+            self.queue.put_nowait({"id": message_id, "message": message})
+        except asyncio.QueueFull:
+            await self.error("busy", "Still answering earlier messages; resend later", message_id)
+            return True
+        self._recent.append(now)
+        await self.send({"type": "ack", "id": message_id, "queued": self.queue.qsize() - 1 + int(self.busy)})
+        return True
+
+    # ---- turns ----
+
+    async def _work_loop(self) -> None:
+        while True:
+            item = await self.queue.get()
+            self.busy = True
+            try:
+                await self._answer(item["id"], item["message"])
+            finally:
+                self.busy = False
+                self.queue.task_done()
+
+    async def _answer(self, message_id: Any, message: str) -> None:
+        async def forward(kind: str, data: Dict[str, Any]) -> None:
+            await self.send({"type": kind, "id": message_id, **data})
+
+        db = SessionLocal()
+        try:
+            response, _ = await self.agent.chat(
+                db,
+                ChatRequest(user_id=self.user_id, message=message, session_id=self.session_id),
+                on_event=forward,
+            )
+        except UpstreamRateLimited as exc:
+            await self.error(
+                "upstream_rate_limited",
+                "The AI service is busy; please retry shortly",
+                message_id,
+                retry_after=round(exc.retry_after, 1) if exc.retry_after is not None else None,
+            )
+            return
+        except LlmBudgetExceeded as exc:
+            await self.error(
+                "budget_exceeded",
+                "Daily AI usage limit reached; it resets at midnight UTC",
+                message_id,
+                retry_after=round(exc.retry_after),
+            )
+            return
+        except Exception:  # noqa: BLE001
+            logger.exception("Chat socket turn failed for user %s", self.user_id)
+            await self.error("internal", "Something went wrong answering this message", message_id)
+            return
+        finally:
+            db.close()
+        await self.send({"type": "done", "id": message_id, **response.model_dump()})
@@ -0,0 +1,159 @@
+"""
+Per-(user, session) cache of the chat context sent to the model.
+
+Each entry is a ChatWindow: the archived-session summaries plus a ring
+buffer of the last CHAT_HISTORY_LIMIT messages. Persisted messages are
+written through, so a steady-state chat turn needs no history query.
+Entries are evicted LRU-first when the cache exceeds
+CHAT_WINDOW_CACHE_MAX_BYTES or CHAT_WINDOW_CACHE_MAX_SESSIONS, and are
+reloaded after CHAT_WINDOW_CACHE_TTL_SECONDS.
+
+Other workers write the same user's chat too, so each entry also keeps
+the marker the caller passed when it was loaded (a cheap per-user value
+that changes whenever anyone writes chat). A lookup whose marker
+differs reloads; advance() moves the stored marker past this worker's
+own writes, which are already in the window.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from backend.utils.config import (
+    CHAT_WINDOW_CACHE_MAX_BYTES,
+    CHAT_WINDOW_CACHE_MAX_SESSIONS,
+    CHAT_WINDOW_CACHE_TTL_SECONDS,
+)
+
+# Live chat messages sent to the model per turn.
+CHAT_HISTORY_LIMIT = 15
+# Rough per-message bookkeeping cost (dicts, deque slots) on top of the text.
+MESSAGE_OVERHEAD_BYTES = 200
+
+WindowKey = Tuple[int, Optional[str]]
+
+
+@dataclass
+class ChatWindow:
+    """Summaries + the most recent messages, already in Groq's message format."""
+
+    summaries: List[Dict[str, str]] = field(default_factory=list)
+    messages: Deque[Dict[str, str]] = field(default_factory=lambda: deque(maxlen=CHAT_HISTORY_LIMIT))
+
+    def append(self, role: str, content: str) -> None:
+        self.messages.append({"role": role, "content": content})
+
+    def as_messages(self) -> List[Dict[str, str]]:
+        return [*self.summaries, *self.messages]
+
+    def size_bytes(self) -> int:
+        return sum(
+            len(m["content"]) + MESSAGE_OVERHEAD_BYTES for m in (*self.summaries, *self.messages)
+        )
+
+
+class ChatWindowCache:
+    def __init__(self, max_bytes: int, max_sessions: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # key -> (window, loaded_at, size_bytes, marker)
+        self._entries: "OrderedDict[WindowKey, Tuple[ChatWindow, float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get_or_load(
+        self,
+        user_id: int,
+        session_id: Optional[str],
+        load: Callable[[], ChatWindow],
+        marker: Any = None,
+    ) -> ChatWindow:
+        """Cached window, reloaded when expired or when ``marker`` differs from the stored one."""
+        key = (user_id, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and time.monotonic() - entry[1] < self.ttl_seconds
+                and entry[3] == marker
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        window = load()
+        with self._lock:
+            self._store(key, window, marker)
+        return window
+
+    def advance(self, user_id: int, previous: Any, current: Any) -> None:
+        """Re-mark the user's windows still at ``previous``; others stay stale and reload."""
+        with self._lock:
+            for key, (window, loaded_at, size, marker) in list(self._entries.items()):
+                if key[0] == user_id and marker == previous:
+                    self._entries[key] = (window, loaded_at, size, current)
+
+    def append(self, user_id: int, session_id: Optional[str], role: str, content: str) -> None:
+        """Write-through for a persisted message; uncached windows load it on their next miss."""
+        # A window without a session id spans all of the user's sessions.
+        keys = {(user_id, session_id), (user_id, None)}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                window, loaded_at, size, marker = entry
+                window.append(role, content)
+                new_size = window.size_bytes()
+                self._entries[key] = (window, loaded_at, new_size, marker)
+                self._bytes += new_size - size
+            self._evict()
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                self._bytes -= self._entries.pop(key)[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    # Callers hold self._lock.
+
+    def _store(self, key: WindowKey, window: ChatWindow, marker: Any) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[2]
+        size = window.size_bytes()
+        self._entries[key] = (window, time.monotonic(), size, marker)
+        self._bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (
+            self._bytes > self.max_bytes or len(self._entries) > self.max_sessions
+        ):
+            _, (_, _, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+
+window_cache = ChatWindowCache(
+    CHAT_WINDOW_CACHE_MAX_BYTES, CHAT_WINDOW_CACHE_MAX_SESSIONS, CHAT_WINDOW_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,212 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from backend.services.rate_limiter import CALORIE_NINJAS, GROQ, UpstreamRateLimited
+from backend.utils.config import (
+    CALORIE_NINJAS_SLOW_CALL_SECONDS,
+    CIRCUIT_ERROR_RATE_THRESHOLD,
+    CIRCUIT_HALF_OPEN_PROBES,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_SLOW_CALL_RATE_THRESHOLD,
+    CIRCUIT_WINDOW_SECONDS,
+    GROQ_SLOW_CALL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} circuit is open; retry after {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """
+    Rolling-window breaker that trips on error rate or slow-call rate.
+
+    After ``open_seconds`` it lets ``half_open_probes`` calls through; if they
+    all succeed the circuit closes, any failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        slow_call_seconds: float,
+        error_rate_threshold: float = CIRCUIT_ERROR_RATE_THRESHOLD,
+        slow_call_rate_threshold: float = CIRCUIT_SLOW_CALL_RATE_THRESHOLD,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        window_seconds: float = CIRCUIT_WINDOW_SECONDS,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        half_open_probes: int = CIRCUIT_HALF_OPEN_PROBES,
+    ):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.times_opened = 0
+        self.rejected = 0
+        # (finished_at, failed, slow)
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+
+    # ---- state ----
+
+    def _trim(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _rates(self) -> Tuple[float, float]:
+        total = len(self._calls)
+        if total == 0:
+            return 0.0, 0.0
+        failures = sum(1 for _, failed, _ in self._calls if failed)
+        slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+        return failures / total, slow / total
+
+    def _open(self, now: float) -> None:
+        if self.state != OPEN:
+            logger.warning("Circuit %s opened", self.name)
+            self.times_opened += 1
+        self.state = OPEN
+        self.opened_at = now
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+
+    def _close(self) -> None:
+        logger.info("Circuit %s closed", self.name)
+        self.state = CLOSED
+        self._calls.clear()
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+
+    def check(self) -> None:
+        """Fail fast while open; unlike before_call, takes no half-open probe slot."""
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at < self.open_seconds:
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.open_seconds - (now - self.opened_at))
+
+    def before_call(self) -> None:
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.open_seconds - (now - self.opened_at))
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self.probes_in_flight += 1
+
+    def release(self) -> None:
+        """Give back a probe slot for a call that ended without an outcome (cancelled, throttled)."""
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(self.probes_in_flight - 1, 0)
+
+    def record(self, *, failed: bool, duration: float) -> None:
+        now = time.monotonic()
+        slow = duration >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self.probes_in_flight = max(self.probes_in_flight - 1, 0)
+            if failed or slow:
+                self._open(now)
+                return
+            self.probe_successes += 1
+            if self.probe_successes >= self.half_open_probes:
+                self._close()
+            return
+
+        self._calls.append((now, failed, slow))
+        self._trim(now)
+        if self.state == CLOSED and len(self._calls) >= self.min_calls:
+            error_rate, slow_rate = self._rates()
+            if error_rate >= self.error_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._open(now)
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        is_failure: Optional[Callable[[T], bool]] = None,
+        is_throttled: Optional[Callable[[T], bool]] = None,
+    ) -> T:
+        """
+        Run one provider exchange under the breaker.
+
+        Wrap the bare HTTP call, not the rate-limited send: limiter queueing
+        and retry backoff are ours, and would read as a slow provider.
+        Throttled outcomes (429s) say nothing about provider health either,
+        so they record nothing and only hand back a probe slot.
+        """
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = await fn()
+        except UpstreamRateLimited:
+            self.release()
+            raise
+        except Exception:
+            self.record(failed=True, duration=time.monotonic() - started)
+            raise
+        except BaseException:
+            # Cancelled (client gone, socket torn down): says nothing about the
+            # provider, but a half-open probe slot must not leak.
+            self.release()
+            raise
+        if is_throttled and is_throttled(result):
+            self.release()
+            return result
+        failed = bool(is_failure and is_failure(result))
+        self.record(failed=failed, duration=time.monotonic() - started)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._trim(now)
+        error_rate, slow_rate = self._rates()
+        return {
+            "state": self.state,
+            "window_calls": len(self._calls),
+            "error_rate": round(error_rate, 3),
+            "slow_call_rate": round(slow_rate, 3),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "open_for_seconds": round(now - self.opened_at, 1) if self.state != CLOSED else 0.0,
+        }
+
+
+BREAKERS: Dict[str, CircuitBreaker] = {
+    GROQ: CircuitBreaker(GROQ, slow_call_seconds=GROQ_SLOW_CALL_SECONDS),
+    CALORIE_NINJAS: CircuitBreaker(CALORIE_NINJAS, slow_call_seconds=CALORIE_NINJAS_SLOW_CALL_SECONDS),
+}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    return BREAKERS[name]
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.snapshot() for name, breaker in BREAKERS.items()}
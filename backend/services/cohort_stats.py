@@ -0,0 +1,315 @@
+"""
+Cohort benchmarks: "your protein intake is in the 70th percentile for
+your age/goal group".
+
+A refresh job aggregates every user's daily nutrition averages over the
+last COHORT_WINDOW_DAYS in one GROUP BY, buckets users by
+(age band, gender, activity level, goal) and stores a 101-point
+percentile sketch per cohort and metric in cohort_stats. Coarser
+cohorts ("*" = any) are stored too, so a sparse cohort falls back to a
+bigger one. Cohorts smaller than COHORT_MIN_SIZE, the global one
+included, are never stored: their sketch (min, max, percentiles) would
+expose individual users' intake, so below it there is no benchmark.
+Dashboard requests only read an in-process copy of that table, so a
+lookup is a dict hit plus a bisect.
+
+    python -m backend.services.cohort_stats
+"""
+import asyncio
+import bisect
+import json
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from backend.database.session import ReadSessionLocal, SessionLocal
+from backend.models import CohortStat, MealLog, User
+from backend.utils.config import (
+    COHORT_MIN_SIZE,
+    COHORT_STATS_MAX_AGE_SECONDS,
+    COHORT_WINDOW_DAYS,
+)
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("calories", "protein_g", "carbs_g", "fat_g", "meals_per_day")
+# How long a worker keeps its copy of cohort_stats before re-reading it.
+SNAPSHOT_TTL_SECONDS = 60
+
+# Attribute masks from most to least specific: age, gender, activity, goal.
+COHORT_LEVELS = (
+    (True, True, True, True),
+    (True, True, False, True),
+    (True, False, False, True),
+    (False, False, False, True),
+    (False, False, False, False),
+)
+
+_AGE_BANDS = ((18, "<18"), (30, "18-29"), (45, "30-44"), (60, "45-59"))
+_GOAL_KEYWORDS = (
+    ("weight_loss", ("lose", "loss", "fat", "slim", "lean", "cut")),
+    ("muscle_gain", ("muscle", "bulk", "strength", "gain", "build")),
+    ("endurance", ("endurance", "marathon", "run", "stamina", "cardio", "cycling")),
+)
+
+
+# ---- cohort attributes ----
+
+
+def age_band(age: Optional[int]) -> str:
+    if age is None:
+        return "unknown"
+    for upper, label in _AGE_BANDS:
+        if age < upper:
+            return label
+    return "60+"
+
+
+def goal_category(goals: Optional[str]) -> str:
+    if not goals:
+        return "unknown"
+    text = goals.lower()
+    for category, keywords in _GOAL_KEYWORDS:
+        if any(k in text for k in keywords):
+            return category
+    return "general"
+
+
+def _label(value: Optional[str]) -> str:
+    return value.strip().lower().replace(" ", "_") if value and value.strip() else "unknown"
+
+
+def cohort_attributes(
+    age: Optional[int], gender: Optional[str], activity_level: Optional[str], goals: Optional[str]
+) -> Tuple[str, str, str, str]:
+    return age_band(age), _label(gender), _label(activity_level), goal_category(goals)
+
+
+def cohort_keys(attributes: Sequence[str]) -> List[str]:
+    """Keys for every COHORT_LEVELS granularity, most specific first."""
+    return ["|".join(a if keep else "*" for a, keep in zip(attributes, mask)) for mask in COHORT_LEVELS]
+
+
+# ---- quantile sketches ----
+
+
+def quantile_sketch(values: Sequence[float]) -> List[float]:
+    """0th..100th percentiles with linear interpolation (NumPy when available)."""
+    try:
+        import numpy as np  # optional: vectorized path for large cohorts
+    except ImportError:
+        ordered = sorted(values)
+        last = len(ordered) - 1
+        sketch = []
+        for p in range(101):
+            pos = last * p / 100
+            lo = int(pos)
+            hi = min(lo + 1, last)
+            sketch.append(ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo))
+        return [round(v, 2) for v in sketch]
+    return np.round(np.quantile(np.asarray(values, dtype=np.float64), np.linspace(0, 1, 101)), 2).tolist()
+
+
+def percentile_rank(sketch: Sequence[float], value: float) -> int:
+    """Approximate percentile (0-100) of ``value`` within a sketch."""
+    if value <= sketch[0]:
+        return 0
+    if value >= sketch[-1]:
+        return 100
+    lo = bisect.bisect_left(sketch, value)
+    hi = bisect.bisect_right(sketch, value)
+    if hi - lo > 1:  # value sits on a plateau of equal percentiles
+        return round((lo + hi - 1) / 2)
+    below, above = sketch[hi - 1], sketch[hi]
+    fraction = (value - below) / (above - below) if above > below else 0.0
+    return round(hi - 1 + fraction)
+
+
+# ---- per-user aggregates ----
+
+
+def _user_metrics_query(since: datetime):
+    days = func.count(func.distinct(func.date(MealLog.logged_at)))
+    return (
+        select(
+            MealLog.user_id,
+            func.coalesce(func.sum(MealLog.calories), 0.0) / days,
+            func.coalesce(func.sum(MealLog.protein_g), 0.0) / days,
+            func.coalesce(func.sum(MealLog.carbs_g), 0.0) / days,
+            func.coalesce(func.sum(MealLog.fat_g), 0.0) / days,
+            func.count(MealLog.id) * 1.0 / days,
+        )
+        .where(MealLog.logged_at >= since, MealLog.user_id.is_not(None))
+        .group_by(MealLog.user_id)
+    )
+
+
+def _window_start() -> datetime:
+    # logged_at comes from CURRENT_TIMESTAMP (naive UTC on SQLite).
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=COHORT_WINDOW_DAYS)
+
+
+def user_metrics(db: Session, user_id: int) -> Optional[Dict[str, float]]:
+    """This user's daily averages over the cohort window, or None without meals."""
+    row = db.execute(_user_metrics_query(_window_start()).where(MealLog.user_id == user_id)).first()
+    if row is None:
+        return None
+    return {metric: round(float(v), 2) for metric, v in zip(METRICS, row[1:])}
+
+
+# ---- refresh ----
+
+
+def refresh_cohort_stats(db: Session) -> int:
+    """Recompute every cohort sketch and replace cohort_stats. Returns cohorts stored."""
+    per_user = _user_metrics_query(_window_start()).subquery()
+    rows = db.execute(
+        select(User.age, User.gender, User.activity_level, User.goals, *list(per_user.c)[1:])
+        .join(per_user, per_user.c.user_id == User.id)
+    ).all()
+
+    samples: Dict[str, List[List[float]]] = {}
+    for row in rows:
+        attributes = cohort_attributes(row[0], row[1], row[2], row[3])
+        values = [float(v) for v in row[4:]]
+        for key in cohort_keys(attributes):
+            samples.setdefault(key, []).append(values)
+
+    computed_at = datetime.now(timezone.utc)
+    records = []
+    for key, vectors in samples.items():
+        if len(vectors) < COHORT_MIN_SIZE:
+            continue
+        columns = list(zip(*vectors))
+        for metric, column in zip(METRICS, columns):
+            records.append(
+                {
+                    "cohort_key": key,
+                    "metric": metric,
+                    "sample_size": len(vectors),
+                    "quantiles_json": json.dumps(quantile_sketch(column)),
+                    "computed_at": computed_at,
+                }
+            )
+    # Swap the whole table in one transaction; readers never see a partial set.
+    db.execute(delete(CohortStat))
+    if records:
+        db.execute(insert(CohortStat), records)
+    db.commit()
+    _invalidate_snapshot()
+    return len(records) // len(METRICS)
+
+
+async def cohort_refresh_loop(interval_seconds: int) -> None:
+    """Background task: refresh whenever the stored stats are older than the interval."""
+    while True:
+        try:
+            computed_at, _ = await asyncio.to_thread(get_snapshot)
+            # Several workers share the table; skip if another one refreshed recently.
+            if computed_at is None or _age_seconds(computed_at) >= interval_seconds:
+                cohorts = await asyncio.to_thread(_refresh_with_new_session)
+                logger.info("Refreshed cohort stats for %d cohorts", cohorts)
+        except Exception:  # noqa: BLE001
+            logger.exception("Cohort stats refresh failed")
+        await asyncio.sleep(interval_seconds)
+
+
+def _refresh_with_new_session() -> int:
+    db = SessionLocal()
+    try:
+        return refresh_cohort_stats(db)
+    finally:
+        db.close()
+
+
+# ---- in-process snapshot ----
+
+_snapshot: Dict[str, Any] = {"loaded_at": None, "computed_at": None, "stats": {}}
+_snapshot_lock = threading.Lock()
+
+
+def _invalidate_snapshot() -> None:
+    with _snapshot_lock:
+        _snapshot["loaded_at"] = None
+
+
+def get_snapshot() -> Tuple[Optional[datetime], Dict[Tuple[str, str], Tuple[int, List[float]]]]:
+    """(computed_at, {(cohort_key, metric): (sample_size, sketch)}), re-read every TTL."""
+    with _snapshot_lock:
+        loaded_at = _snapshot["loaded_at"]
+        if loaded_at is not None and time.monotonic() - loaded_at < SNAPSHOT_TTL_SECONDS:
+            return _snapshot["computed_at"], _snapshot["stats"]
+    db = ReadSessionLocal()
+    try:
+        rows = db.execute(
+            select(
+                CohortStat.cohort_key,
+                CohortStat.metric,
+                CohortStat.sample_size,
+                CohortStat.quantiles_json,
+                CohortStat.computed_at,
+            )
+        ).all()
+    finally:
+        db.close()
+    stats = {(r.cohort_key, r.metric): (r.sample_size, json.loads(r.quantiles_json)) for r in rows}
+    computed_at = max((r.computed_at for r in rows), default=None)
+    with _snapshot_lock:
+        _snapshot.update(loaded_at=time.monotonic(), computed_at=computed_at, stats=stats)
+    return computed_at, stats
+
+
+def _age_seconds(computed_at: datetime) -> float:
+    if computed_at.tzinfo is None:
+        computed_at = computed_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - computed_at).total_seconds()
+
+
+def is_stale(computed_at: datetime) -> bool:
+    return _age_seconds(computed_at) > COHORT_STATS_MAX_AGE_SECONDS
+
+
+def benchmark_user(user: User, metrics: Optional[Dict[str, float]]) -> Optional[Dict[str, Any]]:
+    """Percentiles of ``metrics`` in the user's most specific populated cohort."""
+    computed_at, stats = get_snapshot()
+    if computed_at is None or not metrics:
+        return None
+    attributes = cohort_attributes(user.age, user.gender, user.activity_level, user.goals)
+    for key in cohort_keys(attributes):
+        if (key, METRICS[0]) not in stats:
+            continue
+        sample_size = stats[(key, METRICS[0])][0]
+        if sample_size < COHORT_MIN_SIZE:
+            continue  # stored before the limit applied to every cohort
+        return {
+            "cohort": key,
+            "sample_size": sample_size,
+            "window_days": COHORT_WINDOW_DAYS,
+            "values": metrics,
+            "percentiles": {
+                metric: percentile_rank(stats[(key, metric)][1], value)
+                for metric, value in metrics.items()
+                if (key, metric) in stats
+            },
+            "computed_at": computed_at,
+            "age_seconds": round(_age_seconds(computed_at)),
+            "stale": is_stale(computed_at),
+        }
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    started = time.perf_counter()
+    cohorts = _refresh_with_new_session()
+    print(f"Stored stats for {cohorts} cohorts in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Streaming NDJSON export / bulk import of user data.
+
+Each line is {"type": <table>, "data": {column: value}}. Export reads with
+server-side cursors (yield_per) over Core rows, so no ORM identity map
+builds up and memory stays flat regardless of account size. Import inserts
+in executemany batches.
+
+    python -m backend.services.export_service export out.ndjson.gz [--user-id 7]
+    python -m backend.services.export_service import out.ndjson.gz [--user-id 7]
+"""
+import argparse
+import gzip
+import json
+import sys
+import zlib
+from datetime import datetime
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import DateTime, Table, insert, select
+from sqlalchemy.orm import Session
+
+from backend.database.session import SessionLocal
+from backend.models import (
+    ChatHistory,
+    HealthAssessment,
+    MealLog,
+    PlanFeedback,
+    PlanRevision,
+    WorkoutPlan,
+)
+from backend.services.chat_window_cache import window_cache
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+
+# Plans first so revisions/feedback can be remapped to the new plan ids on import.
+PLAN_TABLE: Table = WorkoutPlan.__table__
+USER_TABLES: Dict[str, Table] = {
+    "workout_plans": PLAN_TABLE,
+    "plan_feedback": PlanFeedback.__table__,
+    "plan_revisions": PlanRevision.__table__,
+    "health_assessments": HealthAssessment.__table__,
+    "meal_logs": MealLog.__table__,
+    "chat_history": ChatHistory.__table__,
+}
+PLAN_CHILD_TABLES = ("plan_feedback", "plan_revisions")
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _user_filter(name: str, table: Table, user_id: Optional[int]):
+    if user_id is None:
+        return None
+    if name == "plan_revisions":
+        # Revisions don't carry user_id; scope them through the owning plan.
+        owned = select(PLAN_TABLE.c.id).where(PLAN_TABLE.c.user_id == user_id)
+        return table.c.plan_id.in_(owned)
+    return table.c.user_id == user_id
+
+
+# ---- export ----
+
+
+def iter_user_records(db: Session, user_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Yield export records for one user (or everyone when user_id is None)."""
+    for name, table in USER_TABLES.items():
+        stmt = select(table).order_by(table.c.id)
+        condition = _user_filter(name, table, user_id)
+        if condition is not None:
+            stmt = stmt.where(condition)
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for row in result:
+            yield {"type": name, "data": {k: _jsonable(v) for k, v in row._mapping.items()}}
+
+
+def iter_ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for record in records:
+        yield (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def iter_gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Incrementally gzip a byte stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def stream_export(user_id: Optional[int], *, compress: bool = False) -> Iterator[bytes]:
+    """Own-session export stream, safe to hand to a StreamingResponse."""
+    db = SessionLocal()
+    try:
+        chunks = iter_ndjson(iter_user_records(db, user_id))
+        yield from (iter_gzip(chunks) if compress else chunks)
+    finally:
+        db.close()
+
+
+# ---- import ----
+
+
+def _decode_row(table: Table, data: Dict[str, Any]) -> Dict[str, Any]:
+    row: Dict[str, Any] = {}
+    for column in table.columns:
+        if column.name == "id" or column.name not in data:
+            continue
+        value = data[column.name]
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        row[column.name] = value
+    return row
+
+
+def import_records(
+    db: Session, lines: Iterable[bytes | str], user_id: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Bulk-insert NDJSON export lines. With user_id set, every row is assigned
+    to that user; otherwise original user ids are kept. Returns counts per table.
+    """
+    counts = {name: 0 for name in USER_TABLES}
+    pending: Dict[str, List[Dict[str, Any]]] = {name: [] for name in USER_TABLES}
+    plan_ids: Dict[int, int] = {}
+    # Children can only be inserted once their plan's new id is known.
+    deferred: Dict[str, List[Dict[str, Any]]] = {name: [] for name in PLAN_CHILD_TABLES}
+
+    def flush(name: str) -> None:
+        rows = pending[name]
+        if not rows:
+            return
+        table = USER_TABLES[name]
+        if name == "workout_plans":
+            old_ids = [row.pop("_old_id") for row in rows]
+            new_ids = db.execute(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            plan_ids.update(zip(old_ids, new_ids))
+        else:
+            db.execute(insert(table), rows)
+        counts[name] += len(rows)
+        pending[name] = []
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        name = record.get("type")
+        if name not in USER_TABLES:
+            raise ValueError(f"Unknown record type: {name!r}")
+        table = USER_TABLES[name]
+        row = _decode_row(table, record["data"])
+        if user_id is not None and "user_id" in table.c:
+            row["user_id"] = user_id
+        if name == "workout_plans":
+            row["_old_id"] = record["data"]["id"]
+        if name in PLAN_CHILD_TABLES:
+            deferred[name].append(row)
+            if len(deferred[name]) < IMPORT_BATCH_SIZE:
+                continue
+            flush("workout_plans")
+            pending[name].extend(_remap_plan_children(name, deferred[name], plan_ids))
+            deferred[name] = []
+        else:
+            pending[name].append(row)
+        if len(pending[name]) >= IMPORT_BATCH_SIZE:
+            flush(name)
+
+    flush("workout_plans")
+    for name in PLAN_CHILD_TABLES:
+        pending[name].extend(_remap_plan_children(name, deferred[name], plan_ids))
+    for name in USER_TABLES:
+        flush(name)
+    db.commit()
+    if counts.get("chat_history"):
+        if user_id is not None:
+            window_cache.invalidate_user(user_id)
+        else:
+            window_cache.clear()
+    return counts
+
+
+def _remap_plan_children(
+    name: str, rows: List[Dict[str, Any]], plan_ids: Dict[int, int]
+) -> List[Dict[str, Any]]:
+    remapped = []
+    for row in rows:
+        if row["plan_id"] not in plan_ids:
+            raise ValueError(f"{name} row references plan {row['plan_id']} missing from the import")
+        row["plan_id"] = plan_ids[row["plan_id"]]
+        # feedback ids are regenerated on import; the link is informational only.
+        row.pop("feedback_id", None)
+        remapped.append(row)
+    return remapped
+
+
+def open_export_file(path: str, mode: str = "rb") -> IO[bytes]:
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path")
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        db = SessionLocal()
+        try:
+            with open_export_file(args.path, "wb") as fh:
+                for chunk in iter_ndjson(iter_user_records(db, args.user_id)):
+                    fh.write(chunk)
+        finally:
+            db.close()
+        return 0
+
+    db = SessionLocal()
+    try:
+        with open_export_file(args.path, "rb") as fh:
+            counts = import_records(db, fh, args.user_id)
+    finally:
+        db.close()
+    print(json.dumps(counts))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,27 @@
 import json
 import logging
+import time
 from typing import Any, Dict, List, Optional
 
-import httpx
-
+from backend.services.circuit_breaker import get_breaker
+from backend.services.llm_usage import check_budget, record_usage
+from backend.services.model_router import TASK_CHAT, candidate_models, record_call
+from backend.services.rate_limiter import GROQ, send_with_rate_limit
 from backend.utils.config import GROQ_API_KEY
 
 logger = logging.getLogger(__name__)
 
 GROQ_CHAT_COMPLETIONS_URL = "https://api.groq.com/openai/v1/chat/completions"
 
-# Supported Groq model (do not depend on config)
-DEFAULT_GROQ_MODEL = "llama-3.1-8b-instant"
+# Error codes meaning "this model can't serve requests"; the next tier is tried.
+MODEL_UNAVAILABLE_CODES = frozenset({"model_not_found", "model_decommissioned"})
 
 
 class GroqClient:
     def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
         self.api_key = api_key or GROQ_API_KEY
-        # Always use supported model; ignore config/env
-        self.model = model if model else DEFAULT_GROQ_MODEL
+        # Pinned model; None routes each call by its call_type (see model_router).
+        self.model = model
 
         if not self.api_key:
             raise RuntimeError("GROQ_API_KEY is not configured")
@@ -29,7 +32,18 @@ class GroqClient:
         *,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        user_id: Optional[int] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        call_type: str = TASK_CHAT,
+        budget: Optional[str] = None,
     ) -> str:
+        """
+        Raises LlmBudgetExceeded when ``user_id`` has spent today's token budget.
+        ``budget`` is the state the caller already checked this turn; the
+        budget is only checked here when it is None.
+        Token usage is recorded per user and ``call_type``, which also picks
+        the model tier unless the client was created with a pinned model.
+        """
 
         # Validate messages
         if not messages or not isinstance(messages, list):
@@ -39,34 +53,84 @@ class GroqClient:
             if "role" not in msg or "content" not in msg:
                 raise ValueError(f"Invalid message format: {msg}")
 
+        if budget is None:
+            await check_budget(user_id)
+
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
 
         payload: Dict[str, Any] = {
-            "model": self.model,
             "messages": messages,
             "temperature": temperature,
         }
 
         if max_tokens is not None:
             payload["max_tokens"] = max_tokens
-
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.post(
-                GROQ_CHAT_COMPLETIONS_URL,
-                headers=headers,
-                json=payload,
+        if response_format is not None:
+            payload["response_format"] = response_format
+
+        import httpx  # deferred: keeps app import/startup fast
+
+        from backend.services.upstream_transport import get_transport
+
+        models = [self.model] if self.model else candidate_models(call_type)
+        latency_ms = 0.0
+        async with httpx.AsyncClient(timeout=30.0, transport=get_transport()) as client:
+
+            async def post_timed() -> "httpx.Response":
+                # Model stats time only the HTTP exchange: limiter queueing and
+                # retry backoff say how busy we are, not how fast the model is.
+                # Each 5xx attempt counts as a failure for the model.
+                nonlocal latency_ms
+                model = payload["model"]
+                started = time.perf_counter()
+                try:
+                    resp = await client.post(GROQ_CHAT_COMPLETIONS_URL, headers=headers, json=payload)
+                except httpx.TransportError:
+                    record_call(model, (time.perf_counter() - started) * 1000, failed=True)
+                    raise
+                latency_ms = (time.perf_counter() - started) * 1000
+                if resp.status_code != 429:  # throttling is our quota, not the model
+                    record_call(model, latency_ms, failed=_model_unavailable(resp) or resp.status_code >= 500)
+                return resp
+
+            breaker = get_breaker(GROQ)
+            # Fail fast while Groq is failing or slow, before queueing for a slot.
+            breaker.check()
+            for attempt, model in enumerate(models):
+                payload["model"] = model
+                # Raises UpstreamRateLimited instead of returning a 429 error string,
+                # so throttling never ends up persisted as an assistant reply.
+                # The breaker sees each attempt's exchange, not our queueing or backoff.
+                resp = await send_with_rate_limit(
+                    GROQ,
+                    lambda: breaker.call(
+                        post_timed,
+                        is_failure=lambda r: r.status_code >= 500,
+                        is_throttled=lambda r: r.status_code == 429,
+                    ),
+                    user_key=user_id,
+                )
+                unavailable = _model_unavailable(resp)
+                if unavailable and attempt + 1 < len(models):
+                    logger.warning("Groq model %s unavailable; falling back to %s", model, models[attempt + 1])
+                    continue
+                break
+
+            # Shape only: payloads carry user chat and health data.
+            logger.debug(
+                "Groq %s call: model=%s messages=%d status=%s latency_ms=%.0f",
+                call_type, payload["model"], len(messages), resp.status_code, latency_ms,
             )
 
-            # Debug output before any error handling
-            print("====== GROQ DEBUG START ======")
-            print("Payload being sent to Groq:", json.dumps(payload, indent=2))
-            print("Status Code:", resp.status_code)
-            print("Response Headers:", dict(resp.headers))
-            print("Full Response Text:", resp.text)
-            print("====== GROQ DEBUG END ======")
+            # In JSON mode Groq rejects output that isn't valid JSON but hands the
+            # text back; return it so the caller can repair it locally.
+            failed_generation = _failed_generation(resp) if response_format else None
+            if failed_generation is not None:
+                logger.warning("Groq JSON validation failed; returning raw generation for repair")
+                return failed_generation
 
             # Check status code and return error string instead of raising
             if resp.status_code != 200:
@@ -87,30 +151,50 @@ class GroqClient:
                 logger.error(error_msg)
                 return error_msg
 
+            usage = data.get("usage") or {}
+            record_usage(
+                user_id,
+                call_type,
+                int(usage.get("prompt_tokens") or 0),
+                int(usage.get("completion_tokens") or 0),
+                latency_ms,
+            )
             return data["choices"][0]["message"]["content"]
 
 
-def try_parse_json(text: str) -> Optional[Dict[str, Any]]:
-    if not text:
+def _error_code(resp) -> Optional[str]:
+    try:
+        error = resp.json().get("error") or {}
+    except (ValueError, AttributeError):
         return None
+    return error.get("code") if isinstance(error, dict) else None
+
 
-    text = text.strip()
+def _model_unavailable(resp) -> bool:
+    if resp.status_code not in (400, 404):
+        return False
+    return resp.status_code == 404 or _error_code(resp) in MODEL_UNAVAILABLE_CODES
 
-    if text.startswith("{") and text.endswith("}"):
-        try:
-            return json.loads(text)
-        except Exception:
-            return None
 
-    start = text.find("{")
-    end = text.rfind("}")
-    if start == -1 or end == -1 or end <= start:
+def _failed_generation(resp) -> Optional[str]:
+    if resp.status_code != 400:
         return None
+    try:
+        error = resp.json().get("error") or {}
+    except ValueError:
+        return None
+    if error.get("code") != "json_validate_failed":
+        return None
+    return error.get("failed_generation")
 
-    candidate = text[start : end + 1]
 
-    try:
-        return json.loads(candidate)
-    except Exception:
+def try_parse_json(text: str) -> Optional[Dict[str, Any]]:
+    if not text:
         return None
+    from backend.services.llm_json import repair_json
 
+    try:
+        value = json.loads(text.strip())
+        return value if isinstance(value, dict) else None
+    except ValueError:
+        return repair_json(text)[0]
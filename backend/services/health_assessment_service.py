@@ -1,21 +1,29 @@
 import json
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from sqlalchemy.orm import Session
 
 from backend.models import HealthAssessment
 from backend.models.schemas import HealthAssessmentCreate
+from backend.services.risk_scoring import score_answers
 
 
 def create_health_assessment(
-    db: Session, payload: HealthAssessmentCreate, summary: Optional[str] = None
+    db: Session,
+    payload: HealthAssessmentCreate,
+    summary: Optional[str] = None,
+    scores: Optional[Dict[str, Any]] = None,
 ) -> HealthAssessment:
+    scores = scores or score_answers(payload.answers)
     assessment = HealthAssessment(
         user_id=payload.user_id,
         responses_json=json.dumps(
             {"answers": payload.answers, "metadata": payload.metadata or {}}
         ),
         summary=summary,
+        risk_score=scores["risk_score"],
+        readiness_score=scores["readiness_score"],
+        scoring_version=scores["scoring_version"],
     )
     db.add(assessment)
     db.commit()
@@ -0,0 +1,194 @@
+"""
+Tolerant parsing of the agent's JSON envelope.
+
+Groq is asked for ``response_format={"type": "json_object"}``, but replies
+can still arrive wrapped in code fences, followed by chatter or cut off by
+``max_tokens``. ``repair_json`` fixes those locally in one pass instead of
+paying for another LLM round trip; ``parse_agent_envelope`` validates the
+result against AgentEnvelope and counts every outcome.
+"""
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from backend.models.schemas import AgentEnvelope
+
+logger = logging.getLogger(__name__)
+
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+# Outcomes: "ok" (strict json.loads), "repaired", "invalid" (JSON but not an
+# envelope), "failed" (no JSON at all), "tool_dropped" (a tool call whose
+# arguments were cut off). Repairs are counted by kind.
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _count(*keys: str) -> None:
+    with _stats_lock:
+        _stats.update(keys)
+
+
+def parse_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Drop commas directly before ``}``/``]`` (outside strings)."""
+    out: List[str] = []
+    in_string = escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "}]":
+            while out and out[-1] in " \t\r\n":
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+        out.append(ch)
+    return "".join(out)
+
+
+def _scan(text: str, start: int) -> Tuple[Optional[int], List[Tuple[int, str]], bool, List[str]]:
+    """
+    Walk one JSON value from ``text[start]`` (a ``{``).
+
+    Returns (end index if the value closed, checkpoints, ended inside a
+    string, open-bracket stack). A checkpoint is a position where the text
+    so far plus the closers for the stack at that point is complete JSON:
+    just after an opening bracket, or just before a comma.
+    """
+    stack: List[str] = []
+    checkpoints: List[Tuple[int, str]] = []
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(_CLOSERS[ch])
+            checkpoints.append((i + 1, "".join(reversed(stack))))
+        elif ch in "}]":
+            if not stack:
+                return None, checkpoints, False, stack
+            stack.pop()
+            if not stack:
+                return i + 1, checkpoints, False, stack
+        elif ch == ",":
+            checkpoints.append((i, "".join(reversed(stack))))
+    return None, checkpoints, in_string, stack
+
+
+def _loads_object(candidate: str) -> Optional[Dict[str, Any]]:
+    for attempt in (candidate, _strip_trailing_commas(candidate)):
+        try:
+            value = json.loads(attempt)
+        except ValueError:
+            continue
+        return value if isinstance(value, dict) else None
+    return None
+
+
+def repair_json(text: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Best-effort parse of a JSON object out of ``text``.
+
+    Returns (object or None, repairs applied). Handles leading/trailing
+    prose and code fences, trailing commas, and objects truncated mid-string
+    or mid-member (the incomplete tail is dropped and brackets are closed).
+    """
+    repairs: List[str] = []
+    start = text.find("{")
+    if start == -1:
+        return None, repairs
+    if text[:start].strip():
+        repairs.append("leading_text")
+
+    end, checkpoints, in_string, stack = _scan(text, start)
+    if end is not None:
+        if text[end:].strip():
+            repairs.append("trailing_text")
+        candidate = text[start:end]
+        value = _loads_object(candidate)
+        if value is not None and candidate != _strip_trailing_commas(candidate):
+            repairs.append("trailing_comma")
+        return value, repairs
+
+    repairs.append("truncated")
+    body = text[start:]
+    if in_string:
+        # Keep the partial string (often the reply itself); drop a dangling escape.
+        if body.endswith("\\") and not body.endswith("\\\\"):
+            body = body[:-1]
+        value = _loads_object(body + '"' + "".join(reversed(stack)))
+        if value is not None:
+            return value, repairs
+    value = _loads_object(body.rstrip().rstrip(",") + "".join(reversed(stack)))
+    if value is not None:
+        return value, repairs
+    for position, closers in reversed(checkpoints):
+        value = _loads_object(text[start:position] + closers)
+        if value is not None:
+            return value, repairs
+    return None, repairs
+
+
+def parse_agent_envelope(raw: str) -> Optional[AgentEnvelope]:
+    """Validated envelope from a model reply, or None when nothing usable came back."""
+    text = (raw or "").strip()
+    data: Optional[Dict[str, Any]] = None
+    repairs: List[str] = []
+    try:
+        loaded = json.loads(text)
+        if isinstance(loaded, dict):
+            data = loaded
+            _count("ok")
+    except ValueError:
+        pass
+    if data is None:
+        data, repairs = repair_json(text)
+        if data is None:
+            _count("failed")
+            logger.warning("Agent reply is not JSON (%d chars)", len(text))
+            return None
+        _count("repaired", *(f"repair:{r}" for r in repairs))
+
+    try:
+        envelope = AgentEnvelope.model_validate(data)
+    except ValidationError as exc:
+        _count("invalid")
+        logger.warning("Agent reply failed envelope validation: %s", exc.errors()[:3])
+        # Keep whatever reply text there is; never act on an unvalidated tool call.
+        reply = data.get("assistant_reply")
+        if isinstance(reply, str) and reply.strip():
+            return AgentEnvelope(assistant_reply=reply)
+        return None
+    if "truncated" in repairs and envelope.tool_to_call != "none":
+        # Arguments cut off by max_tokens look valid after repair ("2 rot" for
+        # "2 roti"); never run a tool on them, and don't show a reply that
+        # promises an action that won't happen.
+        _count("tool_dropped")
+        logger.warning("Dropped %s call from a truncated agent reply", envelope.tool_to_call)
+        return AgentEnvelope()
+    return envelope
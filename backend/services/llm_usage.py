@@ -0,0 +1,275 @@
+"""
+Groq token accounting and per-user daily budgets.
+
+GroqClient reports every successful call to record_usage(). Calls are
+summed in memory per (user, UTC day, call type) and written to llm_usage
+in one transaction every LLM_USAGE_FLUSH_SECONDS by usage_flush_loop, so a
+chat turn never waits on an accounting write.
+
+Budgets are LLM_DAILY_TOKEN_BUDGET tokens per user per UTC day:
+
+    ok         normal calls
+    reduced    past LLM_BUDGET_SOFT_RATIO: shorter max_tokens, no chat history
+    exhausted  Groq calls raise LlmBudgetExceeded (429 until midnight UTC)
+
+Each worker checks budgets against its own view of usage: the day's total
+as last read from llm_usage (re-read every USAGE_RELOAD_SECONDS) plus its
+own unflushed calls, so several workers can overshoot a budget by at most
+what they spend between reloads. The stored total is read off the event
+loop; callers check once per turn and pass the state on to GroqClient.
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.database.session import SessionLocal
+from backend.models import LlmUsage
+from backend.utils.config import (
+    LLM_BUDGET_SOFT_RATIO,
+    LLM_DAILY_TOKEN_BUDGET,
+    LLM_REDUCED_MAX_TOKENS,
+)
+
+logger = logging.getLogger(__name__)
+
+BUDGET_OK = "ok"
+BUDGET_REDUCED = "reduced"
+BUDGET_EXHAUSTED = "exhausted"
+
+# How long a worker trusts its copy of a user's stored daily total.
+USAGE_RELOAD_SECONDS = 30
+
+UsageKey = Tuple[Optional[int], date, str]
+
+
+class LlmBudgetExceeded(Exception):
+    """The user spent today's LLM token budget."""
+
+    def __init__(self, user_id: int, retry_after: float):
+        super().__init__(f"LLM token budget exhausted for user {user_id}")
+        self.user_id = user_id
+        self.retry_after = retry_after
+
+
+_lock = threading.Lock()
+# Not yet written: key -> [calls, prompt_tokens, completion_tokens, latency_ms]
+_pending: Dict[UsageKey, List[float]] = {}
+# Stored daily totals: (user_id, day) -> (tokens, loaded_at)
+_stored: Dict[Tuple[int, date], Tuple[int, float]] = {}
+# Bumped by every flush; a read that overlapped one may predate it and isn't cached.
+_flush_generation = 0
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def seconds_until_reset() -> float:
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return (midnight - now).total_seconds()
+
+
+def record_usage(
+    user_id: Optional[int],
+    call_type: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    latency_ms: float,
+) -> None:
+    key = (user_id, _today(), call_type)
+    with _lock:
+        totals = _pending.setdefault(key, [0, 0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += prompt_tokens
+        totals[2] += completion_tokens
+        totals[3] += latency_ms
+
+
+# ---- budgets ----
+
+
+def _load_stored_tokens(user_id: int, day: date) -> int:
+    db = SessionLocal()
+    try:
+        tokens = db.execute(
+            select(func.coalesce(func.sum(LlmUsage.prompt_tokens + LlmUsage.completion_tokens), 0)).where(
+                LlmUsage.user_id == user_id, LlmUsage.day == day
+            )
+        ).scalar_one()
+    finally:
+        db.close()
+    return int(tokens)
+
+
+async def _stored_tokens(user_id: int, day: date) -> int:
+    with _lock:
+        cached = _stored.get((user_id, day))
+        generation = _flush_generation
+    if cached is not None and time.monotonic() - cached[1] < USAGE_RELOAD_SECONDS:
+        return cached[0]
+    tokens = await asyncio.to_thread(_load_stored_tokens, user_id, day)
+    with _lock:
+        if generation == _flush_generation:
+            _stored[(user_id, day)] = (tokens, time.monotonic())
+    return tokens
+
+
+async def tokens_used_today(user_id: int) -> int:
+    day = _today()
+    stored = await _stored_tokens(user_id, day)
+    with _lock:
+        unflushed = sum(
+            int(v[1] + v[2]) for (uid, d, _), v in _pending.items() if uid == user_id and d == day
+        )
+    return stored + unflushed
+
+
+async def budget_state(user_id: Optional[int]) -> str:
+    if user_id is None or LLM_DAILY_TOKEN_BUDGET <= 0:
+        return BUDGET_OK
+    used = await tokens_used_today(user_id)
+    if used >= LLM_DAILY_TOKEN_BUDGET:
+        return BUDGET_EXHAUSTED
+    if used >= LLM_DAILY_TOKEN_BUDGET * LLM_BUDGET_SOFT_RATIO:
+        return BUDGET_REDUCED
+    return BUDGET_OK
+
+
+async def check_budget(user_id: Optional[int]) -> str:
+    """budget_state(), raising LlmBudgetExceeded when it is exhausted."""
+    state = await budget_state(user_id)
+    if state == BUDGET_EXHAUSTED:
+        raise LlmBudgetExceeded(user_id, seconds_until_reset())
+    return state
+
+
+def reduced_max_tokens(max_tokens: int) -> int:
+    return min(max_tokens, LLM_REDUCED_MAX_TOKENS)
+
+
+# ---- batched writer ----
+
+
+def _add_to_row(db: Session, key: UsageKey, totals: List[float]) -> None:
+    user_id, day, call_type = key
+    user_match = LlmUsage.user_id.is_(None) if user_id is None else LlmUsage.user_id == user_id
+    calls, prompt_tokens, completion_tokens, latency_ms = totals
+    values = {
+        "calls": LlmUsage.calls + int(calls),
+        "prompt_tokens": LlmUsage.prompt_tokens + int(prompt_tokens),
+        "completion_tokens": LlmUsage.completion_tokens + int(completion_tokens),
+        "latency_ms": LlmUsage.latency_ms + latency_ms,
+    }
+    result = db.execute(
+        update(LlmUsage)
+        .where(user_match, LlmUsage.day == day, LlmUsage.call_type == call_type)
+        .values(**values)
+    )
+    if result.rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(
+                LlmUsage(
+                    user_id=user_id,
+                    day=day,
+                    call_type=call_type,
+                    calls=int(calls),
+                    prompt_tokens=int(prompt_tokens),
+                    completion_tokens=int(completion_tokens),
+                    latency_ms=latency_ms,
+                )
+            )
+    except IntegrityError:
+        # Another worker inserted the row first.
+        db.execute(
+            update(LlmUsage)
+            .where(user_match, LlmUsage.day == day, LlmUsage.call_type == call_type)
+            .values(**values)
+        )
+
+
+def flush_usage() -> int:
+    """Write pending usage in one transaction. Returns rows touched."""
+    global _flush_generation
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+    if not batch:
+        return 0
+    db = SessionLocal()
+    try:
+        for key, totals in batch.items():
+            _add_to_row(db, key, totals)
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Keep the numbers for the next flush rather than losing them.
+        with _lock:
+            for key, totals in batch.items():
+                merged = _pending.setdefault(key, [0, 0, 0, 0.0])
+                for i, value in enumerate(totals):
+                    merged[i] += value
+        raise
+    finally:
+        db.close()
+    with _lock:
+        # Flushed tokens now live in the table. Re-read those totals rather
+        # than adding to them: a concurrent miss may already include them.
+        _flush_generation += 1
+        for user_id, day, _ in batch:
+            _stored.pop((user_id, day), None)
+    return len(batch)
+
+
+async def usage_flush_loop(interval_seconds: float) -> None:
+    try:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(flush_usage)
+            except Exception:  # noqa: BLE001
+                logger.exception("LLM usage flush failed")
+    finally:
+        # Shutdown cancels the loop; don't drop the last interval's usage.
+        try:
+            flush_usage()
+        except Exception:  # noqa: BLE001
+            logger.exception("Final LLM usage flush failed")
+
+
+def usage_report(db: Session, day: date, limit: int = 50) -> List[Dict[str, object]]:
+    """Heaviest users of ``day`` with a per-call-type breakdown."""
+    rows = db.execute(
+        select(
+            LlmUsage.user_id,
+            LlmUsage.call_type,
+            LlmUsage.calls,
+            LlmUsage.prompt_tokens,
+            LlmUsage.completion_tokens,
+            LlmUsage.latency_ms,
+        ).where(LlmUsage.day == day)
+    ).all()
+    users: Dict[Optional[int], Dict[str, object]] = {}
+    for row in rows:
+        entry = users.setdefault(row.user_id, {"user_id": row.user_id, "total_tokens": 0, "by_call_type": {}})
+        tokens = row.prompt_tokens + row.completion_tokens
+        entry["total_tokens"] += tokens
+        entry["by_call_type"][row.call_type] = {
+            "calls": row.calls,
+            "prompt_tokens": row.prompt_tokens,
+            "completion_tokens": row.completion_tokens,
+            "avg_latency_ms": round(row.latency_ms / row.calls, 1) if row.calls else 0.0,
+        }
+    report = sorted(users.values(), key=lambda u: u["total_tokens"], reverse=True)[:limit]
+    for entry in report:
+        entry["budget"] = LLM_DAILY_TOKEN_BUDGET
+    return report
@@ -0,0 +1,129 @@
+"""
+Groq model selection per task class.
+
+Each task ("chat", "assessment") has an ordered model list in
+GROQ_MODEL_TIERS, most preferred first. Every call's latency and outcome
+is recorded per model over a rolling GROQ_MODEL_STATS_WINDOW_SECONDS
+window. candidate_models() returns the task's list reordered so that
+models currently within budget come first:
+
+- healthy: fewer than GROQ_MODEL_MIN_SAMPLES samples (no evidence yet), or
+  p95 <= the task's GROQ_TASK_P95_BUDGET_MS and error rate below
+  GROQ_MODEL_MAX_ERROR_RATE
+- unhealthy models follow, fastest observed p95 first
+
+A demoted model gets no traffic, so its samples age out of the window and
+it is tried again after at most one window.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from backend.utils.config import (
+    GROQ_MODEL,
+    GROQ_MODEL_MAX_ERROR_RATE,
+    GROQ_MODEL_MIN_SAMPLES,
+    GROQ_MODEL_STATS_WINDOW_SECONDS,
+    GROQ_MODEL_TIERS,
+    GROQ_TASK_P95_BUDGET_MS,
+)
+
+TASK_CHAT = "chat"
+TASK_ASSESSMENT = "assessment"
+
+# Samples kept per model regardless of the window, to bound memory.
+MAX_SAMPLES_PER_MODEL = 1000
+
+
+class ModelStats:
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        # (finished_at, latency_ms, failed)
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=MAX_SAMPLES_PER_MODEL)
+
+    def record(self, latency_ms: float, failed: bool) -> None:
+        self._samples.append((time.monotonic(), latency_ms, failed))
+
+    def _trim(self) -> None:
+        now = time.monotonic()
+        while self._samples and now - self._samples[0][0] > self.window_seconds:
+            self._samples.popleft()
+
+    def summary(self) -> Dict[str, Any]:
+        self._trim()
+        latencies = sorted(latency for _, latency, failed in self._samples if not failed)
+        failures = sum(1 for _, _, failed in self._samples if failed)
+        total = len(self._samples)
+        return {
+            "samples": total,
+            "error_rate": round(failures / total, 3) if total else 0.0,
+            "p50_ms": _percentile(latencies, 0.5),
+            "p95_ms": _percentile(latencies, 0.95),
+        }
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)], 1)
+
+
+_lock = threading.Lock()
+_stats: Dict[str, ModelStats] = {}
+
+
+def record_call(model: str, latency_ms: float, failed: bool) -> None:
+    with _lock:
+        stats = _stats.get(model)
+        if stats is None:
+            stats = _stats[model] = ModelStats(GROQ_MODEL_STATS_WINDOW_SECONDS)
+        stats.record(latency_ms, failed)
+
+
+def _summary(model: str) -> Dict[str, Any]:
+    with _lock:
+        stats = _stats.get(model)
+        return stats.summary() if stats is not None else {"samples": 0, "error_rate": 0.0, "p50_ms": None, "p95_ms": None}
+
+
+def _healthy(summary: Dict[str, Any], budget_ms: Optional[float]) -> bool:
+    if summary["samples"] < GROQ_MODEL_MIN_SAMPLES:
+        return True
+    if summary["error_rate"] >= GROQ_MODEL_MAX_ERROR_RATE:
+        return False
+    p95 = summary["p95_ms"]
+    return budget_ms is None or p95 is None or p95 <= budget_ms
+
+
+def tier_for(task: str) -> List[str]:
+    return GROQ_MODEL_TIERS.get(task) or [GROQ_MODEL]
+
+
+def candidate_models(task: str) -> List[str]:
+    """The task's models in the order to try them right now."""
+    budget_ms = GROQ_TASK_P95_BUDGET_MS.get(task)
+    healthy, degraded = [], []
+    for model in tier_for(task):
+        summary = _summary(model)
+        if _healthy(summary, budget_ms):
+            healthy.append(model)
+        else:
+            degraded.append((summary["p95_ms"] if summary["p95_ms"] is not None else math.inf, model))
+    return healthy + [model for _, model in sorted(degraded)]
+
+
+def routing_snapshot() -> Dict[str, Any]:
+    models = {m for task in GROQ_MODEL_TIERS for m in tier_for(task)}
+    return {
+        "tasks": {
+            task: {
+                "tier": tier_for(task),
+                "p95_budget_ms": GROQ_TASK_P95_BUDGET_MS.get(task),
+                "selected": candidate_models(task)[0],
+            }
+            for task in GROQ_MODEL_TIERS
+        },
+        "models": {model: _summary(model) for model in sorted(models)},
+    }
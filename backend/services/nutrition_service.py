@@ -1,27 +1,240 @@
-from typing import Any, Dict, Optional, Tuple
+import asyncio
+import logging
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 import json
-import httpx
 from sqlalchemy.orm import Session
 
 from backend.models import MealLog
+from backend.services.circuit_breaker import CircuitOpenError, get_breaker
+from backend.services.rate_limiter import CALORIE_NINJAS, send_with_rate_limit
 from backend.utils.config import CALORIE_NINJAS_API_KEY
 
+logger = logging.getLogger(__name__)
 
 CALORIE_NINJAS_URL = "https://api.calorieninjas.com/v1/nutrition"
 
+# CalorieNinjas caps the query text; batches are packed into queries up to this size.
+MAX_QUERY_CHARS = 1500
+BATCH_QUERY_SEPARATOR = ", "
 
-async def fetch_nutrition_from_api(description: str) -> Dict[str, Any]:
+# Last good upstream answer per normalized description, served when the
+# CalorieNinjas circuit is open.
+NUTRITION_CACHE_SIZE = 1024
+_nutrition_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+# Rough per-serving values for common foods, used when nothing is cached.
+# Keys are singular; values follow the CalorieNinjas item format.
+LOCAL_NUTRITION_TABLE: Dict[str, Dict[str, float]] = {
+    "roti": {"calories": 120.0, "protein_g": 3.1, "carbohydrates_total_g": 18.0, "fat_total_g": 3.7},
+    "chapati": {"calories": 120.0, "protein_g": 3.1, "carbohydrates_total_g": 18.0, "fat_total_g": 3.7},
+    "rice": {"calories": 205.0, "protein_g": 4.3, "carbohydrates_total_g": 44.5, "fat_total_g": 0.4},
+    "dal": {"calories": 198.0, "protein_g": 12.0, "carbohydrates_total_g": 30.0, "fat_total_g": 3.5},
+    "idli": {"calories": 58.0, "protein_g": 1.6, "carbohydrates_total_g": 12.0, "fat_total_g": 0.4},
+    "dosa": {"calories": 168.0, "protein_g": 3.9, "carbohydrates_total_g": 29.0, "fat_total_g": 3.7},
+    "paneer": {"calories": 265.0, "protein_g": 18.3, "carbohydrates_total_g": 1.2, "fat_total_g": 20.8},
+    "egg": {"calories": 78.0, "protein_g": 6.3, "carbohydrates_total_g": 0.6, "fat_total_g": 5.3},
+    "banana": {"calories": 105.0, "protein_g": 1.3, "carbohydrates_total_g": 27.0, "fat_total_g": 0.4},
+    "apple": {"calories": 95.0, "protein_g": 0.5, "carbohydrates_total_g": 25.0, "fat_total_g": 0.3},
+    "milk": {"calories": 122.0, "protein_g": 8.1, "carbohydrates_total_g": 11.7, "fat_total_g": 4.8},
+    "chicken": {"calories": 239.0, "protein_g": 27.3, "carbohydrates_total_g": 0.0, "fat_total_g": 13.6},
+}
+
+
+def _cache_key(description: str) -> str:
+    return " ".join(description.lower().split())
+
+
+def _remember(description: str, data: Dict[str, Any]) -> None:
+    key = _cache_key(description)
+    _nutrition_cache[key] = data
+    _nutrition_cache.move_to_end(key)
+    while len(_nutrition_cache) > NUTRITION_CACHE_SIZE:
+        _nutrition_cache.popitem(last=False)
+
+
+def estimate_nutrition_locally(description: str) -> Dict[str, Any]:
+    """Best-effort estimate from LOCAL_NUTRITION_TABLE ("2 rotis and dal" -> 2x roti + 1x dal)."""
+    words = re.findall(r"[a-z]+|\d+(?:\.\d+)?", description.lower())
+    items = []
+    for i, word in enumerate(words):
+        name = word if word in LOCAL_NUTRITION_TABLE else word.rstrip("s")
+        if name not in LOCAL_NUTRITION_TABLE:
+            continue
+        qty = 1.0
+        if i > 0 and re.fullmatch(r"\d+(?:\.\d+)?", words[i - 1]):
+            qty = float(words[i - 1])
+        item = {k: round(v * qty, 1) for k, v in LOCAL_NUTRITION_TABLE[name].items()}
+        item["name"] = name
+        items.append(item)
+    return {"items": items}
+
+
+# Set on fallback answers for the response only; never stored with a meal.
+FALLBACK_KEYS = ("degraded", "source")
+
+
+def nutrition_fallback(description: str) -> Dict[str, Any]:
+    cached = _nutrition_cache.get(_cache_key(description))
+    if cached is not None:
+        return {**cached, "degraded": True, "source": "cache"}
+    return {**estimate_nutrition_locally(description), "degraded": True, "source": "local"}
+
+
+async def _request_nutrition(query: str, user_id: Optional[int]) -> Dict[str, Any]:
+    """One CalorieNinjas call; raises CircuitOpenError / httpx errors."""
     if not CALORIE_NINJAS_API_KEY:
         raise RuntimeError("CALORIE_NINJAS_API_KEY is not configured")
 
     headers = {"X-Api-Key": CALORIE_NINJAS_API_KEY}
-    params = {"query": description}
+    params = {"query": query}
+
+    import httpx  # deferred: keeps app import/startup fast
+
+    from backend.services.upstream_transport import get_transport
+
+    breaker = get_breaker(CALORIE_NINJAS)
+    breaker.check()
+    async with httpx.AsyncClient(timeout=15.0, transport=get_transport()) as client:
+        response = await send_with_rate_limit(
+            CALORIE_NINJAS,
+            lambda: breaker.call(
+                lambda: client.get(CALORIE_NINJAS_URL, headers=headers, params=params),
+                is_failure=lambda r: r.status_code >= 500,
+                is_throttled=lambda r: r.status_code == 429,
+            ),
+            user_key=user_id,
+        )
+    response.raise_for_status()
+    return response.json()
+
+
+async def fetch_nutrition_from_api(
+    description: str, user_id: Optional[int] = None
+) -> Dict[str, Any]:
+    import httpx
+
+    try:
+        data = await _request_nutrition(description, user_id)
+    except (CircuitOpenError, httpx.TransportError, httpx.HTTPStatusError) as e:
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500:
+            raise
+        logger.warning("CalorieNinjas unavailable (%s); using fallback nutrition", e)
+        return nutrition_fallback(description)
 
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        response = await client.get(CALORIE_NINJAS_URL, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+    _remember(description, data)
+    return data
+
+
+def _split_combined(
+    descriptions: List[str], data: Dict[str, Any]
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Attribute the items of a combined query back to its descriptions.
+
+    Items come back in query order, so each item is matched by name to a
+    description at or after the previous match. Returns None when any item
+    or description can't be attributed, or when an item's name fits more
+    than one of those descriptions ("rice" in both "rice" and "rice and
+    egg"); callers then query individually.
+    """
+    lowered = [d.lower() for d in descriptions]
+    parts: List[List[Dict[str, Any]]] = [[] for _ in descriptions]
+    pos = 0
+    for item in data.get("items") or []:
+        name = str(item.get("name", "")).lower().strip()
+        if not name:
+            return None
+        matches = [
+            j
+            for j in range(pos, len(lowered))
+            if name in lowered[j] or name.rstrip("s") in lowered[j]
+        ]
+        if len(matches) != 1:
+            return None
+        pos = matches[0]
+        parts[pos].append(item)
+    if any(not p for p in parts):
+        return None
+    return [{"items": p} for p in parts]
+
+
+def _chunk_for_queries(descriptions: List[str]) -> List[List[str]]:
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    length = 0
+    for desc in descriptions:
+        extra = len(desc) + (len(BATCH_QUERY_SEPARATOR) if current else 0)
+        if current and length + extra > MAX_QUERY_CHARS:
+            chunks.append(current)
+            current, length = [], 0
+            extra = len(desc)
+        current.append(desc)
+        length += extra
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def resolve_nutrition_batch(
+    descriptions: List[str], user_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Resolve many descriptions with as few upstream calls as possible.
+
+    Returns {normalized description: nutrition dict | Exception}. Duplicates
+    and cached descriptions cost nothing; the rest are packed into
+    multi-item CalorieNinjas queries.
+    """
+    unique: Dict[str, str] = {}
+    for desc in descriptions:
+        unique.setdefault(_cache_key(desc), desc)
+
+    results: Dict[str, Any] = {}
+    pending: List[str] = []
+    for key, desc in unique.items():
+        cached = _nutrition_cache.get(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            pending.append(desc)
+
+    individual: List[str] = []
+    for chunk in _chunk_for_queries(pending):
+        if len(chunk) == 1:
+            individual.extend(chunk)
+            continue
+        try:
+            data = await _request_nutrition(BATCH_QUERY_SEPARATOR.join(chunk), user_id)
+            split = _split_combined(chunk, data)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("Combined nutrition query failed (%s); querying individually", e)
+            split = None
+        if split is None:
+            individual.extend(chunk)
+            continue
+        for desc, part in zip(chunk, split):
+            _remember(desc, part)
+            results[_cache_key(desc)] = part
+
+    async def _one(desc: str) -> Any:
+        try:
+            return await fetch_nutrition_from_api(desc, user_id)
+        except Exception as e:  # noqa: BLE001
+            return e
+
+    fetched = await asyncio.gather(*(_one(desc) for desc in individual))
+    for desc, data in zip(individual, fetched):
+        results[_cache_key(desc)] = data
+    return results
+
+
+def _split_fallback(nutrition_data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """(data to store, whether it is a fallback estimate)."""
+    stored = {k: v for k, v in nutrition_data.items() if k not in FALLBACK_KEYS}
+    return stored, bool(nutrition_data.get("degraded"))
 
 
 def extract_macros(nutrition_data: Dict[str, Any]) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
@@ -38,8 +251,9 @@ def extract_macros(nutrition_data: Dict[str, Any]) -> Tuple[Optional[float], Opt
 
 async def log_meal(
     db: Session, user_id: Optional[int], description: str
-) -> MealLog:
-    nutrition_data = await fetch_nutrition_from_api(description)
+) -> Tuple[MealLog, bool]:
+    """Store a meal; returns (meal, degraded) where degraded marks a fallback estimate."""
+    nutrition_data, degraded = _split_fallback(await fetch_nutrition_from_api(description, user_id))
     calories, protein_g, carbs_g, fat_g = extract_macros(nutrition_data)
 
     meal = MealLog(
@@ -54,5 +268,60 @@ async def log_meal(
     db.add(meal)
     db.commit()
     db.refresh(meal)
-    return meal
+    return meal, degraded
+
+
+async def log_meals_batch(
+    db: Session, user_id: Optional[int], descriptions: List[str]
+) -> List[Dict[str, Any]]:
+    """
+    Resolve and store many meals in one transaction.
+
+    Returns one result dict per input entry, in order; entries whose
+    nutrition lookup failed are reported with an error and not stored.
+    """
+    resolved = await resolve_nutrition_batch(
+        [d for d in descriptions if d and d.strip()], user_id
+    )
+
+    results: List[Dict[str, Any]] = []
+    meals: List[Tuple[int, MealLog, bool]] = []
+    for index, description in enumerate(descriptions):
+        if not description or not description.strip():
+            results.append({"index": index, "description": description, "error": "description is required"})
+            continue
+        data = resolved.get(_cache_key(description))
+        if isinstance(data, Exception) or data is None:
+            results.append({"index": index, "description": description, "error": str(data)})
+            continue
+        data, degraded = _split_fallback(data)
+        calories, protein_g, carbs_g, fat_g = extract_macros(data)
+        meal = MealLog(
+            user_id=user_id,
+            description=description,
+            nutrition_json=json.dumps(data),
+            calories=calories,
+            protein_g=protein_g,
+            carbs_g=carbs_g,
+            fat_g=fat_g,
+        )
+        meals.append((len(results), meal, degraded))
+        results.append({"index": index, "description": description, "meal": meal})
 
+    if meals:
+        db.add_all([meal for _, meal, _ in meals])
+        # Flush to get ids, then read them before commit expires the objects.
+        db.flush()
+        for pos, meal, degraded in meals:
+            results[pos] = {
+                "index": results[pos]["index"],
+                "description": meal.description,
+                "meal_id": meal.id,
+                "calories": meal.calories,
+                "protein_g": meal.protein_g,
+                "carbs_g": meal.carbs_g,
+                "fat_g": meal.fat_g,
+                "degraded": degraded,
+            }
+        db.commit()
+    return results
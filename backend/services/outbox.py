@@ -0,0 +1,341 @@
+"""
+Durable after-response work.
+
+Writes that the response doesn't depend on (chat history, intent logs,
+plan feedback revisions) are enqueued as outbox_tasks rows in one commit
+instead of being done inline. OutboxWorker runs them right after, off the
+request path:
+
+- enqueue() wakes the worker, so a task usually runs within milliseconds
+- tasks with the same ordering_key run one at a time in id order, so one
+  user's chat turns land in the order they happened
+- a failing task is retried with exponential backoff, and marked
+  "failed" after OUTBOX_MAX_ATTEMPTS (kept for inspection)
+- a claimed task is leased for OUTBOX_LEASE_SECONDS; a worker that dies
+  mid-task leaves it to be picked up again after the lease expires
+- on shutdown the worker keeps draining due tasks for up to
+  OUTBOX_DRAIN_SECONDS; anything left runs on the next start
+
+A handler's writes through the session it is given are committed together
+with the task's "done" mark, so they happen exactly once. Anything else
+it does (its own commits, calls to other services) is at-least-once and
+may repeat on retry; handlers should avoid that.
+
+    python -m backend.services.outbox    # run due tasks once and exit
+"""
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, exists, func, or_, select, update
+from sqlalchemy.orm import Session, aliased
+
+from backend.database.session import SessionLocal
+from backend.models import OutboxTask
+from backend.utils.config import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_SECONDS,
+    OUTBOX_RETENTION_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Retry delay is RETRY_BASE_SECONDS * 2**(attempts - 1), capped.
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 600.0
+
+# kind -> fn(db, payload). The handler's writes and the "done" mark share a commit.
+HANDLERS: Dict[str, Callable[[Session, Dict[str, Any]], None]] = {}
+
+
+def handler(kind: str):
+    def register(fn: Callable[[Session, Dict[str, Any]], None]):
+        HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def enqueue(db: Session, kind: str, payload: Dict[str, Any], ordering_key: Optional[str] = None) -> OutboxTask:
+    """Commit a task (and anything else pending on ``db``) and wake the worker."""
+    task = OutboxTask(
+        kind=kind,
+        ordering_key=ordering_key,
+        payload_json=json.dumps(payload, default=str),
+        status=STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=_now(),
+    )
+    db.add(task)
+    db.commit()
+    worker.notify()
+    return task
+
+
+# ---- processing ----
+
+
+def _claim_due(db: Session, limit: int) -> List[int]:
+    """Lease up to ``limit`` due tasks that aren't waiting on an earlier one."""
+    now = _now()
+    earlier = aliased(OutboxTask)
+    blocked = exists().where(
+        earlier.ordering_key == OutboxTask.ordering_key,
+        earlier.id < OutboxTask.id,
+        earlier.status == STATUS_PENDING,
+    )
+    ids = db.execute(
+        select(OutboxTask.id)
+        .where(
+            OutboxTask.status == STATUS_PENDING,
+            OutboxTask.next_attempt_at <= now,
+            or_(OutboxTask.locked_until.is_(None), OutboxTask.locked_until < now),
+            or_(OutboxTask.ordering_key.is_(None), ~blocked),
+        )
+        .order_by(OutboxTask.id)
+        .limit(limit)
+    ).scalars().all()
+    claimed = []
+    for task_id in ids:
+        # Conditional on the lease still being free, so two workers can't both win.
+        result = db.execute(
+            update(OutboxTask)
+            .where(
+                OutboxTask.id == task_id,
+                OutboxTask.status == STATUS_PENDING,
+                or_(OutboxTask.locked_until.is_(None), OutboxTask.locked_until < now),
+            )
+            .values(locked_until=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+        )
+        if result.rowcount:
+            claimed.append(task_id)
+    db.commit()
+    return claimed
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def run_task(task_id: int) -> bool:
+    """Run one claimed task. Returns True when it completed."""
+    db = SessionLocal()
+    try:
+        task = db.get(OutboxTask, task_id)
+        if task is None or task.status != STATUS_PENDING:
+            return False
+        try:
+            fn = HANDLERS.get(task.kind)
+            if fn is None:
+                raise LookupError(f"no outbox handler for {task.kind!r}")
+            fn(db, json.loads(task.payload_json))
+            task.status = STATUS_DONE
+            task.completed_at = _now()
+            task.locked_until = None
+            db.commit()
+            return True
+        except Exception as exc:  # noqa: BLE001
+            db.rollback()
+            task = db.get(OutboxTask, task_id)
+            task.attempts += 1
+            task.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+            task.locked_until = None
+            if task.attempts >= OUTBOX_MAX_ATTEMPTS:
+                task.status = STATUS_FAILED
+                logger.error("Outbox task %s (%s) failed permanently: %s", task_id, task.kind, task.last_error)
+            else:
+                task.next_attempt_at = _now() + timedelta(seconds=_retry_delay(task.attempts))
+                logger.warning(
+                    "Outbox task %s (%s) failed (attempt %s), retrying: %s",
+                    task_id, task.kind, task.attempts, task.last_error,
+                )
+            db.commit()
+            return False
+    finally:
+        db.close()
+
+
+def purge_done(db: Session) -> int:
+    cutoff = _now() - timedelta(seconds=OUTBOX_RETENTION_SECONDS)
+    result = db.execute(
+        delete(OutboxTask).where(OutboxTask.status == STATUS_DONE, OutboxTask.completed_at < cutoff)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def process_due(limit: int = OUTBOX_BATCH_SIZE) -> int:
+    """Run every task that is due now, batch by batch. Returns tasks completed."""
+    completed = 0
+    while True:
+        db = SessionLocal()
+        try:
+            claimed = _claim_due(db, limit)
+        finally:
+            db.close()
+        if not claimed:
+            break
+        results = [run_task(task_id) for task_id in claimed]
+        completed += sum(results)
+        # Stop when a batch made no progress (every task failed and was
+        # pushed back), rather than spinning on the same blocked keys.
+        if not any(results):
+            break
+    return completed
+
+
+def next_due_in(db: Session) -> Optional[float]:
+    """Seconds until the earliest pending task is due (None when there is none)."""
+    earliest = db.execute(
+        select(func.min(OutboxTask.next_attempt_at)).where(OutboxTask.status == STATUS_PENDING)
+    ).scalar_one()
+    if earliest is None:
+        return None
+    return max(0.0, (_as_utc(earliest) - _now()).total_seconds())
+
+
+def status_counts(db: Session) -> Dict[str, Any]:
+    counts = dict(
+        db.execute(select(OutboxTask.status, func.count()).group_by(OutboxTask.status)).all()
+    )
+    oldest = db.execute(
+        select(func.min(OutboxTask.created_at)).where(OutboxTask.status == STATUS_PENDING)
+    ).scalar_one()
+    return {
+        "pending": counts.get(STATUS_PENDING, 0),
+        "done": counts.get(STATUS_DONE, 0),
+        "failed": counts.get(STATUS_FAILED, 0),
+        "oldest_pending_seconds": (
+            round((_now() - _as_utc(oldest)).total_seconds(), 1) if oldest is not None else None
+        ),
+        "worker_running": worker.running,
+    }
+
+
+# ---- worker ----
+
+
+class OutboxWorker:
+    def __init__(self, poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = self._loop.create_task(self._run())
+
+    def notify(self) -> None:
+        """Wake the worker; safe from any thread (enqueue runs in threadpools)."""
+        loop, wake = self._loop, self._wake
+        if loop is None or wake is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            pass  # loop shutting down; the task runs on the next start
+
+    async def _run(self) -> None:
+        purged_at = 0.0
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                await asyncio.to_thread(process_due)
+                loop_time = self._loop.time()
+                if loop_time - purged_at > 3600:
+                    purged_at = loop_time
+                    await asyncio.to_thread(_purge)
+                timeout = await asyncio.to_thread(_next_timeout, self.poll_seconds)
+            except Exception:  # noqa: BLE001
+                logger.exception("Outbox worker pass failed")
+                timeout = self.poll_seconds
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self, drain_seconds: float) -> None:
+        """Stop polling, finish due tasks for up to ``drain_seconds``."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=drain_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox worker still busy after %.0fs; stopping", drain_seconds)
+            self._task.cancel()
+        try:
+            # One last pass for tasks enqueued by requests that finished meanwhile.
+            await asyncio.wait_for(asyncio.to_thread(process_due), timeout=drain_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox drain timed out; remaining tasks run on next start")
+        self._task = None
+        self._loop = None
+        self._wake = None
+
+
+def _purge() -> None:
+    db = SessionLocal()
+    try:
+        purge_done(db)
+    finally:
+        db.close()
+
+
+def _next_timeout(poll_seconds: float) -> float:
+    db = SessionLocal()
+    try:
+        due_in = next_due_in(db)
+    finally:
+        db.close()
+    return poll_seconds if due_in is None else min(poll_seconds, due_in)
+
+
+worker = OutboxWorker(OUTBOX_POLL_SECONDS)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    # Handlers register on import.
+    import backend.agents.aromi_agent  # noqa: F401
+
+    completed = process_due()
+    db = SessionLocal()
+    try:
+        counts = status_counts(db)
+    finally:
+        db.close()
+    print(f"Completed {completed} task(s); pending={counts['pending']} failed={counts['failed']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
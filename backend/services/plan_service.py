@@ -0,0 +1,204 @@
+import copy
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.models import PlanFeedback, PlanRevision, WorkoutPlan
+
+
+# Latest materialized state per plan: plan_id -> (revision, data).
+# Bounded so long-running workers don't keep every plan ever read in memory.
+SNAPSHOT_CACHE_SIZE = 256
+_snapshot_cache: "OrderedDict[int, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+_snapshot_lock = threading.Lock()
+
+# Concurrent feedback on the same plan races for the next revision number;
+# the unique (plan_id, revision) constraint decides the winner and we retry.
+MAX_REVISION_RETRIES = 5
+
+
+# ---- JSON patch (RFC 6902 subset: add / remove / replace) ----
+
+
+def _split_pointer(path: str) -> List[str]:
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise ValueError(f"Invalid JSON pointer: {path!r}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in path[1:].split("/")]
+
+
+def _resolve_parent(doc: Any, parts: List[str]) -> Tuple[Any, str]:
+    target = doc
+    for part in parts[:-1]:
+        target = target[int(part)] if isinstance(target, list) else target[part]
+    return target, parts[-1]
+
+
+def apply_json_patch(doc: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Apply patch operations in place and return the document."""
+    for op in ops:
+        parts = _split_pointer(op["path"])
+        if not parts:
+            raise ValueError("Patching the document root is not supported")
+        parent, key = _resolve_parent(doc, parts)
+        kind = op["op"]
+        if isinstance(parent, list):
+            if kind == "add":
+                if key == "-":
+                    parent.append(op["value"])
+                else:
+                    parent.insert(int(key), op["value"])
+            elif kind == "remove":
+                del parent[int(key)]
+            elif kind == "replace":
+                parent[int(key)] = op["value"]
+            else:
+                raise ValueError(f"Unsupported patch op: {kind}")
+        else:
+            if kind in ("add", "replace"):
+                parent[key] = op["value"]
+            elif kind == "remove":
+                del parent[key]
+            else:
+                raise ValueError(f"Unsupported patch op: {kind}")
+    return doc
+
+
+def _load_base(plan: WorkoutPlan) -> Dict[str, Any]:
+    try:
+        data = json.loads(plan.plan_json)
+    except Exception:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    # Feedback patches append to this list; older plans were stored without it.
+    data.setdefault("feedback_history", [])
+    return data
+
+
+def plan_view(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Plan data as served to clients: feedback stays in plan_feedback and the agent's context."""
+    return {key: value for key, value in data.items() if key != "feedback_history"}
+
+
+# ---- revisions ----
+
+
+def get_latest_plan(db: Session, user_id: int) -> Optional[WorkoutPlan]:
+    return (
+        db.query(WorkoutPlan)
+        .filter(WorkoutPlan.user_id == user_id)
+        .order_by(WorkoutPlan.created_at.desc())
+        .first()
+    )
+
+
+def get_latest_revision_number(db: Session, plan_id: int) -> int:
+    return (
+        db.query(func.max(PlanRevision.revision))
+        .filter(PlanRevision.plan_id == plan_id)
+        .scalar()
+        or 0
+    )
+
+
+def get_plan_version(db: Session, plan_id: int) -> Tuple[int, Optional[datetime]]:
+    """(latest revision number, when it was written) in one query."""
+    latest, written_at = (
+        db.query(func.max(PlanRevision.revision), func.max(PlanRevision.created_at))
+        .filter(PlanRevision.plan_id == plan_id)
+        .one()
+    )
+    return latest or 0, written_at
+
+
+def _patches_between(
+    db: Session, plan_id: int, after: int, upto: Optional[int]
+) -> List[PlanRevision]:
+    q = db.query(PlanRevision).filter(
+        PlanRevision.plan_id == plan_id, PlanRevision.revision > after
+    )
+    if upto is not None:
+        q = q.filter(PlanRevision.revision <= upto)
+    return q.order_by(PlanRevision.revision.asc()).all()
+
+
+def materialize_plan(
+    db: Session, plan: WorkoutPlan, revision: Optional[int] = None
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Return (plan_data, revision) for the requested revision (latest when None).
+
+    The latest state is cached per plan, so a read after N new feedback entries
+    only fetches and applies those N patches.
+    """
+    latest = get_latest_revision_number(db, plan.id)
+    target = latest if revision is None else revision
+    if target < 0 or target > latest:
+        raise ValueError(f"Plan {plan.id} has no revision {target}")
+
+    start_rev, data = 0, None
+    with _snapshot_lock:
+        cached = _snapshot_cache.get(plan.id)
+        if cached is not None and cached[0] <= target:
+            _snapshot_cache.move_to_end(plan.id)
+            start_rev, data = cached[0], copy.deepcopy(cached[1])
+    if data is None:
+        data = _load_base(plan)
+
+    for rev in _patches_between(db, plan.id, start_rev, target):
+        apply_json_patch(data, json.loads(rev.patch_json))
+
+    if target == latest:
+        with _snapshot_lock:
+            _snapshot_cache[plan.id] = (target, copy.deepcopy(data))
+            _snapshot_cache.move_to_end(plan.id)
+            while len(_snapshot_cache) > SNAPSHOT_CACHE_SIZE:
+                _snapshot_cache.popitem(last=False)
+    return data, target
+
+
+def add_plan_feedback(
+    db: Session, plan: WorkoutPlan, user_id: int, feedback: str
+) -> Tuple[PlanFeedback, PlanRevision]:
+    """
+    Flush feedback plus its one-op patch revision without committing, so it
+    lands atomically with the caller's other writes. Raises IntegrityError
+    (at flush or commit) when another writer took the revision number.
+    """
+    patch = json.dumps([{"op": "add", "path": "/feedback_history/-", "value": feedback}])
+    entry = PlanFeedback(plan_id=plan.id, user_id=user_id, feedback=feedback)
+    db.add(entry)
+    db.flush()
+    revision = PlanRevision(
+        plan_id=plan.id,
+        revision=get_latest_revision_number(db, plan.id) + 1,
+        patch_json=patch,
+        feedback_id=entry.id,
+    )
+    db.add(revision)
+    db.flush()
+    return entry, revision
+
+
+def record_plan_feedback(
+    db: Session, plan: WorkoutPlan, user_id: int, feedback: str
+) -> Tuple[PlanFeedback, PlanRevision]:
+    """Append feedback as a small insert plus a one-op patch revision."""
+    for _ in range(MAX_REVISION_RETRIES):
+        try:
+            entry, revision = add_plan_feedback(db, plan, user_id, feedback)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            continue
+        return entry, revision
+    raise RuntimeError(f"Could not record feedback for plan {plan.id}: revision conflict")
+
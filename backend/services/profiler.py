@@ -0,0 +1,263 @@
+"""
+On-demand sampling profiler for individual requests.
+
+ProfilingMiddleware profiles a request when it carries
+"X-Profile: <ADMIN_TOKEN>" or, at random, with probability
+PROFILING_SAMPLE_RATE. While a request is profiled, one shared sampler
+thread looks at it every PROFILING_INTERVAL_MS and records where it is:
+
+    [running];...     the request's code is on the event loop thread (CPU,
+                      sync SQL, JSON encoding, anything that blocks the loop)
+    [awaiting];...    the request is suspended in an await (Groq, a thread
+                      pool hop, ...); the leaf says whether the loop was idle
+                      or busy running other requests meanwhile
+
+Stacks are written in the folded format ("a;b;c 12"), which flamegraph.pl,
+speedscope and inferno read directly, with a JSON sidecar holding the
+route, status and duration. Only the newest PROFILING_MAX_PROFILES are kept.
+"""
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from backend.utils.config import (
+    ADMIN_TOKEN,
+    PROFILING_DIR,
+    PROFILING_INTERVAL_MS,
+    PROFILING_MAX_CONCURRENT,
+    PROFILING_MAX_PROFILES,
+    PROFILING_SAMPLE_RATE,
+)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+_PROFILE_ID = re.compile(r"^[0-9TZ]+-[0-9a-f]{8}$")
+# Leaf functions that mean "the event loop is waiting for I/O".
+_IDLE_LEAVES = {"select", "poll", "epoll", "kqueue", "control", "_run_once"}
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}".replace(";", ":")
+
+
+def _await_chain(coro: Any) -> tuple:
+    """Frames of a coroutine and everything it is awaiting, outermost first."""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return frames, coro
+
+
+class RequestProfile:
+    def __init__(self, task: asyncio.Task, thread_id: int, method: str, path: str, reason: str):
+        self.id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{secrets.token_hex(4)}"
+        self.task = task
+        self.thread_id = thread_id
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.stacks: Counter = Counter()
+
+    def sample(self, thread_frames: Dict[int, Any]) -> None:
+        coro = self.task.get_coro()
+        if coro is None:
+            return
+        loop_frame = thread_frames.get(self.thread_id)
+        if getattr(coro, "cr_running", False) and loop_frame is not None:
+            stack = []
+            frame = loop_frame
+            while frame is not None:
+                stack.append(frame)
+                if frame is coro.cr_frame:
+                    break  # drop the event loop / server frames below the request
+                frame = frame.f_back
+            self.stacks[";".join(["[running]", *(_label(f) for f in reversed(stack))])] += 1
+            return
+        frames, leaf = _await_chain(coro)
+        if not frames:
+            return
+        labels = ["[awaiting]", *(_label(f) for f in frames)]
+        if leaf is not None:
+            labels.append(f"<{type(leaf).__name__}>")
+        idle = loop_frame is None or loop_frame.f_code.co_name in _IDLE_LEAVES
+        labels.append("(loop idle)" if idle else "(loop busy)")
+        self.stacks[";".join(labels)] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class _Sampler:
+    """One daemon thread sampling every active profile; exits when there are none."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._active: List[RequestProfile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile: RequestProfile) -> bool:
+        with self._lock:
+            if len(self._active) >= PROFILING_MAX_CONCURRENT:
+                return False
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        return True
+
+    def stop(self, profile: RequestProfile) -> None:
+        with self._lock:
+            if profile in self._active:
+                self._active.remove(profile)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            for profile in active:
+                try:
+                    profile.sample(frames)
+                except Exception:  # noqa: BLE001 - a bad sample must not kill the sampler
+                    pass
+            del frames
+            time.sleep(self.interval_seconds)
+
+
+_sampler = _Sampler(PROFILING_INTERVAL_MS / 1000)
+
+
+# ---- storage ----
+
+
+def _save(profile: RequestProfile, meta: Dict[str, Any]) -> None:
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    with open(os.path.join(PROFILING_DIR, f"{profile.id}.folded"), "w", encoding="utf-8") as fh:
+        fh.write(profile.folded())
+    with open(os.path.join(PROFILING_DIR, f"{profile.id}.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    ids = sorted(name[:-5] for name in os.listdir(PROFILING_DIR) if name.endswith(".json"))
+    for old in ids[: max(0, len(ids) - PROFILING_MAX_PROFILES)]:
+        for ext in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(PROFILING_DIR, old + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(limit: int = 50, route: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Newest first."""
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILING_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILING_DIR, name), encoding="utf-8") as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        if route is None or meta.get("route") == route:
+            profiles.append(meta)
+            if len(profiles) >= limit:
+                break
+    return profiles
+
+
+def load_profile(profile_id: str) -> Optional[str]:
+    """Folded stacks of one profile, or None if unknown."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILING_DIR, f"{profile_id}.folded"), encoding="utf-8") as fh:
+            return fh.read()
+    except FileNotFoundError:
+        return None
+
+
+# ---- middleware ----
+
+
+def _profile_reason(scope: Dict[str, Any]) -> Optional[str]:
+    if scope["path"].startswith("/admin"):
+        return None
+    if ADMIN_TOKEN:
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER:
+                if hmac.compare_digest(value, ADMIN_TOKEN.encode()):
+                    return "header"
+                break
+    if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI, so the endpoint runs in the task being sampled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        reason = _profile_reason(scope)
+        if reason is None:
+            return await self.app(scope, receive, send)
+        profile = RequestProfile(
+            asyncio.current_task(), threading.get_ident(), scope["method"], scope["path"], reason
+        )
+        if not _sampler.start(profile):
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if reason == "header":
+                    message = {**message, "headers": [*message.get("headers", []), (PROFILE_ID_HEADER, profile.id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _sampler.stop(profile)
+            route = scope.get("route")
+            meta = {
+                "id": profile.id,
+                "method": profile.method,
+                "path": profile.path,
+                "route": getattr(route, "path", profile.path),
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - profile.started) * 1000, 1),
+                "samples": sum(profile.stacks.values()),
+                "interval_ms": PROFILING_INTERVAL_MS,
+                "reason": profile.reason,
+                "started_at": profile.started_at.isoformat(),
+            }
+            await asyncio.to_thread(_save, profile, meta)
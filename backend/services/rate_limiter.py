@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional
+
+from backend.utils.config import (
+    CALORIE_NINJAS_BURST,
+    CALORIE_NINJAS_MAX_CONCURRENCY,
+    CALORIE_NINJAS_RPS,
+    GROQ_BURST,
+    GROQ_MAX_CONCURRENCY,
+    GROQ_RPS,
+    UPSTREAM_BACKOFF_BASE_SECONDS,
+    UPSTREAM_BACKOFF_MAX_SECONDS,
+    UPSTREAM_MAX_RETRIES,
+    UPSTREAM_PER_USER_CONCURRENCY,
+    UPSTREAM_QUEUE_TIMEOUT_SECONDS,
+)
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+GROQ = "groq"
+CALORIE_NINJAS = "calorieninjas"
+
+PROVIDER_LIMITS: Dict[str, Dict[str, float]] = {
+    GROQ: {"rate": GROQ_RPS, "burst": GROQ_BURST, "concurrency": GROQ_MAX_CONCURRENCY},
+    CALORIE_NINJAS: {
+        "rate": CALORIE_NINJAS_RPS,
+        "burst": CALORIE_NINJAS_BURST,
+        "concurrency": CALORIE_NINJAS_MAX_CONCURRENCY,
+    },
+}
+
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class UpstreamRateLimited(Exception):
+    """Raised when an upstream call cannot be admitted or keeps returning 429."""
+
+    def __init__(self, provider: str, retry_after: Optional[float] = None):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(f"{provider} is rate limited; retry after {retry_after or 'a while'}s")
+
+
+# ---- header parsing ----
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Parse "2.5", "7.66s", "1m30s" or "120ms" into seconds."""
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(num) * scale[unit] for num, unit in parts)
+
+
+def retry_after_from_headers(headers: "httpx.Headers") -> Optional[float]:
+    """Seconds the provider asked us to wait, from Retry-After or x-ratelimit-reset-*."""
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        seconds = _parse_duration(retry_after)
+        if seconds is not None:
+            return seconds
+        try:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            pass
+
+    waits = []
+    for kind in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        reset = headers.get(f"x-ratelimit-reset-{kind}")
+        if reset and remaining is not None and remaining.strip() == "0":
+            seconds = _parse_duration(reset)
+            if seconds is not None:
+                waits.append(seconds)
+    return max(waits) if waits else None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    cap = min(UPSTREAM_BACKOFF_MAX_SECONDS, UPSTREAM_BACKOFF_BASE_SECONDS * (2**attempt))
+    return random.uniform(0, cap)
+
+
+# ---- limiter ----
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens until the provider's window resets."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, deadline: float) -> None:
+        # The lock makes waiters queue in FIFO order instead of racing on refill.
+        await asyncio.wait_for(self._lock.acquire(), timeout=max(deadline - time.monotonic(), 0))
+        try:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+                if now + wait > deadline:
+                    raise asyncio.TimeoutError
+                await asyncio.sleep(wait)
+        finally:
+            self._lock.release()
+
+
+class ProviderLimiter:
+    """Global token bucket + concurrency cap for one provider, with a per-user cap."""
+
+    def __init__(self, name: str, *, rate: float, burst: float, concurrency: float):
+        self.name = name
+        self.loop = asyncio.get_running_loop()
+        self.bucket = TokenBucket(rate, burst)
+        self.semaphore = asyncio.Semaphore(int(concurrency))
+        self._user_semaphores: Dict[Hashable, asyncio.Semaphore] = {}
+        self._user_refs: Dict[Hashable, int] = {}
+
+    def _user_semaphore(self, user_key: Hashable) -> asyncio.Semaphore:
+        sem = self._user_semaphores.get(user_key)
+        if sem is None:
+            sem = asyncio.Semaphore(UPSTREAM_PER_USER_CONCURRENCY)
+            self._user_semaphores[user_key] = sem
+        self._user_refs[user_key] = self._user_refs.get(user_key, 0) + 1
+        return sem
+
+    def _release_user(self, user_key: Hashable) -> None:
+        self._user_refs[user_key] -= 1
+        if self._user_refs[user_key] == 0:
+            del self._user_refs[user_key]
+            del self._user_semaphores[user_key]
+
+    async def _wait(self, awaitable: Awaitable[Any], deadline: float) -> None:
+        try:
+            await asyncio.wait_for(awaitable, timeout=max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            raise UpstreamRateLimited(self.name, self.retry_hint()) from None
+
+    @asynccontextmanager
+    async def slot(self, user_key: Hashable, deadline: float) -> AsyncIterator[None]:
+        """Wait (until deadline) for a per-user slot, a global slot and a token."""
+        user_sem = self._user_semaphore(user_key)
+        try:
+            await self._wait(user_sem.acquire(), deadline)
+            try:
+                await self._wait(self.semaphore.acquire(), deadline)
+                try:
+                    await self._wait(self.bucket.acquire(deadline), deadline)
+                    yield
+                finally:
+                    self.semaphore.release()
+            finally:
+                user_sem.release()
+        finally:
+            self._release_user(user_key)
+
+    def retry_hint(self) -> float:
+        return max(self.bucket.paused_until - time.monotonic(), 1.0 / self.bucket.rate)
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    # asyncio primitives are bound to one event loop; rebuild if the loop changed.
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(provider)
+    if limiter is None or limiter.loop is not loop:
+        limiter = ProviderLimiter(provider, **PROVIDER_LIMITS[provider])
+        _limiters[provider] = limiter
+    return limiter
+
+
+async def send_with_rate_limit(
+    provider: str,
+    send: Callable[[], Awaitable["httpx.Response"]],
+    *,
+    user_key: Any = None,
+    queue_timeout: Optional[float] = None,
+) -> "httpx.Response":
+    """
+    Run ``send`` under the provider's limits, retrying 429/5xx with jittered
+    exponential backoff that honours Retry-After / x-ratelimit-* headers.
+
+    Returns the last response for non-429 outcomes; raises UpstreamRateLimited
+    when the provider keeps throttling or the queue deadline passes.
+    """
+    limiter = get_limiter(provider)
+    timeout = UPSTREAM_QUEUE_TIMEOUT_SECONDS if queue_timeout is None else queue_timeout
+    deadline = time.monotonic() + timeout
+
+    attempt = 0
+    while True:
+        async with limiter.slot(user_key, deadline):
+            resp = await send()
+
+        hinted = retry_after_from_headers(resp.headers)
+        if hinted is not None:
+            # Applies to successes too: remaining == 0 means the window is spent.
+            limiter.bucket.pause(hinted)
+
+        if resp.status_code not in RETRYABLE_STATUS:
+            return resp
+        if attempt >= UPSTREAM_MAX_RETRIES:
+            break
+
+        delay = max(hinted or 0.0, backoff_delay(attempt))
+        if time.monotonic() + delay > deadline:
+            break
+        logger.warning(
+            "%s returned %s; retrying in %.2fs (attempt %d)",
+            provider, resp.status_code, delay, attempt + 1,
+        )
+        await asyncio.sleep(delay)
+        attempt += 1
+
+    if resp.status_code == 429:
+        raise UpstreamRateLimited(provider, hinted)
+    return resp
@@ -0,0 +1,301 @@
+"""
+Local risk / readiness scoring for health assessments.
+
+The 12 free-text answers (order of QUESTIONS in the frontend's
+HealthAssessmentForm) are mapped to a fixed feature vector, then scored
+with two linear models:
+
+    risk      = 100 * sigmoid(RISK_BIAS + X @ RISK_WEIGHTS)
+    readiness = 100 * clip(READINESS_BIAS + X @ READINESS_WEIGHTS, 0, 1)
+
+Scores are stored on HealthAssessment with SCORING_VERSION; bump the
+version whenever features or weights change and re-score everything:
+
+    python -m backend.services.risk_scoring [--all] [--chunk-size 5000]
+
+The re-scoring job works on chunks of rows as matrices (NumPy when it is
+installed, plain Python otherwise), so a rules change costs one pass over
+the table instead of an LLM call per assessment.
+"""
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.models import HealthAssessment
+
+SCORING_VERSION = 1
+RESCORE_CHUNK_SIZE = 5000
+
+# Answer positions in HealthAssessmentCreate.answers.
+Q_ENERGY, Q_EXERCISE_DAYS, Q_GOAL, Q_CONDITIONS, Q_SLEEP, Q_STRESS = range(6)
+Q_ACTIVITY, Q_INJURIES, Q_DIET, Q_SUBSTANCES, Q_STYLE, Q_SUCCESS = range(6, 12)
+
+# All features are scaled to 0..1, with 1 meaning "more of the named thing".
+FEATURES = (
+    "low_energy",
+    "inactivity",
+    "chronic_condition",
+    "cardiometabolic_condition",
+    "short_sleep",
+    "long_sleep",
+    "stress",
+    "sedentary",
+    "injury",
+    "poor_diet",
+    "smoking",
+    "alcohol",
+)
+
+RISK_WEIGHTS = (0.6, 0.9, 0.8, 1.2, 0.9, 0.3, 0.8, 0.9, 0.7, 0.7, 1.4, 0.6)
+RISK_BIAS = -3.0
+READINESS_WEIGHTS = (-0.25, -0.3, -0.05, -0.1, -0.1, 0.0, -0.15, -0.1, -0.25, -0.05, -0.05, -0.05)
+READINESS_BIAS = 1.0
+
+# Used when an answer can't be interpreted; roughly the population middle.
+NEUTRAL = dict(zip(FEATURES, (0.5, 0.5, 0.0, 0.0, 0.2, 0.0, 0.5, 0.5, 0.0, 0.5, 0.0, 0.0)))
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_WORD_NUMBERS = {
+    "zero": 0, "none": 0, "never": 0, "one": 1, "once": 1, "two": 2, "twice": 2,
+    "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "every": 7, "daily": 7,
+}
+# Ordered scales, most specific phrases first.
+_LEVEL_WORDS = (
+    ("very low", 0.1), ("very high", 0.9), ("very poor", 0.1), ("very good", 0.85),
+    ("excellent", 0.95), ("great", 0.85), ("high", 0.8), ("good", 0.75),
+    ("moderate", 0.5), ("average", 0.5), ("okay", 0.5), ("ok", 0.5), ("fair", 0.4),
+    ("medium", 0.5), ("low", 0.25), ("poor", 0.2), ("bad", 0.2), ("terrible", 0.05),
+)
+_FREQUENCY_WORDS = (
+    ("all the time", 1.0), ("always", 1.0), ("constantly", 1.0), ("very often", 0.85),
+    ("daily", 0.85), ("often", 0.7), ("frequently", 0.7), ("sometimes", 0.45),
+    ("occasionally", 0.35), ("rarely", 0.15), ("seldom", 0.15), ("never", 0.0),
+)
+_ACTIVITY_WORDS = (
+    ("very active", 0.95), ("highly active", 0.95), ("sedentary", 0.05),
+    ("desk", 0.15), ("lightly active", 0.35), ("light", 0.35), ("moderately", 0.6),
+    ("moderate", 0.6), ("active", 0.8),
+)
+_NEGATIONS = ("no", "none", "nope", "nil", "n/a", "na", "nothing", "not really", "never")
+_CARDIOMETABOLIC = ("diabet", "hypertension", "blood pressure", "bp", "heart", "cardiac",
+                    "cholesterol", "obes", "thyroid", "pcos", "pcod")
+
+
+def _first_number(text: str) -> Optional[float]:
+    """First quantity in ``text``; ranges like "7-8" give their midpoint."""
+    found = [float(n) for n in _NUMBER.findall(text)[:2]]
+    if len(found) == 2 and re.search(r"\d\s*(?:-|to)\s*\d", text):
+        return sum(found) / 2
+    if found:
+        return found[0]
+    for word in re.findall(r"[a-z]+", text):
+        if word in _WORD_NUMBERS:
+            return float(_WORD_NUMBERS[word])
+    return None
+
+
+def _scale(text: str, words: Sequence[Tuple[str, float]]) -> Optional[float]:
+    for phrase, value in words:
+        if re.search(rf"\b{re.escape(phrase)}\b", text):
+            return value
+    return None
+
+
+def _rating(text: str) -> Optional[float]:
+    """0..1 from "7/10", "4 out of 5", a bare 1-10 number or level words."""
+    match = re.search(r"(\d+(?:\.\d+)?)\s*(?:/|out of)\s*(\d+)", text)
+    if match and float(match.group(2)) > 0:
+        return min(float(match.group(1)) / float(match.group(2)), 1.0)
+    word = _scale(text, _LEVEL_WORDS)
+    if word is not None:
+        return word
+    number = _first_number(text)
+    if number is not None and 0 <= number <= 10:
+        return number / 10
+    return None
+
+
+def _is_negative(text: str) -> bool:
+    stripped = text.strip(" .!")
+    return not stripped or stripped in _NEGATIONS or stripped.startswith(("no ", "none", "nothing"))
+
+
+def extract_features(answers: Sequence[str]) -> Tuple[List[float], int]:
+    """Feature vector in FEATURES order plus how many features fell back to NEUTRAL."""
+    a = [(answers[i] if i < len(answers) else "").lower().strip() for i in range(12)]
+    f: Dict[str, Optional[float]] = dict.fromkeys(FEATURES)
+
+    energy = _rating(a[Q_ENERGY])
+    f["low_energy"] = None if energy is None else 1 - energy
+
+    days = _first_number(a[Q_EXERCISE_DAYS])
+    if days is None and a[Q_EXERCISE_DAYS] and _is_negative(a[Q_EXERCISE_DAYS]):
+        days = 0.0
+    f["inactivity"] = None if days is None else 1 - min(days, 7) / 7
+
+    if _is_negative(a[Q_CONDITIONS]):
+        f["chronic_condition"] = f["cardiometabolic_condition"] = 0.0
+    else:
+        f["chronic_condition"] = 1.0
+        f["cardiometabolic_condition"] = float(
+            any(re.search(rf"\b{k}", a[Q_CONDITIONS]) for k in _CARDIOMETABOLIC)
+        )
+
+    sleep = _first_number(a[Q_SLEEP])
+    if sleep is not None and 0 < sleep <= 16:
+        f["short_sleep"] = min(max(7 - sleep, 0) / 3, 1.0)
+        f["long_sleep"] = min(max(sleep - 9, 0) / 3, 1.0)
+
+    f["stress"] = _scale(a[Q_STRESS], _FREQUENCY_WORDS)
+    if f["stress"] is None:
+        f["stress"] = _rating(a[Q_STRESS])
+
+    activity = _scale(a[Q_ACTIVITY], _ACTIVITY_WORDS)
+    f["sedentary"] = None if activity is None else 1 - activity
+
+    f["injury"] = 0.0 if _is_negative(a[Q_INJURIES]) else 1.0
+
+    diet = _rating(a[Q_DIET])
+    f["poor_diet"] = None if diet is None else 1 - diet
+
+    substances = a[Q_SUBSTANCES]
+    if _is_negative(substances):
+        f["smoking"] = f["alcohol"] = 0.0
+    else:
+        f["smoking"] = float(bool(re.search(r"\b(smok|cigar|vap|tobacco|beedi|bidi)", substances)))
+        drinks = re.search(r"\b(alcohol|drink|beer|wine|whisk|liquor)", substances)
+        occasional = _scale(substances, _FREQUENCY_WORDS)
+        f["alcohol"] = (occasional if occasional is not None else 0.7) if drinks else 0.0
+
+    missing = sum(1 for v in f.values() if v is None)
+    return [NEUTRAL[name] if f[name] is None else f[name] for name in FEATURES], missing
+
+
+# ---- scoring ----
+
+
+def _score_rows_python(rows: Sequence[Sequence[float]]) -> List[Tuple[float, float]]:
+    out = []
+    for x in rows:
+        z = RISK_BIAS + sum(w * v for w, v in zip(RISK_WEIGHTS, x))
+        r = READINESS_BIAS + sum(w * v for w, v in zip(READINESS_WEIGHTS, x))
+        out.append((round(100 / (1 + math.exp(-z)), 1), round(100 * min(max(r, 0.0), 1.0), 1)))
+    return out
+
+
+def score_matrix(rows: Sequence[Sequence[float]]) -> List[Tuple[float, float]]:
+    """(risk, readiness) per feature row; one matrix product per score with NumPy."""
+    if not rows:
+        return []
+    try:
+        import numpy as np  # optional: vectorized path for large batches
+    except ImportError:
+        return _score_rows_python(rows)
+    x = np.asarray(rows, dtype=np.float64)
+    risk = 100.0 / (1.0 + np.exp(-(RISK_BIAS + x @ np.asarray(RISK_WEIGHTS))))
+    readiness = 100.0 * np.clip(READINESS_BIAS + x @ np.asarray(READINESS_WEIGHTS), 0.0, 1.0)
+    return list(zip(np.round(risk, 1).tolist(), np.round(readiness, 1).tolist()))
+
+
+def risk_factors(features: Sequence[float], top: int = 3) -> List[str]:
+    """Largest contributors to the risk score, for the LLM narrative."""
+    contributions = sorted(
+        ((w * v, name) for w, v, name in zip(RISK_WEIGHTS, features, FEATURES) if v > 0),
+        reverse=True,
+    )
+    return [name for _, name in contributions[:top]]
+
+
+def score_answers(answers: Sequence[str]) -> Dict[str, Any]:
+    features, missing = extract_features(answers)
+    (risk, readiness), = score_matrix([features])
+    return {
+        "risk_score": risk,
+        "readiness_score": readiness,
+        "risk_factors": risk_factors(features),
+        "missing_features": missing,
+        "scoring_version": SCORING_VERSION,
+    }
+
+
+def _answers(responses_json: str) -> List[str]:
+    try:
+        answers = json.loads(responses_json).get("answers") or []
+    except (ValueError, AttributeError):
+        return []
+    return [str(a) for a in answers]
+
+
+def _iter_chunks(db: Session, rescore_all: bool, chunk_size: int) -> Iterator[List[Tuple[int, str]]]:
+    stmt = select(HealthAssessment.id, HealthAssessment.responses_json).order_by(HealthAssessment.id)
+    if not rescore_all:
+        stmt = stmt.where(
+            or_(
+                HealthAssessment.scoring_version.is_(None),
+                HealthAssessment.scoring_version < SCORING_VERSION,
+            )
+        )
+    last_id = 0
+    # Keyset pagination: each chunk is a short read, and the updates committed
+    # in between never shift the next page.
+    while True:
+        chunk = db.execute(stmt.where(HealthAssessment.id > last_id).limit(chunk_size)).all()
+        if not chunk:
+            return
+        yield [(row.id, row.responses_json) for row in chunk]
+        last_id = chunk[-1].id
+
+
+def rescore_assessments(
+    db: Session, *, rescore_all: bool = False, chunk_size: int = RESCORE_CHUNK_SIZE
+) -> int:
+    """Re-score stale (or all) assessments in chunks; returns rows updated."""
+    updated = 0
+    for chunk in _iter_chunks(db, rescore_all, chunk_size):
+        rows = [extract_features(_answers(responses))[0] for _, responses in chunk]
+        scores = score_matrix(rows)
+        db.execute(
+            update(HealthAssessment),
+            [
+                {
+                    "id": assessment_id,
+                    "risk_score": risk,
+                    "readiness_score": readiness,
+                    "scoring_version": SCORING_VERSION,
+                }
+                for (assessment_id, _), (risk, readiness) in zip(chunk, scores)
+            ],
+        )
+        db.commit()
+        updated += len(chunk)
+    return updated
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="re-score rows already at SCORING_VERSION too")
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from backend.database.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = rescore_assessments(db, rescore_all=args.all, chunk_size=args.chunk_size)
+    finally:
+        db.close()
+    print(f"Re-scored {count} assessments (v{SCORING_VERSION}) in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Full-text search over ChatHistory.message and MealLog.description.
+
+SQLite: FTS5 external-content tables kept in sync by triggers, so every
+insert path (ORM, bulk import, compaction deletes) updates the index.
+user_id is indexed as an FTS column so per-user scoping is an index
+lookup, not a post-filter. Postgres: GIN expression indexes on
+to_tsvector, which the database keeps in sync itself.
+"""
+import re
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+SEARCH_CONFIG = "english"
+
+# name -> (content table, text column, timestamp column)
+SEARCH_SOURCES: Dict[str, tuple] = {
+    "chat": ("chat_history", "message", "created_at"),
+    "meal": ("meal_logs", "description", "logged_at"),
+}
+
+_STOPWORDS = frozenset(
+    "a an and are at did do does for from how i in is it last me my of on or "
+    "the to was what when where which who why with you about tell told".split()
+)
+
+
+def _sqlite_ddl(table: str, column: str) -> List[str]:
+    fts = f"{table}_fts"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, user_id, content='{table}', content_rowid='id', "
+        f"tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}, user_id) VALUES (new.id, new.{column}, new.user_id); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}, user_id) "
+        f"VALUES ('delete', old.id, old.{column}, old.user_id); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}, user_id) "
+        f"VALUES ('delete', old.id, old.{column}, old.user_id); "
+        f"INSERT INTO {fts}(rowid, {column}, user_id) VALUES (new.id, new.{column}, new.user_id); END",
+    ]
+
+
+def ensure_search_indexes(engine: Engine) -> None:
+    """Create search indexes (idempotent) and backfill any that are new."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            for table, column, _ in SEARCH_SOURCES.values():
+                fts = f"{table}_fts"
+                existed = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": fts},
+                ).first()
+                for stmt in _sqlite_ddl(table, column):
+                    conn.execute(text(stmt))
+                if not existed:
+                    conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        elif engine.dialect.name == "postgresql":
+            for table, column, _ in SEARCH_SOURCES.values():
+                conn.execute(
+                    text(
+                        f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_tsv ON {table} "
+                        f"USING GIN (to_tsvector('{SEARCH_CONFIG}', {column}))"
+                    )
+                )
+
+
+def _terms(query: str) -> List[str]:
+    words = [w for w in re.findall(r"\w+", query.lower()) if w not in _STOPWORDS]
+    return words or re.findall(r"\w+", query.lower())
+
+
+def _search_sqlite(
+    db: Session, kind: str, user_id: int, terms: List[str], limit: int
+) -> List[Dict[str, Any]]:
+    table, column, ts_column = SEARCH_SOURCES[kind]
+    fts = f"{table}_fts"
+    # Quote every term (no FTS syntax injection), OR them and let bm25 rank;
+    # the user_id column filter keeps the match inside the caller's rows.
+    terms_expr = " OR ".join(f'"{t}"' for t in terms)
+    match = f'user_id : "{int(user_id)}" AND {column} : ({terms_expr})'
+    rows = db.execute(
+        text(
+            f"SELECT t.id, t.{column} AS body, t.{ts_column} AS ts, "
+            f"snippet({fts}, 0, '[', ']', '…', 12) AS snippet, "
+            f"bm25({fts}, 1.0, 0.0) AS rank "
+            f"FROM {fts} JOIN {table} t ON t.id = {fts}.rowid "
+            f"WHERE {fts} MATCH :match ORDER BY rank LIMIT :limit"
+        ),
+        {"match": match, "limit": limit},
+    ).mappings()
+    # bm25 is "lower is better"; flip so callers can sort descending everywhere.
+    return [{**row, "kind": kind, "rank": -row["rank"]} for row in rows]
+
+
+def _search_postgres(
+    db: Session, kind: str, user_id: int, terms: List[str], limit: int
+) -> List[Dict[str, Any]]:
+    table, column, ts_column = SEARCH_SOURCES[kind]
+    vector = f"to_tsvector('{SEARCH_CONFIG}', t.{column})"
+    rows = db.execute(
+        text(
+            f"SELECT t.id, t.{column} AS body, t.{ts_column} AS ts, "
+            f"ts_headline('{SEARCH_CONFIG}', t.{column}, q, 'StartSel=[, StopSel=]') AS snippet, "
+            f"ts_rank({vector}, q) AS rank "
+            f"FROM {table} t, to_tsquery('{SEARCH_CONFIG}', :q) q "
+            f"WHERE t.user_id = :user_id AND {vector} @@ q ORDER BY rank DESC LIMIT :limit"
+        ),
+        {"q": " | ".join(terms), "user_id": user_id, "limit": limit},
+    ).mappings()
+    return [{**row, "kind": kind} for row in rows]
+
+
+def _search_like(
+    db: Session, kind: str, user_id: int, terms: List[str], limit: int
+) -> List[Dict[str, Any]]:
+    table, column, ts_column = SEARCH_SOURCES[kind]
+    clauses = " OR ".join(f"lower(t.{column}) LIKE :t{i}" for i in range(len(terms)))
+    params: Dict[str, Any] = {f"t{i}": f"%{term}%" for i, term in enumerate(terms)}
+    params.update(user_id=user_id, limit=limit)
+    rows = db.execute(
+        text(
+            f"SELECT t.id, t.{column} AS body, t.{ts_column} AS ts FROM {table} t "
+            f"WHERE t.user_id = :user_id AND ({clauses}) ORDER BY t.id DESC LIMIT :limit"
+        ),
+        params,
+    ).mappings()
+    return [{**row, "kind": kind, "snippet": row["body"], "rank": 0.0} for row in rows]
+
+
+def search_user_content(
+    db: Session,
+    user_id: int,
+    query: str,
+    *,
+    kinds: List[str],
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """Ranked hits across the requested sources, newest first on ties."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    dialect = db.get_bind().dialect.name
+    search = {"sqlite": _search_sqlite, "postgresql": _search_postgres}.get(dialect, _search_like)
+    hits: List[Dict[str, Any]] = []
+    for kind in kinds:
+        # Each source needs offset+limit candidates for the merged page to be exact.
+        hits.extend(search(db, kind, user_id, terms, offset + limit))
+    hits.sort(key=lambda h: (h["rank"], h["id"]), reverse=True)
+    return hits[offset : offset + limit]
@@ -0,0 +1,201 @@
+"""
+Record/replay httpx transport for the Groq and CalorieNinjas clients.
+
+UPSTREAM_TRANSPORT_MODE picks what GroqClient and the nutrition service
+talk to:
+
+    live     the real APIs (default)
+    record   the real APIs, appending every exchange to UPSTREAM_CASSETTE
+    replay   UPSTREAM_CASSETTE only; no network
+
+Cassettes are JSON lines, one exchange per line: method, URL, request
+body, response status/headers/body and the measured latency. API keys are
+never written (request headers aren't stored). On replay, a request is
+matched on method + URL + canonical JSON body. Repeats of the same request
+are served in recorded order. Each response is delayed by its recorded
+latency times UPSTREAM_REPLAY_LATENCY_SCALE: 1 keeps the original latency
+distribution, 0 replays instantly. A request with no recording raises
+CassetteMiss.
+
+Benchmarks on replay still go through the upstream rate limiter, so raise
+GROQ_RPS / CALORIE_NINJAS_RPS when measuring agent overhead alone.
+
+    python -m backend.services.upstream_transport cassette.jsonl   # summary
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from backend.utils.config import (
+    UPSTREAM_CASSETTE,
+    UPSTREAM_REPLAY_LATENCY_SCALE,
+    UPSTREAM_TRANSPORT_MODE,
+)
+
+# Describe the stored (already decoded) body, not the original wire format.
+_DROPPED_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class CassetteMiss(RuntimeError):
+    """Replay found no recorded response for a request."""
+
+
+def _body_text(content: bytes) -> Dict[str, str]:
+    try:
+        return {"body": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(content).decode("ascii")}
+
+
+def _body_bytes(entry: Dict[str, Any], prefix: str) -> bytes:
+    if f"{prefix}body_b64" in entry:
+        return base64.b64decode(entry[f"{prefix}body_b64"])
+    return entry.get(f"{prefix}body", "").encode("utf-8")
+
+
+def match_key(method: str, url: str, body: bytes) -> str:
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256(f"{method.upper()} {url}\0".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, path: str, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.path = path
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        content = await response.aread()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        await response.aclose()
+
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _DROPPED_RESPONSE_HEADERS]
+        entry = {
+            "key": match_key(request.method, str(request.url), body),
+            "method": request.method,
+            "url": str(request.url),
+            **{f"request_{k}": v for k, v in _body_text(body).items()},
+            "status": response.status_code,
+            "headers": headers,
+            **_body_text(content),
+            "elapsed_ms": round(elapsed_ms, 2),
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+        }
+        _append(self.path, entry)
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+_append_lock = threading.Lock()
+
+
+def _append(path: str, entry: Dict[str, Any]) -> None:
+    line = json.dumps(entry) + "\n"
+    with _append_lock:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(line)
+
+
+def load_cassette(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, entries: List[Dict[str, Any]], latency_scale: float = 1.0):
+        self.latency_scale = latency_scale
+        self._recorded: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for entry in entries:
+            self._recorded[entry["key"]].append(entry)
+        self._pending: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def rewind(self) -> None:
+        """Serve every recording from the start again (one benchmark iteration)."""
+        with self._lock:
+            self._pending.clear()
+
+    def _next(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            recorded = self._recorded.get(key)
+            if not recorded:
+                return None
+            pending = self._pending.get(key)
+            if not pending:
+                # Exhausted repeats cycle from the first recording again.
+                pending = self._pending[key] = deque(recorded)
+            return pending.popleft()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        entry = self._next(match_key(request.method, str(request.url), body))
+        if entry is None:
+            raise CassetteMiss(f"No recorded response for {request.method} {request.url}")
+        delay = entry.get("elapsed_ms", 0.0) / 1000 * self.latency_scale
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return httpx.Response(
+            entry["status"], headers=entry["headers"], content=_body_bytes(entry, ""), request=request
+        )
+
+    async def aclose(self) -> None:
+        pass  # shared by every client; nothing to release
+
+
+_replay: Optional[ReplayTransport] = None
+
+
+def get_transport() -> Optional[httpx.AsyncBaseTransport]:
+    """Transport for upstream clients; None means httpx's default (live)."""
+    global _replay
+    if UPSTREAM_TRANSPORT_MODE == "record":
+        return RecordingTransport(UPSTREAM_CASSETTE)
+    if UPSTREAM_TRANSPORT_MODE == "replay":
+        if _replay is None:
+            _replay = ReplayTransport(load_cassette(UPSTREAM_CASSETTE), UPSTREAM_REPLAY_LATENCY_SCALE)
+        return _replay
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python -m backend.services.upstream_transport CASSETTE", file=sys.stderr)
+        return 2
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    for entry in load_cassette(argv[0]):
+        latencies[urlsplit(entry["url"]).netloc].append(entry.get("elapsed_ms", 0.0))
+    for host, values in sorted(latencies.items()):
+        values.sort()
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(
+            f"{host}: {len(values)} calls, p50 {statistics.median(values):.0f} ms, "
+            f"p95 {p95:.0f} ms, total {sum(values) / 1000:.1f} s"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
-from jose import JWTError, jwt
 from backend.utils.config import (
     ACCESS_TOKEN_EXPIRE_HOURS,
     JWT_ALGORITHM,
@@ -17,6 +16,8 @@ def verify_password(plain: str, hashed: str) -> bool:
     return plain == hashed  # simple check
 
 def create_access_token(subject: str | int, extra: Optional[dict[str, Any]] = None) -> str:
+    from jose import jwt  # deferred: jose pulls in cryptography at import
+
     expire = datetime.now(timezone.utc) + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
     to_encode = {"sub": str(subject), "exp": expire}
     if extra:
@@ -24,6 +25,8 @@ def create_access_token(subject: str | int, extra: Optional[dict[str, Any]] = No
     return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 def decode_access_token(token: str) -> Optional[dict[str, Any]]:
+    from jose import JWTError, jwt
+
     try:
         return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except JWTError:
@@ -1,3 +1,4 @@
+import json
 import os
 
 from dotenv import load_dotenv
@@ -10,6 +11,160 @@ CALORIE_NINJAS_API_KEY: str = os.getenv("CALORIE_NINJAS_API_KEY", "")
 DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./arogyamitra.db")
 GROQ_MODEL: str = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 
+# Read-only endpoints use a separate engine: a replica URL, or for SQLite a
+# read-only connection to the primary file when left empty.
+DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL", "")
+DATABASE_READ_POOL_SIZE: int = int(os.getenv("DATABASE_READ_POOL_SIZE", "10"))
+# After a user writes, their reads stay on the primary this long (replica lag).
+READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Schema creation is a deploy step (python -m backend.database.init_db);
+# set to 1 to also run it on every worker startup, e.g. for local dev.
+AUTO_CREATE_TABLES: bool = os.getenv("AUTO_CREATE_TABLES", "0") == "1"
+
+# Upstream rate governance (per worker process)
+GROQ_RPS: float = float(os.getenv("GROQ_RPS", "0.5"))
+GROQ_BURST: float = float(os.getenv("GROQ_BURST", "5"))
+GROQ_MAX_CONCURRENCY: int = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+CALORIE_NINJAS_RPS: float = float(os.getenv("CALORIE_NINJAS_RPS", "2"))
+CALORIE_NINJAS_BURST: float = float(os.getenv("CALORIE_NINJAS_BURST", "5"))
+CALORIE_NINJAS_MAX_CONCURRENCY: int = int(os.getenv("CALORIE_NINJAS_MAX_CONCURRENCY", "4"))
+UPSTREAM_PER_USER_CONCURRENCY: int = int(os.getenv("UPSTREAM_PER_USER_CONCURRENCY", "2"))
+UPSTREAM_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT_SECONDS", "20"))
+UPSTREAM_MAX_RETRIES: int = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE_SECONDS: float = float(os.getenv("UPSTREAM_BACKOFF_BASE_SECONDS", "0.5"))
+UPSTREAM_BACKOFF_MAX_SECONDS: float = float(os.getenv("UPSTREAM_BACKOFF_MAX_SECONDS", "8"))
+
+# Upstream record/replay for deterministic benchmarks: "live" | "record" | "replay"
+UPSTREAM_TRANSPORT_MODE: str = os.getenv("UPSTREAM_TRANSPORT_MODE", "live").lower()
+UPSTREAM_CASSETTE: str = os.getenv("UPSTREAM_CASSETTE", "./cassettes/upstream.jsonl")
+# Replayed latency = recorded latency x scale (0 = instant).
+UPSTREAM_REPLAY_LATENCY_SCALE: float = float(os.getenv("UPSTREAM_REPLAY_LATENCY_SCALE", "1"))
+
+# Circuit breakers around upstream providers
+CIRCUIT_ERROR_RATE_THRESHOLD: float = float(os.getenv("CIRCUIT_ERROR_RATE_THRESHOLD", "0.5"))
+CIRCUIT_SLOW_CALL_RATE_THRESHOLD: float = float(os.getenv("CIRCUIT_SLOW_CALL_RATE_THRESHOLD", "0.5"))
+CIRCUIT_MIN_CALLS: int = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_WINDOW_SECONDS: float = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "60"))
+CIRCUIT_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_PROBES: int = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+GROQ_SLOW_CALL_SECONDS: float = float(os.getenv("GROQ_SLOW_CALL_SECONDS", "10"))
+CALORIE_NINJAS_SLOW_CALL_SECONDS: float = float(os.getenv("CALORIE_NINJAS_SLOW_CALL_SECONDS", "5"))
+
+# Groq model tiers per task ("chat", "assessment"): ordered by
+# preference; later entries should be faster. Defaults keep every task on GROQ_MODEL
+# with llama-3.1-8b-instant as the fast fallback.
+_FAST_GROQ_MODEL = "llama-3.1-8b-instant"
+_default_tier = list(dict.fromkeys([GROQ_MODEL, _FAST_GROQ_MODEL]))
+GROQ_MODEL_TIERS: dict[str, list[str]] = json.loads(
+    os.getenv(
+        "GROQ_MODEL_TIERS",
+        json.dumps({"chat": _default_tier, "assessment": _default_tier}),
+    )
+)
+# A model whose p95 latency (ms) over the window exceeds its task's budget is
+# skipped in favour of the next tier until its slow samples age out.
+GROQ_TASK_P95_BUDGET_MS: dict[str, float] = json.loads(
+    os.getenv("GROQ_TASK_P95_BUDGET_MS", '{"chat": 4000, "assessment": 8000}')
+)
+GROQ_MODEL_MAX_ERROR_RATE: float = float(os.getenv("GROQ_MODEL_MAX_ERROR_RATE", "0.25"))
+GROQ_MODEL_STATS_WINDOW_SECONDS: float = float(os.getenv("GROQ_MODEL_STATS_WINDOW_SECONDS", "300"))
+GROQ_MODEL_MIN_SAMPLES: int = int(os.getenv("GROQ_MODEL_MIN_SAMPLES", "10"))
+
+# Per-user daily Groq token budgets (prompt + completion, UTC day). 0 disables.
+LLM_DAILY_TOKEN_BUDGET: int = int(os.getenv("LLM_DAILY_TOKEN_BUDGET", "200000"))
+# Past this share of the budget, calls are shortened (LLM_REDUCED_MAX_TOKENS, no history).
+LLM_BUDGET_SOFT_RATIO: float = float(os.getenv("LLM_BUDGET_SOFT_RATIO", "0.8"))
+LLM_REDUCED_MAX_TOKENS: int = int(os.getenv("LLM_REDUCED_MAX_TOKENS", "200"))
+LLM_USAGE_FLUSH_SECONDS: float = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "10"))
+
+# Chat history retention / cold archiving
+CHAT_RETENTION_DAYS: int = int(os.getenv("CHAT_RETENTION_DAYS", "90"))
+CHAT_MAX_HOT_MESSAGES: int = int(os.getenv("CHAT_MAX_HOT_MESSAGES", "2000"))
+CHAT_ARCHIVE_DIR: str = os.getenv("CHAT_ARCHIVE_DIR", "./chat_archive")
+CHAT_COMPACTION_INTERVAL_SECONDS: int = int(os.getenv("CHAT_COMPACTION_INTERVAL_SECONDS", "0"))
+
+# Idempotency-Key support on expensive POST endpoints
+IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# How long a duplicate waits for the in-flight original before getting 409.
+IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+# An in-progress claim older than this is treated as abandoned (crashed worker).
+IDEMPOTENCY_LOCK_SECONDS: int = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "120"))
+
+# After-response work (outbox_tasks)
+OUTBOX_POLL_SECONDS: float = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_LEASE_SECONDS: int = int(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+# On shutdown, keep running due tasks for up to this long.
+OUTBOX_DRAIN_SECONDS: float = float(os.getenv("OUTBOX_DRAIN_SECONDS", "10"))
+OUTBOX_RETENTION_SECONDS: int = int(os.getenv("OUTBOX_RETENTION_SECONDS", str(24 * 3600)))
+
+# /chat/ws connection limits
+WS_AUTH_TIMEOUT_SECONDS: float = float(os.getenv("WS_AUTH_TIMEOUT_SECONDS", "10"))
+WS_IDLE_TIMEOUT_SECONDS: float = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "300"))
+WS_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+# Messages queued behind the one being answered; beyond this the client is told to slow down.
+WS_MAX_PENDING_MESSAGES: int = int(os.getenv("WS_MAX_PENDING_MESSAGES", "4"))
+WS_MAX_MESSAGES_PER_MINUTE: int = int(os.getenv("WS_MAX_MESSAGES_PER_MINUTE", "20"))
+WS_MAX_MESSAGES_PER_CONNECTION: int = int(os.getenv("WS_MAX_MESSAGES_PER_CONNECTION", "500"))
+WS_MAX_MESSAGE_CHARS: int = int(os.getenv("WS_MAX_MESSAGE_CHARS", "4000"))
+# After the client leaves (or is cut off), accepted messages still get answered
+# and persisted for up to this long before the connection's work is cancelled.
+WS_DRAIN_SECONDS: float = float(os.getenv("WS_DRAIN_SECONDS", "60"))
+
+# Cohort benchmarks on the dashboard
+COHORT_STATS_REFRESH_SECONDS: int = int(os.getenv("COHORT_STATS_REFRESH_SECONDS", "3600"))
+# Benchmarks older than this are flagged "stale" in dashboard responses.
+COHORT_STATS_MAX_AGE_SECONDS: int = int(os.getenv("COHORT_STATS_MAX_AGE_SECONDS", "7200"))
+COHORT_WINDOW_DAYS: int = int(os.getenv("COHORT_WINDOW_DAYS", "30"))
+# Cohorts smaller than this fall back to a coarser grouping.
+COHORT_MIN_SIZE: int = int(os.getenv("COHORT_MIN_SIZE", "20"))
+
+# Per-(user, session) cache of recent chat messages (per worker)
+CHAT_WINDOW_CACHE_MAX_BYTES: int = int(os.getenv("CHAT_WINDOW_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CHAT_WINDOW_CACHE_MAX_SESSIONS: int = int(os.getenv("CHAT_WINDOW_CACHE_MAX_SESSIONS", "10000"))
+CHAT_WINDOW_CACHE_TTL_SECONDS: float = float(os.getenv("CHAT_WINDOW_CACHE_TTL_SECONDS", "300"))
+
+# Local intent router (skips the LLM for obvious tool calls)
+INTENT_ROUTER_ENABLED: bool = os.getenv("INTENT_ROUTER_ENABLED", "1") == "1"
+INTENT_MODEL_PATH: str = os.getenv("INTENT_MODEL_PATH", "./intent_model.json")
+# Only intents listed here are dispatched without the LLM, at >= this confidence.
+INTENT_ROUTER_THRESHOLDS: dict[str, float] = json.loads(
+    os.getenv(
+        "INTENT_ROUTER_THRESHOLDS",
+        '{"fetch_nutrition_data": 0.85, "adjust_plan_based_on_feedback": 0.9}',
+    )
+)
+
+# Request profiling. Requests are profiled when sent with "X-Profile: <ADMIN_TOKEN>"
+# or at random with probability PROFILING_SAMPLE_RATE (0 = off).
+PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_DIR: str = os.getenv("PROFILING_DIR", "./profiles")
+PROFILING_MAX_PROFILES: int = int(os.getenv("PROFILING_MAX_PROFILES", "200"))
+PROFILING_MAX_CONCURRENT: int = int(os.getenv("PROFILING_MAX_CONCURRENT", "4"))
+
+# Shared secret for /admin endpoints (X-Admin-Token). Empty disables them.
+ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+# Admission control per route class (see backend/services/admission.py): at most
+# "concurrency" requests run, up to "queue" more wait at most "queue_timeout_ms",
+# and the rest get an immediate 503 + Retry-After.
+ADMISSION_CONTROL_ENABLED: bool = os.getenv("ADMISSION_CONTROL_ENABLED", "1") == "1"
+ADMISSION_LIMITS: dict[str, dict[str, float]] = json.loads(
+    os.getenv(
+        "ADMISSION_LIMITS",
+        json.dumps(
+            {
+                "llm": {"concurrency": 24, "queue": 24, "queue_timeout_ms": 1000},
+                "upstream": {"concurrency": 16, "queue": 32, "queue_timeout_ms": 2000},
+                "default": {"concurrency": 128, "queue": 256, "queue_timeout_ms": 5000},
+            }
+        ),
+    )
+)
+
 # JWT auth
 JWT_SECRET: str = os.getenv("JWT_SECRET", "arogyamitra-secret-change-in-production")
 JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
@@ -0,0 +1,243 @@
+"""
+Idempotency-Key support for POST endpoints that call paid upstream APIs.
+
+A client that retries a timed-out POST with the same Idempotency-Key gets
+the first attempt's response back instead of a second meal log, plan or
+Groq call. Keys are scoped per user and kept for IDEMPOTENCY_TTL_SECONDS.
+
+    @router.post("", status_code=201)
+    async def create(..., idempotency: IdempotentRequest = Depends(get_idempotency)):
+        if (replay := await idempotency.replay()) is not None:
+            return replay
+        result = ...
+        return idempotency.save(result, status_code=201)
+
+- completed key, same request:   stored response, "Idempotent-Replayed: true"
+- key reused for another request: 422
+- original still running:         wait up to IDEMPOTENCY_WAIT_SECONDS, then 409
+- original failed (exception):    claim released, so the retry runs again
+"""
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.auth.dependencies import get_current_user
+from backend.database.session import get_db
+from backend.models import IdempotencyKey, User
+from backend.utils.config import (
+    IDEMPOTENCY_LOCK_SECONDS,
+    IDEMPOTENCY_TTL_SECONDS,
+    IDEMPOTENCY_WAIT_SECONDS,
+)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_COMPLETED = "completed"
+
+# Expired keys are deleted at most this often per worker.
+PURGE_INTERVAL_SECONDS = 600
+# Poll interval while waiting on an original running in another worker.
+POLL_SECONDS = 0.25
+
+# Originals running in this worker; duplicates wait on the event instead of polling.
+_inflight: Dict[Tuple[int, str], asyncio.Event] = {}
+_last_purge = 0.0
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes; everything here is stored in UTC.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    """sha256 over method, path and the body (JSON canonicalized when possible)."""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256()
+    for part in (method.upper().encode(), path.encode(), body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def purge_expired(db: Session) -> int:
+    result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < _now()))
+    db.commit()
+    return result.rowcount or 0
+
+
+class IdempotentRequest:
+    def __init__(self, db: Session, user_id: int, key: Optional[str], request_hash: str):
+        self.db = db
+        self.user_id = user_id
+        self.key = key
+        self.request_hash = request_hash
+        self.claimed = False
+
+    async def replay(self) -> Optional[JSONResponse]:
+        """Claim the key, or return the response to send instead of running the endpoint."""
+        if self.key is None:
+            return None
+        self._maybe_purge()
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record = self._claim()
+            if record is None:
+                self.claimed = True
+                _inflight[(self.user_id, self.key)] = asyncio.Event()
+                return None
+            if record.request_hash != self.request_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"{IDEMPOTENCY_HEADER} was already used for a different request",
+                )
+            if record.status == STATUS_COMPLETED:
+                return JSONResponse(
+                    content=json.loads(record.response_body) if record.response_body else None,
+                    status_code=record.response_status,
+                    headers={REPLAYED_HEADER: "true"},
+                )
+            if (_now() - _as_utc(record.created_at)).total_seconds() > IDEMPOTENCY_LOCK_SECONDS:
+                # The worker that claimed it died mid-request; take over.
+                self._delete()
+                continue
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"A request with this {IDEMPOTENCY_HEADER} is still in progress",
+                    headers={"Retry-After": "1"},
+                )
+            await self._wait(deadline)
+
+    def save(self, result: Any, status_code: int = status.HTTP_200_OK) -> Any:
+        """Store the response for replays and hand ``result`` back to the endpoint."""
+        if not self.claimed:
+            return result
+        record = self._get()
+        if record is not None:
+            record.status = STATUS_COMPLETED
+            record.response_status = status_code
+            record.response_body = json.dumps(jsonable_encoder(result))
+            record.expires_at = _now() + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            self.db.commit()
+        self._finish()
+        return result
+
+    def release(self) -> None:
+        """Drop an unfinished claim so a retry runs the request again."""
+        if not self.claimed:
+            return
+        self.db.rollback()
+        self._delete()
+        self._finish()
+
+    # ---- internals ----
+
+    def _get(self) -> Optional[IdempotencyKey]:
+        return (
+            self.db.query(IdempotencyKey)
+            .filter(IdempotencyKey.user_id == self.user_id, IdempotencyKey.key == self.key)
+            .populate_existing()
+            .first()
+        )
+
+    def _claim(self) -> Optional[IdempotencyKey]:
+        """Insert an in-progress row; returns the existing row if someone holds the key."""
+        existing = self._get()
+        if existing is not None and _as_utc(existing.expires_at) < _now():
+            self._delete()
+            existing = None
+        if existing is not None:
+            return existing
+        now = _now()
+        self.db.add(
+            IdempotencyKey(
+                user_id=self.user_id,
+                key=self.key,
+                request_hash=self.request_hash,
+                status=STATUS_IN_PROGRESS,
+                created_at=now,
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+            )
+        )
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            existing = self._get()
+            # Lost the race to a request that has already released the key: try again.
+            return existing if existing is not None else self._claim()
+        return None
+
+    def _delete(self) -> None:
+        self.db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == self.user_id, IdempotencyKey.key == self.key
+            )
+        )
+        self.db.commit()
+
+    async def _wait(self, deadline: float) -> None:
+        timeout = max(0.0, deadline - time.monotonic())
+        event = _inflight.get((self.user_id, self.key))
+        if event is None:
+            await asyncio.sleep(min(POLL_SECONDS, timeout))
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        # The row was written by another session's transaction.
+        self.db.expire_all()
+
+    def _finish(self) -> None:
+        self.claimed = False
+        event = _inflight.pop((self.user_id, self.key), None)
+        if event is not None:
+            event.set()
+
+    def _maybe_purge(self) -> None:
+        global _last_purge
+        if time.monotonic() - _last_purge >= PURGE_INTERVAL_SECONDS:
+            _last_purge = time.monotonic()
+            purge_expired(self.db)
+
+
+async def get_idempotency(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+) -> AsyncIterator[IdempotentRequest]:
+    key = idempotency_key.strip() if idempotency_key else None
+    if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters",
+        )
+    fingerprint = request_fingerprint(request.method, request.url.path, await request.body())
+    idempotency = IdempotentRequest(db, current_user.id, key, fingerprint)
+    try:
+        yield idempotency
+    finally:
+        # The endpoint raised (or never saved): let the next retry run for real.
+        idempotency.release()
@@ -0,0 +1,157 @@
+"""
+Query-plan regression check for per-user service queries.
+
+    python -m backend.utils.query_plan_check [--verbose]
+
+Builds a scratch in-memory SQLite database from the models plus
+migrations, runs the real service functions against it while capturing
+the SQL they issue, and EXPLAIN QUERY PLANs every SELECT. Exits 1 when a
+plan scans a whole table ("SCAN meal_logs", with or without an index)
+instead of searching it, so a dropped index or a rewritten query that
+stops using one fails CI.
+"""
+import argparse
+import sys
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Tables every user-facing request reads by user; a scan here is a regression.
+USER_SCOPED_TABLES = (
+    "meal_logs",
+    "workout_plans",
+    "health_assessments",
+    "chat_history",
+    "plan_feedback",
+    "plan_revisions",
+    "chat_summaries",
+    "idempotency_keys",
+    "llm_usage",
+    # Read by the chat window for turns not yet written (ordering_key "chat:<id>").
+    "outbox_tasks",
+)
+
+
+def _checks() -> List[Tuple[str, Callable[[Session], object]]]:
+    """(name, fn(db)) pairs; each fn runs real service code for user 1."""
+    from backend.agents.aromi_agent import AromiAgent, _chat_window_marker
+    from backend.models import IdempotencyKey, LlmUsage
+    from backend.routers.dashboard import _dashboard_version
+    from backend.services.chat_compaction import compact_user_history
+    from backend.services.cohort_stats import user_metrics
+    from backend.services.export_service import iter_user_records
+    from backend.services.health_assessment_service import get_latest_assessment
+    from backend.services.plan_service import get_latest_plan, get_plan_version, _patches_between
+
+    # _load_chat_window only needs the session; skip building a Groq client.
+    agent = AromiAgent.__new__(AromiAgent)
+    return [
+        ("dashboard version", lambda db: _dashboard_version(db, 1)),
+        ("latest assessment", lambda db: get_latest_assessment(db, 1)),
+        ("latest plan", lambda db: get_latest_plan(db, 1)),
+        ("plan version", lambda db: get_plan_version(db, 1)),
+        ("plan patches", lambda db: _patches_between(db, 1, 0, None)),
+        ("chat window", lambda db: agent._load_chat_window(db, 1, None)),
+        ("chat window (session)", lambda db: agent._load_chat_window(db, 1, "s1")),
+        ("chat window marker", lambda db: _chat_window_marker(db, 1)),
+        ("chat compaction", lambda db: compact_user_history(db, 1)),
+        ("cohort user metrics", lambda db: user_metrics(db, 1)),
+        ("user export", lambda db: list(iter_user_records(db, 1))),
+        (
+            "idempotency key lookup",
+            lambda db: db.query(IdempotencyKey)
+            .filter(IdempotencyKey.user_id == 1, IdempotencyKey.key == "k")
+            .first(),
+        ),
+        (
+            "llm usage today",
+            lambda db: db.execute(
+                select(LlmUsage.prompt_tokens).where(LlmUsage.user_id == 1, LlmUsage.day == date.today())
+            ).all(),
+        ),
+    ]
+
+
+def _scratch_engine() -> Engine:
+    from backend.database.migrations import run_migrations
+    from backend.database.session import Base
+    import backend.models  # noqa: F401 (register every table)
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    return engine
+
+
+def _full_scans(plan: List[str]) -> List[str]:
+    scans = []
+    for detail in plan:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in USER_SCOPED_TABLES:
+            scans.append(detail)
+    return scans
+
+
+def check(verbose: bool = False) -> Dict[str, List[str]]:
+    """{check name: offending plan lines}; empty when every plan searches."""
+    engine = _scratch_engine()
+    captured: List[Tuple[str, object]] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    db = sessionmaker(bind=engine)()
+    failures: Dict[str, List[str]] = {}
+    try:
+        for name, run in _checks():
+            captured.clear()
+            event.listen(engine, "before_cursor_execute", _capture)
+            try:
+                run(db)
+            finally:
+                event.remove(engine, "before_cursor_execute", _capture)
+                db.rollback()
+            statements = list(captured)
+            with engine.connect() as conn:
+                for statement, parameters in statements:
+                    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                    plan = [row[-1] for row in rows]
+                    scans = _full_scans(plan)
+                    if scans:
+                        failures.setdefault(name, []).extend(scans)
+                    if verbose:
+                        print(f"-- {name}\n{' '.join(statement.split())}")
+                        for detail in plan:
+                            print(f"   {detail}")
+            if not statements:
+                failures.setdefault(name, []).append("issued no SELECT (check is stale)")
+    finally:
+        db.close()
+        engine.dispose()
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="print every statement and its plan")
+    args = parser.parse_args(argv)
+
+    failures = check(verbose=args.verbose)
+    if failures:
+        for name, details in failures.items():
+            for detail in details:
+                print(f"FAIL {name}: {detail}")
+        return 1
+    print("OK: no full table scans in per-user queries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
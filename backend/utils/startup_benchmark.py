@@ -0,0 +1,87 @@
+"""
+Import-time / cold-start budget check.
+
+    python -m backend.utils.startup_benchmark --budget-ms 1500 --runs 5
+
+Imports ``main`` in fresh interpreters under ``-X importtime`` and fails
+(exit code 1) when the median cumulative import time exceeds the budget or
+when a module that should load lazily shows up during startup.
+
+Only upstream/token libraries and optional extras are deferred. Routers
+and the services they use load with ``main``. Deferring those would
+save little: a cold import measures about 1.2-1.3 s against the 1.5 s
+budget, and nearly all of it is fastapi and sqlalchemy.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Only needed once a request actually talks to an upstream or handles a
+# token, or optional (numpy: cohort_stats' vectorized path).
+LAZY_MODULES = ("httpx", "jose", "numpy")
+
+
+def _import_profile() -> Dict[str, Tuple[int, int]]:
+    """Return {module: (self_us, cumulative_us)} for one cold ``import main``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import main failed:\n{proc.stderr}")
+    profile: Dict[str, Tuple[int, int]] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    totals: List[float] = []
+    profile: Dict[str, Tuple[int, int]] = {}
+    for _ in range(args.runs):
+        profile = _import_profile()
+        totals.append(profile["main"][1] / 1000)
+
+    median = statistics.median(totals)
+    print(f"import main: median {median:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    own = sorted(
+        ((name, cum) for name, (_, cum) in profile.items() if name.startswith("backend")),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    print("slowest backend modules (cumulative, last run):")
+    for name, cum in own[: args.top]:
+        print(f"  {cum / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in profile]
+    if eager:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if median > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,51 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from backend.auth import router as auth_router
 from backend.database.init_db import create_tables
-from backend.utils.config import FRONTEND_ORIGINS
+from backend.database.session import SessionLocal
+from backend.services.admission import AdmissionMiddleware, admission_stats
+from backend.services.chat_compaction import compaction_loop
+from backend.services.chat_window_cache import window_cache
+from backend.services.circuit_breaker import breaker_states
+from backend.services.cohort_stats import cohort_refresh_loop
+from backend.services.llm_json import parse_stats
+from backend.services.llm_usage import LlmBudgetExceeded, usage_flush_loop
+from backend.services.model_router import routing_snapshot
+from backend.services.outbox import status_counts, worker as outbox_worker
+from backend.services.profiler import ProfilingMiddleware
+from backend.services.rate_limiter import UpstreamRateLimited
+from backend.utils.config import (
+    AUTO_CREATE_TABLES,
+    CHAT_COMPACTION_INTERVAL_SECONDS,
+    COHORT_STATS_REFRESH_SECONDS,
+    LLM_USAGE_FLUSH_SECONDS,
+    OUTBOX_DRAIN_SECONDS,
+    FRONTEND_ORIGINS,
+)
 from backend.routers import (
+    admin,
+    bootstrap,
     health_assessment,
     chat,
     dashboard,
+    data_export,
     meal_analysis,
     plans,
+    search,
 )
 
 
 def create_app() -> FastAPI:
     app = FastAPI(title="ArogyaMitra API", version="0.1.0")
 
+    # Added first, so it sits inside CORS and profiles only the request itself.
+    app.add_middleware(ProfilingMiddleware)
+    # Inside CORS too, so browsers can read a 503 shed response.
+    app.add_middleware(AdmissionMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=FRONTEND_ORIGINS,
@@ -29,17 +59,87 @@ def create_app() -> FastAPI:
     app.include_router(health_assessment.router)
     app.include_router(chat.router)
     app.include_router(dashboard.router)
+    app.include_router(bootstrap.router)
     app.include_router(meal_analysis.router)
     app.include_router(plans.router)
+    app.include_router(data_export.router)
+    app.include_router(search.router)
+    app.include_router(admin.router)
+
+    @app.exception_handler(UpstreamRateLimited)
+    async def _upstream_rate_limited(request: Request, exc: UpstreamRateLimited) -> JSONResponse:
+        retry_after = max(int(exc.retry_after or 1), 1)
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"{exc.provider} is busy, please retry shortly"},
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    @app.exception_handler(LlmBudgetExceeded)
+    async def _llm_budget_exceeded(request: Request, exc: LlmBudgetExceeded) -> JSONResponse:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Daily AI usage limit reached; it resets at midnight UTC"},
+            headers={"Retry-After": str(max(int(exc.retry_after), 1))},
+        )
+
+    background_tasks: list[asyncio.Task] = []
 
     @app.on_event("startup")
     async def _startup() -> None:
-        create_tables()
+        if AUTO_CREATE_TABLES:
+            create_tables()
+        if CHAT_COMPACTION_INTERVAL_SECONDS > 0:
+            background_tasks.append(
+                asyncio.create_task(compaction_loop(CHAT_COMPACTION_INTERVAL_SECONDS))
+            )
+        if COHORT_STATS_REFRESH_SECONDS > 0:
+            background_tasks.append(
+                asyncio.create_task(cohort_refresh_loop(COHORT_STATS_REFRESH_SECONDS))
+            )
+        background_tasks.append(asyncio.create_task(usage_flush_loop(LLM_USAGE_FLUSH_SECONDS)))
+        outbox_worker.start()
+
+    @app.on_event("shutdown")
+    async def _shutdown() -> None:
+        # Drain first, so turns answered just before shutdown get written.
+        await outbox_worker.stop(OUTBOX_DRAIN_SECONDS)
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
 
     @app.get("/health")
     async def health_check():
         return {"status": "ok"}
 
+    @app.get("/health/upstreams")
+    async def upstream_health():
+        return breaker_states()
+
+    @app.get("/health/admission")
+    async def admission_health():
+        return admission_stats()
+
+    @app.get("/health/chat-window-cache")
+    async def chat_window_cache_health():
+        return window_cache.stats()
+
+    @app.get("/health/llm-models")
+    async def llm_model_health():
+        return routing_snapshot()
+
+    @app.get("/health/outbox")
+    def outbox_health():
+        db = SessionLocal()
+        try:
+            return status_counts(db)
+        finally:
+            db.close()
+
+    @app.get("/health/llm-parsing")
+    async def llm_parsing_health():
+        return parse_stats()
+
     return app
 
 
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from backend.services.admission import (
+    CLASS_DEFAULT,
+    CLASS_EXEMPT,
+    CLASS_LLM,
+    CLASS_UPSTREAM,
+    MAX_RETRY_AFTER_SECONDS,
+    Gate,
+    route_class,
+)
+
+
+@pytest.mark.parametrize(
+    "method, path, expected",
+    [
+        ("GET", "/health", CLASS_EXEMPT),
+        ("GET", "/health/ready", CLASS_EXEMPT),
+        ("POST", "/health-assessment", CLASS_LLM),
+        ("POST", "/chat", CLASS_LLM),
+        ("GET", "/chat/history", CLASS_DEFAULT),
+        ("POST", "/meal-analysis/batch", CLASS_UPSTREAM),
+        ("POST", "/meal-analysisx", CLASS_DEFAULT),
+        ("GET", "/dashboard-data", CLASS_DEFAULT),
+    ],
+)
+def test_route_class(method, path, expected):
+    assert route_class(method, path) == expected
+
+
+def _gate(concurrency=1, queue=1, queue_timeout_ms=1000) -> Gate:
+    return Gate("test", concurrency, queue, queue_timeout_ms)
+
+
+def test_admits_up_to_concurrency():
+    async def run():
+        gate = _gate(concurrency=2, queue=0)
+        results = [await gate.acquire() for _ in range(3)]
+        return gate, results
+
+    gate, results = asyncio.run(run())
+    assert results == [True, True, False]
+    assert gate.stats()["rejected_queue_full"] == 1
+
+
+def test_queue_timeout_sheds():
+    async def run():
+        gate = _gate(queue_timeout_ms=20)
+        await gate.acquire()
+        return gate, await gate.acquire()
+
+    gate, admitted = asyncio.run(run())
+    assert admitted is False
+    assert gate.rejected_timeout == 1
+    assert gate.stats()["queued"] == 0
+    assert gate.in_flight == 1
+
+
+def test_release_hands_slot_to_waiters_in_order():
+    async def run():
+        gate = _gate(queue=3)
+        await gate.acquire()
+        order = []
+
+        async def wait(n):
+            assert await gate.acquire()
+            order.append(n)
+
+        waiters = [asyncio.ensure_future(wait(n)) for n in range(3)]
+        await asyncio.sleep(0)
+        # A newcomer can't jump the queue while others wait.
+        assert await gate.acquire() is False
+        for _ in range(3):
+            gate.release(0.01)
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+        return gate, order
+
+    gate, order = asyncio.run(run())
+    assert order == [0, 1, 2]
+    assert gate.in_flight == 1
+    gate.release(0.01)
+    assert gate.in_flight == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        gate = _gate()
+        await gate.acquire()
+        waiter = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        gate.release(0.01)
+        return gate
+
+    gate = asyncio.run(run())
+    assert gate.stats()["queued"] == 0
+    assert gate.in_flight == 0
+
+
+def test_retry_after_tracks_backlog_and_service_time():
+    gate = _gate(concurrency=2)
+    assert gate.retry_after() == 1
+    gate.in_flight = 2
+    gate.release(3.0)  # one left in flight, 3s per request
+    assert gate.retry_after() == 2
+    gate.service_time = 1000.0
+    assert gate.retry_after() == MAX_RETRY_AFTER_SECONDS
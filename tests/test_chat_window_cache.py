@@ -0,0 +1,113 @@
+from backend.services.chat_window_cache import CHAT_HISTORY_LIMIT, MESSAGE_OVERHEAD_BYTES, ChatWindow, ChatWindowCache
+
+
+def _cache(**overrides) -> ChatWindowCache:
+    options = dict(max_bytes=1_000_000, max_sessions=100, ttl_seconds=60)
+    options.update(overrides)
+    return ChatWindowCache(**options)
+
+
+def _loader(*messages):
+    loads = []
+
+    def load():
+        loads.append(1)
+        window = ChatWindow()
+        for message in messages:
+            window.append("user", message)
+        return window
+
+    return load, loads
+
+
+def test_hit_skips_load():
+    cache = _cache()
+    load, loads = _loader("hi")
+    first = cache.get_or_load(1, None, load, marker=(1, 10, None))
+    assert cache.get_or_load(1, None, load, marker=(1, 10, None)) is first
+    assert len(loads) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_changed_marker_reloads():
+    cache = _cache()
+    load, loads = _loader("hi")
+    cache.get_or_load(1, None, load, marker=(1, 10, None))
+    cache.get_or_load(1, None, load, marker=(2, 11, None))
+    assert len(loads) == 2
+
+
+def test_expired_entry_reloads():
+    cache = _cache(ttl_seconds=0)
+    load, loads = _loader("hi")
+    cache.get_or_load(1, None, load)
+    cache.get_or_load(1, None, load)
+    assert len(loads) == 2
+
+
+def test_advance_moves_only_matching_entries():
+    cache = _cache()
+    load, loads = _loader()
+    cache.get_or_load(1, "a", load, marker=(1, 10, None))
+    cache.get_or_load(1, "b", load, marker=(0, None, None))
+    cache.advance(1, (1, 10, None), (2, 12, None))
+
+    cache.get_or_load(1, "a", load, marker=(2, 12, None))
+    assert len(loads) == 2
+    cache.get_or_load(1, "b", load, marker=(2, 12, None))
+    assert len(loads) == 3
+
+
+def test_append_writes_through_to_session_and_all_sessions_windows():
+    cache = _cache()
+    load, _ = _loader("old")
+    session = cache.get_or_load(1, "s1", load)
+    combined = cache.get_or_load(1, None, load)
+    other = cache.get_or_load(1, "s2", load)
+    cache.append(1, "s1", "assistant", "new")
+    assert session.as_messages()[-1] == {"role": "assistant", "content": "new"}
+    assert combined.as_messages()[-1]["content"] == "new"
+    assert other.as_messages()[-1]["content"] == "old"
+
+
+def test_window_keeps_last_messages_only():
+    window = ChatWindow()
+    for i in range(CHAT_HISTORY_LIMIT + 5):
+        window.append("user", str(i))
+    assert [m["content"] for m in window.as_messages()] == [str(i) for i in range(5, CHAT_HISTORY_LIMIT + 5)]
+
+
+def test_evicts_least_recently_used_over_session_limit():
+    cache = _cache(max_sessions=2)
+    load, loads = _loader("hi")
+    cache.get_or_load(1, None, load)
+    cache.get_or_load(2, None, load)
+    cache.get_or_load(1, None, load)  # 1 is now most recent
+    cache.get_or_load(3, None, load)
+    assert cache.stats()["evictions"] == 1
+    cache.get_or_load(1, None, load)
+    assert len(loads) == 3
+    cache.get_or_load(2, None, load)
+    assert len(loads) == 4
+
+
+def test_evicts_over_byte_limit():
+    cache = _cache(max_bytes=2 * (MESSAGE_OVERHEAD_BYTES + 2))
+    load, _ = _loader("hi")
+    for user_id in range(3):
+        cache.get_or_load(user_id, None, load)
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= cache.max_bytes
+
+
+def test_invalidate_user_drops_all_sessions():
+    cache = _cache()
+    load, loads = _loader("hi")
+    cache.get_or_load(1, "a", load)
+    cache.get_or_load(1, "b", load)
+    cache.get_or_load(2, "a", load)
+    cache.invalidate_user(1)
+    assert cache.stats()["entries"] == 1
+    cache.get_or_load(1, "a", load)
+    assert len(loads) == 4
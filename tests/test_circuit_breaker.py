@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from backend.services.rate_limiter import UpstreamRateLimited
+
+
+def _breaker(**overrides) -> CircuitBreaker:
+    options = dict(
+        slow_call_seconds=0.05,
+        error_rate_threshold=0.5,
+        slow_call_rate_threshold=0.5,
+        min_calls=4,
+        window_seconds=60,
+        open_seconds=0.05,
+        half_open_probes=1,
+    )
+    options.update(overrides)
+    return CircuitBreaker("test", **options)
+
+
+def _respond(status: int, delay: float = 0.0):
+    async def fn():
+        if delay:
+            await asyncio.sleep(delay)
+        return httpx.Response(status)
+
+    return fn
+
+
+def _call(breaker: CircuitBreaker, fn):
+    return asyncio.run(
+        breaker.call(
+            fn,
+            is_failure=lambda r: r.status_code >= 500,
+            is_throttled=lambda r: r.status_code == 429,
+        )
+    )
+
+
+def _trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        _call(breaker, _respond(500))
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_calls():
+    breaker = _breaker()
+    for _ in range(breaker.min_calls - 1):
+        _call(breaker, _respond(500))
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_error_rate_and_rejects():
+    breaker = _breaker()
+    _trip(breaker)
+    with pytest.raises(CircuitOpenError):
+        _call(breaker, _respond(200))
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.rejected == 2
+
+
+def test_opens_on_slow_calls():
+    breaker = _breaker()
+    for _ in range(breaker.min_calls):
+        _call(breaker, _respond(200, delay=0.06))
+    assert breaker.state == OPEN
+
+
+def test_transport_errors_count_as_failures():
+    breaker = _breaker()
+
+    async def boom():
+        raise httpx.ConnectError("down")
+
+    for _ in range(breaker.min_calls):
+        with pytest.raises(httpx.ConnectError):
+            _call(breaker, boom)
+    assert breaker.state == OPEN
+
+
+def test_successful_probe_closes():
+    breaker = _breaker()
+    _trip(breaker)
+    time.sleep(0.06)
+    breaker.check()  # cool-down passed: no rejection
+    _call(breaker, _respond(200))
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens():
+    breaker = _breaker()
+    _trip(breaker)
+    time.sleep(0.06)
+    _call(breaker, _respond(503))
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+
+
+def test_throttled_probe_does_not_close():
+    breaker = _breaker()
+    _trip(breaker)
+    time.sleep(0.06)
+    _call(breaker, _respond(429))
+    assert breaker.state == HALF_OPEN
+    assert breaker.probes_in_flight == 0
+
+    async def limited():
+        raise UpstreamRateLimited("test", 1)
+
+    with pytest.raises(UpstreamRateLimited):
+        _call(breaker, limited)
+    assert breaker.state == HALF_OPEN
+    assert breaker.probes_in_flight == 0
+
+
+def test_throttled_calls_are_not_recorded():
+    breaker = _breaker()
+    for _ in range(breaker.min_calls):
+        _call(breaker, _respond(429))
+    assert breaker.snapshot()["window_calls"] == 0
+
+
+def test_cancelled_probe_releases_its_slot():
+    breaker = _breaker()
+    _trip(breaker)
+    time.sleep(0.06)
+
+    async def run():
+        task = asyncio.ensure_future(breaker.call(_respond(200, delay=1)))
+        await asyncio.sleep(0.01)
+        assert breaker.probes_in_flight == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert breaker.probes_in_flight == 0
+    _call(breaker, _respond(200))
+    assert breaker.state == CLOSED
+
+
+def test_limiter_queueing_is_not_a_slow_call(monkeypatch):
+    # A healthy Groq behind a tight rate limit: later callers queue past the
+    # slow-call threshold, but each exchange is fast, so the circuit stays closed.
+    from backend.services import circuit_breaker, rate_limiter, upstream_transport
+    from backend.services.groq_client import GroqClient
+    from backend.services.rate_limiter import GROQ
+
+    async def groq(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    breaker = _breaker(slow_call_seconds=0.2, min_calls=3)
+    monkeypatch.setitem(circuit_breaker.BREAKERS, GROQ, breaker)
+    monkeypatch.setitem(rate_limiter.PROVIDER_LIMITS, GROQ, {"rate": 10.0, "burst": 1.0, "concurrency": 10})
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    monkeypatch.setattr(upstream_transport, "get_transport", lambda: httpx.MockTransport(groq))
+
+    async def run():
+        client = GroqClient(api_key="test", model="test-model")
+        messages = [{"role": "user", "content": "hi"}]
+        return await asyncio.gather(*(client.chat(messages, user_id=i, budget="ok") for i in range(6)))
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["slow_call_rate"] == 0.0
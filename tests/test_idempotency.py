@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from backend.utils import idempotency
+from backend.utils.idempotency import REPLAYED_HEADER, IdempotentRequest, request_fingerprint
+
+FINGERPRINT = request_fingerprint("POST", "/meal-analysis", b'{"description": "rice"}')
+
+
+def _request(db, key="k1", fingerprint=FINGERPRINT) -> IdempotentRequest:
+    return IdempotentRequest(db, 1, key, fingerprint)
+
+
+def test_fingerprint_ignores_json_formatting():
+    assert request_fingerprint("post", "/meal-analysis", b'{ "description" : "rice" }') == FINGERPRINT
+    assert request_fingerprint("POST", "/meal-analysis", b'{"description": "dal"}') != FINGERPRINT
+    assert request_fingerprint("POST", "/chat", b'{"description": "rice"}') != FINGERPRINT
+
+
+def test_without_key_nothing_is_stored(db):
+    request = _request(db, key=None)
+    assert asyncio.run(request.replay()) is None
+    assert request.save({"id": 1}) == {"id": 1}
+    assert db.query(idempotency.IdempotencyKey).count() == 0
+
+
+def test_completed_request_is_replayed(db):
+    first = _request(db)
+    assert asyncio.run(first.replay()) is None
+    assert first.save({"id": 7}, status_code=201) == {"id": 7}
+
+    replay = asyncio.run(_request(db).replay())
+    assert replay.status_code == 201
+    assert json.loads(replay.body) == {"id": 7}
+    assert replay.headers[REPLAYED_HEADER] == "true"
+
+
+def test_key_reused_for_another_request_conflicts(db):
+    first = _request(db)
+    asyncio.run(first.replay())
+    first.save({"id": 7})
+    other = _request(db, fingerprint=request_fingerprint("POST", "/meal-analysis", b"{}"))
+    with pytest.raises(HTTPException) as info:
+        asyncio.run(other.replay())
+    assert info.value.status_code == 422
+
+
+def test_keys_are_per_user(db):
+    first = _request(db)
+    asyncio.run(first.replay())
+    first.save({"id": 7})
+    assert asyncio.run(IdempotentRequest(db, 2, "k1", FINGERPRINT).replay()) is None
+
+
+def test_released_claim_runs_again(db):
+    first = _request(db)
+    asyncio.run(first.replay())
+    first.release()
+    retry = _request(db)
+    assert asyncio.run(retry.replay()) is None
+    assert retry.claimed
+    retry.release()
+
+
+def test_in_progress_duplicate_gets_409(db, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.05)
+    first = _request(db)
+    asyncio.run(first.replay())
+    try:
+        with pytest.raises(HTTPException) as info:
+            asyncio.run(_request(db).replay())
+        assert info.value.status_code == 409
+        assert info.value.headers["Retry-After"] == "1"
+    finally:
+        first.release()
+
+
+def test_duplicate_waits_for_original_to_finish(db):
+    first = _request(db)
+
+    async def run():
+        await first.replay()
+        duplicate = asyncio.ensure_future(_request(db).replay())
+        await asyncio.sleep(0.01)
+        assert not duplicate.done()
+        first.save({"id": 7})
+        return await duplicate
+
+    replay = asyncio.run(run())
+    assert json.loads(replay.body) == {"id": 7}
+
+
+def test_stale_claim_is_taken_over(db, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_LOCK_SECONDS", -1)
+    asyncio.run(_request(db).replay())  # claimed and never finished
+    retry = _request(db)
+    assert asyncio.run(retry.replay()) is None
+    retry.release()
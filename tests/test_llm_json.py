@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from backend.models.schemas import AgentEnvelope
+from backend.services.llm_json import parse_agent_envelope, parse_stats, repair_json
+
+ENVELOPE = {"tool_to_call": "none", "tool_arguments": {}, "assistant_reply": "Drink water."}
+
+
+def test_strict_json_needs_no_repair():
+    assert repair_json(json.dumps(ENVELOPE)) == (ENVELOPE, [])
+
+
+def test_strips_code_fences_and_chatter():
+    text = "Sure! Here you go:\n```json\n" + json.dumps(ENVELOPE) + "\n```\nAnything else?"
+    assert repair_json(text) == (ENVELOPE, ["leading_text", "trailing_text"])
+
+
+def test_drops_trailing_commas():
+    value, repairs = repair_json('{"a": [1, 2,], "b": {"c": 3,},}')
+    assert value == {"a": [1, 2], "b": {"c": 3}}
+    assert repairs == ["trailing_comma"]
+
+
+def test_commas_inside_strings_are_kept():
+    value, _ = repair_json('{"a": "x,}", "b": [1,],}')
+    assert value == {"a": "x,}", "b": [1]}
+
+
+def test_closes_object_truncated_mid_string():
+    value, repairs = repair_json('{"tool_to_call": "none", "assistant_reply": "Eat more prot')
+    assert value == {"tool_to_call": "none", "assistant_reply": "Eat more prot"}
+    assert repairs == ["truncated"]
+
+
+def test_drops_incomplete_member_when_truncated():
+    value, repairs = repair_json('{"a": 1, "b": {"c": [1, 2], "d": tr')
+    assert value == {"a": 1, "b": {"c": [1, 2]}}
+    assert repairs == ["truncated"]
+
+
+def test_dangling_escape_is_dropped():
+    value, _ = repair_json('{"assistant_reply": "line\\')
+    assert value == {"assistant_reply": "line"}
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "[1, 2, 3]"])
+def test_returns_none_without_an_object(text):
+    assert repair_json(text)[0] is None
+
+
+def test_envelope_from_repaired_reply():
+    envelope = parse_agent_envelope("```json\n" + json.dumps(ENVELOPE) + "\n```")
+    assert envelope == AgentEnvelope(**ENVELOPE)
+
+
+def test_unparseable_reply_is_none():
+    assert parse_agent_envelope("I can't answer in JSON today") is None
+
+
+def test_invalid_tool_keeps_only_the_reply():
+    envelope = parse_agent_envelope('{"tool_to_call": "rm_rf", "assistant_reply": "Done!"}')
+    assert envelope == AgentEnvelope(assistant_reply="Done!")
+
+
+def test_invalid_envelope_without_reply_is_none():
+    assert parse_agent_envelope('{"tool_to_call": "rm_rf"}') is None
+
+
+def test_truncated_tool_call_is_dropped():
+    before = parse_stats().get("tool_dropped", 0)
+    raw = '{"tool_to_call": "fetch_nutrition_data", "tool_arguments": {"description": "2 rot'
+    envelope = parse_agent_envelope(raw)
+    assert envelope == AgentEnvelope()
+    assert parse_stats()["tool_dropped"] == before + 1
+
+
+def test_truncated_reply_without_tool_is_kept():
+    envelope = parse_agent_envelope('{"tool_to_call": "none", "assistant_reply": "Walk 30 min')
+    assert envelope.assistant_reply == "Walk 30 min"
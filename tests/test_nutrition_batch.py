@@ -0,0 +1,48 @@
+from backend.services.nutrition_service import MAX_QUERY_CHARS, _chunk_for_queries, _split_combined
+
+
+def _items(*names):
+    return {"items": [{"name": name, "calories": 100.0} for name in names]}
+
+
+def _names(split):
+    return [[item["name"] for item in part["items"]] for part in split]
+
+
+def test_splits_items_back_to_descriptions():
+    split = _split_combined(["2 rotis", "dal and rice", "1 banana"], _items("roti", "dal", "rice", "banana"))
+    assert _names(split) == [["roti"], ["dal", "rice"], ["banana"]]
+
+
+def test_plural_descriptions_match_singular_items():
+    split = _split_combined(["3 eggs", "two apples"], _items("eggs", "apple"))
+    assert _names(split) == [["eggs"], ["apple"]]
+
+
+def test_repeated_name_across_descriptions_is_ambiguous():
+    # Which "rice" belongs to which meal can't be told from names alone.
+    assert _split_combined(["rice", "rice and egg"], _items("rice", "rice", "egg")) is None
+
+
+def test_unmatched_item_falls_back():
+    assert _split_combined(["rice", "dal"], _items("rice", "mystery")) is None
+
+
+def test_description_without_items_falls_back():
+    assert _split_combined(["rice", "water"], _items("rice")) is None
+
+
+def test_items_out_of_query_order_fall_back():
+    assert _split_combined(["rice", "dal"], _items("dal", "rice")) is None
+
+
+def test_nameless_item_falls_back():
+    assert _split_combined(["rice"], {"items": [{"calories": 1.0}]}) is None
+
+
+def test_chunks_respect_query_limit():
+    descriptions = ["x" * 600, "y" * 600, "z" * 600, "w"]
+    chunks = _chunk_for_queries(descriptions)
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    for chunk in chunks:
+        assert len(", ".join(chunk)) <= MAX_QUERY_CHARS
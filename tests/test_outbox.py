@@ -0,0 +1,131 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from backend.models import OutboxTask
+from backend.services import outbox
+from backend.services.outbox import STATUS_DONE, STATUS_FAILED, STATUS_PENDING, enqueue, process_due, run_task
+
+
+@pytest.fixture(autouse=True)
+def scratch_outbox(monkeypatch, session_factory):
+    monkeypatch.setattr(outbox, "SessionLocal", session_factory)
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 3)
+
+
+@pytest.fixture
+def ran(monkeypatch):
+    """Register "test.ok" and "test.fail" handlers; returns the payloads they saw."""
+    seen = []
+
+    def ok(db, payload):
+        seen.append(payload["n"])
+
+    def fail(db, payload):
+        seen.append(payload["n"])
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(outbox.HANDLERS, "test.ok", ok)
+    monkeypatch.setitem(outbox.HANDLERS, "test.fail", fail)
+    return seen
+
+
+def _task(db, task_id) -> OutboxTask:
+    db.expire_all()
+    return db.get(OutboxTask, task_id)
+
+
+def test_process_due_completes_tasks(db, ran):
+    ids = [enqueue(db, "test.ok", {"n": n}).id for n in range(3)]
+    assert process_due() == 3
+    assert ran == [0, 1, 2]
+    for task_id in ids:
+        task = _task(db, task_id)
+        assert task.status == STATUS_DONE
+        assert task.completed_at is not None
+
+
+def test_failure_is_retried_with_backoff(db, ran):
+    task_id = enqueue(db, "test.fail", {"n": 1}).id
+    assert process_due() == 0
+    task = _task(db, task_id)
+    assert (task.status, task.attempts) == (STATUS_PENDING, 1)
+    assert task.last_error == "RuntimeError: boom"
+    assert task.next_attempt_at > task.created_at + timedelta(seconds=1)
+    # Not due again yet.
+    assert process_due() == 0
+    assert ran == [1]
+
+
+def test_gives_up_after_max_attempts(db, ran):
+    task_id = enqueue(db, "test.fail", {"n": 1}).id
+    for _ in range(3):
+        assert run_task(task_id) is False
+    task = _task(db, task_id)
+    assert (task.status, task.attempts) == (STATUS_FAILED, 3)
+    assert run_task(task_id) is False
+    assert ran == [1, 1, 1]
+
+
+def test_unknown_kind_fails_like_a_handler_error(db):
+    task_id = enqueue(db, "test.missing", {}).id
+    run_task(task_id)
+    assert _task(db, task_id).last_error.startswith("LookupError")
+
+
+def test_handler_writes_roll_back_with_failure(db, monkeypatch):
+    def write_then_fail(session, payload):
+        session.add(OutboxTask(kind="side.effect", payload_json="{}", status=STATUS_PENDING, attempts=0))
+        session.flush()
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(outbox.HANDLERS, "test.write", write_then_fail)
+    enqueue(db, "test.write", {})
+    process_due()
+    db.expire_all()
+    assert db.query(OutboxTask).filter(OutboxTask.kind == "side.effect").count() == 0
+
+
+def test_ordering_key_blocks_later_tasks(db, ran, monkeypatch):
+    failing = [True]
+
+    def flaky(session, payload):
+        ran.append(payload["n"])
+        if failing[0]:
+            raise RuntimeError("boom")
+
+    monkeypatch.setitem(outbox.HANDLERS, "test.flaky", flaky)
+    first = enqueue(db, "test.flaky", {"n": 1}, ordering_key="chat:1").id
+    second = enqueue(db, "test.ok", {"n": 2}, ordering_key="chat:1").id
+    other = enqueue(db, "test.ok", {"n": 3}, ordering_key="chat:2").id
+    assert process_due() == 1
+    assert ran == [1, 3]
+    assert _task(db, second).status == STATUS_PENDING
+    assert _task(db, other).status == STATUS_DONE
+
+    # Once the earlier task succeeds, the next one in line runs.
+    failing[0] = False
+    _task(db, first).next_attempt_at = outbox._now()
+    db.commit()
+    assert process_due() == 2
+    assert ran == [1, 3, 1, 2]
+
+
+def test_leased_task_is_not_claimed_twice(db, ran):
+    enqueue(db, "test.ok", {"n": 1})
+    assert len(outbox._claim_due(db, 10)) == 1
+    assert outbox._claim_due(db, 10) == []
+
+
+def test_stop_drains_due_tasks(db, ran):
+    async def run():
+        outbox.worker.start()
+        for n in range(3):
+            enqueue(db, "test.ok", {"n": n})
+        await outbox.worker.stop(drain_seconds=5)
+
+    asyncio.run(run())
+    assert sorted(ran) == [0, 1, 2]
+    assert outbox.status_counts(db)["pending"] == 0
+    assert not outbox.worker.running
@@ -0,0 +1,60 @@
+import pytest
+
+from backend.services.plan_service import apply_json_patch, plan_view
+
+
+def test_add_appends_to_list_and_sets_keys():
+    doc = {"feedback_history": ["too easy"], "days": {"mon": "legs"}}
+    apply_json_patch(
+        doc,
+        [
+            {"op": "add", "path": "/feedback_history/-", "value": "knee hurts"},
+            {"op": "add", "path": "/days/tue", "value": "rest"},
+        ],
+    )
+    assert doc == {"feedback_history": ["too easy", "knee hurts"], "days": {"mon": "legs", "tue": "rest"}}
+
+
+def test_add_inserts_at_list_index():
+    doc = {"items": ["a", "c"]}
+    apply_json_patch(doc, [{"op": "add", "path": "/items/1", "value": "b"}])
+    assert doc["items"] == ["a", "b", "c"]
+
+
+def test_replace_and_remove():
+    doc = {"goal": "fit", "items": ["a", "b"], "note": "x"}
+    apply_json_patch(
+        doc,
+        [
+            {"op": "replace", "path": "/goal", "value": "strength"},
+            {"op": "replace", "path": "/items/0", "value": "z"},
+            {"op": "remove", "path": "/items/1"},
+            {"op": "remove", "path": "/note"},
+        ],
+    )
+    assert doc == {"goal": "strength", "items": ["z"]}
+
+
+def test_pointer_escapes():
+    doc = {"a/b": {"c~d": 1}}
+    apply_json_patch(doc, [{"op": "replace", "path": "/a~1b/c~0d", "value": 2}])
+    assert doc == {"a/b": {"c~d": 2}}
+
+
+@pytest.mark.parametrize(
+    "op",
+    [
+        {"op": "add", "path": "", "value": {}},
+        {"op": "move", "path": "/goal", "from": "/x"},
+        {"op": "add", "path": "goal", "value": 1},
+    ],
+)
+def test_rejects_unsupported_patches(op):
+    with pytest.raises(ValueError):
+        apply_json_patch({"goal": "fit"}, [op])
+
+
+def test_plan_view_leaves_out_feedback():
+    data = {"goal": "fit", "feedback_history": ["too easy"]}
+    assert plan_view(data) == {"goal": "fit"}
+    assert data["feedback_history"] == ["too easy"]
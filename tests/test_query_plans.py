@@ -0,0 +1,6 @@
+"""Run from the repo root: python -m pytest tests"""
+from backend.utils.query_plan_check import check
+
+
+def test_per_user_queries_search_instead_of_scan():
+    assert check() == {}
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend.services import rate_limiter
+from backend.services.rate_limiter import (
+    TokenBucket,
+    UpstreamRateLimited,
+    retry_after_from_headers,
+    send_with_rate_limit,
+)
+
+PROVIDER = "test-provider"
+
+
+@pytest.fixture(autouse=True)
+def provider(monkeypatch):
+    monkeypatch.setitem(rate_limiter.PROVIDER_LIMITS, PROVIDER, {"rate": 100.0, "burst": 100.0, "concurrency": 10})
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    monkeypatch.setattr(rate_limiter, "UPSTREAM_MAX_RETRIES", 2)
+    monkeypatch.setattr(rate_limiter, "backoff_delay", lambda attempt: 0.0)
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({"retry-after": "2.5"}, 2.5),
+        ({"retry-after": "1m30s"}, 90.0),
+        ({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "120ms"}, 0.12),
+        (
+            {
+                "x-ratelimit-remaining-requests": "0",
+                "x-ratelimit-reset-requests": "2s",
+                "x-ratelimit-remaining-tokens": "0",
+                "x-ratelimit-reset-tokens": "7.5s",
+            },
+            7.5,
+        ),
+        ({"x-ratelimit-remaining-requests": "3", "x-ratelimit-reset-requests": "2s"}, None),
+        ({}, None),
+    ],
+)
+def test_retry_after_from_headers(headers, expected):
+    assert retry_after_from_headers(httpx.Headers(headers)) == pytest.approx(expected)
+
+
+def test_retry_after_http_date():
+    headers = httpx.Headers({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    assert retry_after_from_headers(headers) == 0.0
+
+
+def test_bucket_serves_burst_then_paces():
+    async def run():
+        bucket = TokenBucket(rate=20.0, burst=2)
+        deadline = time.monotonic() + 5
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire(deadline)
+        return time.monotonic() - started
+
+    assert 0.04 <= asyncio.run(run()) < 1.0
+
+
+def test_bucket_gives_up_at_deadline():
+    async def run():
+        bucket = TokenBucket(rate=1.0, burst=1)
+        await bucket.acquire(time.monotonic() + 1)
+        await bucket.acquire(time.monotonic() + 0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+
+
+def test_pause_holds_tokens_back():
+    async def run():
+        bucket = TokenBucket(rate=100.0, burst=10)
+        bucket.pause(0.2)
+        started = time.monotonic()
+        await bucket.acquire(time.monotonic() + 5)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.15
+
+
+def test_retries_429_after_hinted_delay():
+    responses = [httpx.Response(429, headers={"retry-after": "0.2"}), httpx.Response(200)]
+
+    async def send():
+        return responses.pop(0)
+
+    async def run():
+        started = time.monotonic()
+        resp = await send_with_rate_limit(PROVIDER, send, queue_timeout=5)
+        return resp, time.monotonic() - started
+
+    resp, elapsed = asyncio.run(run())
+    assert resp.status_code == 200
+    assert elapsed >= 0.2
+
+
+def test_persistent_429_raises():
+    calls = []
+
+    async def send():
+        calls.append(1)
+        return httpx.Response(429, headers={"retry-after": "0"})
+
+    with pytest.raises(UpstreamRateLimited):
+        asyncio.run(send_with_rate_limit(PROVIDER, send, queue_timeout=5))
+    assert len(calls) == 3  # first try plus UPSTREAM_MAX_RETRIES
+
+
+def test_final_5xx_is_returned():
+    async def send():
+        return httpx.Response(503)
+
+    resp = asyncio.run(send_with_rate_limit(PROVIDER, send, queue_timeout=5))
+    assert resp.status_code == 503
+
+
+def test_retry_past_deadline_gives_up():
+    async def send():
+        return httpx.Response(429, headers={"retry-after": "30"})
+
+    started = time.monotonic()
+    with pytest.raises(UpstreamRateLimited) as info:
+        asyncio.run(send_with_rate_limit(PROVIDER, send, queue_timeout=1))
+    assert time.monotonic() - started < 1
+    assert info.value.retry_after == 30